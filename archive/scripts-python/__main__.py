@@ -0,0 +1,4 @@
+# `python archive/scripts-python <input.csv> [output.csv] [options]` runs final_parse.py
+from final_parse import main
+
+main()
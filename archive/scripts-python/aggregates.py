@@ -0,0 +1,213 @@
+"""Incrementally maintained aggregates over parsed posts.
+
+"Events per month", "events per organizer", "share of free events" and
+"posts without phone" are kept as counters that parse runs update as they
+write rows, so `stats` answers without reading any CSV.
+
+Every parsed post contributes one small record (month, organizer, fee class,
+has phone, is event), stored per post key (Instagram shortcode, or
+session:post_index). Updating a post that was already counted retracts its
+old record before adding the new one, so re-parsing a session (or a post
+becoming a non-event) moves counts instead of double-counting them. Rows
+that are not parsed (pending, partial, error, quarantined) leave the counts
+alone.
+
+Two files, so `stats` only loads the small one:
+  parsed/aggregates.json         the counters
+  parsed/aggregates.rows.json    post key -> record, read when updating
+
+final_parse.py --aggregates and batch.py --aggregates update them after
+each run.
+
+Usage:
+  python aggregates.py stats [--top N] [--json]
+  python aggregates.py update <parsed CSVs ...>
+  python aggregates.py rebuild [parsed CSVs ...]   (default: parsed/*parsed#*-parsed.csv)
+"""
+import argparse
+import glob
+import json
+import os
+
+from organizers import load_registry, organizer_name, variant_ids
+from parsed_post import is_non_event, read_posts, split_list, write_json_atomic
+from url_index import shortcode
+from vps_payload import valid_date
+
+REPO_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+PARSED_DIR = os.path.join(REPO_DIR, 'parsed')
+AGGREGATES_FILE = os.path.join(PARSED_DIR, 'aggregates.json')
+
+VIEWS = ('month', 'organizer', 'fee')
+# Fee classes; registration_fee is "FREE", "Rp ..." or not specified
+FREE, PAID, UNKNOWN = 'free', 'paid', 'unknown'
+
+
+def rows_path(path):
+    return os.path.splitext(path)[0] + '.rows.json'
+
+
+def post_key(post):
+    return shortcode(post.post_url) or f"{post.session_id}:{post.post_index}"
+
+
+def contribution(post, organizer_ids=None):
+    """A parsed post's record [event, month, organizer, fee, has_phone] (None if it does not count)
+
+    organizer_ids: organizers.variant_ids() of the registry, so variants of
+    one organizer count together.
+    """
+    if post.parse_status != 'parsed':
+        return None
+    event = not is_non_event(post.extracted_title)
+    date = valid_date(post.extracted_date) or valid_date(post.post_date) or ''
+    organizer = organizer_name(post.extracted_organizer)
+    organizer = (organizer_ids or {}).get(organizer, organizer)
+    fee = post.registration_fee.strip()
+    fee = FREE if fee.upper() == 'FREE' else PAID if fee.startswith('Rp') else UNKNOWN
+    has_phone = bool(split_list(post.phone_numbers)) or post.contact_persons not in ('', '[]')
+    return [event, date[:7], organizer, fee, has_phone]
+
+
+class Aggregates:
+    """Counters plus the per-post records they were built from"""
+
+    def __init__(self, counts=None, rows=None, organizer_ids=None):
+        self.counts = counts or {'posts': 0, 'events': 0, 'no_phone': 0, **{view: {} for view in VIEWS}}
+        self.rows = rows
+        self.organizer_ids = organizer_ids
+
+    def _apply(self, record, sign):
+        event, month, organizer, fee, has_phone = record
+        self.counts['posts'] += sign
+        if not has_phone:
+            self.counts['no_phone'] += sign
+        if not event:
+            return
+        self.counts['events'] += sign
+        for view, value in zip(VIEWS, (month, organizer, fee)):
+            if not value:
+                continue
+            counter = self.counts[view]
+            counter[value] = counter.get(value, 0) + sign
+            if counter[value] == 0:
+                del counter[value]
+
+    def update(self, posts):
+        """Add new posts, retract and re-add changed ones; returns (added, changed)"""
+        added = changed = 0
+        for post in posts:
+            record = contribution(post, self.organizer_ids)
+            if record is None:
+                continue
+            key = post_key(post)
+            old = self.rows.get(key)
+            if old == record:
+                continue
+            if old is None:
+                added += 1
+            else:
+                self._apply(old, -1)
+                changed += 1
+            self._apply(record, 1)
+            self.rows[key] = record
+        return added, changed
+
+    def retract(self, key):
+        """Remove one post's record from the counts"""
+        record = self.rows.pop(key, None)
+        if record is not None:
+            self._apply(record, -1)
+
+
+def load(path=AGGREGATES_FILE, with_rows=True):
+    """The stored aggregates; with_rows=False skips the per-post records (enough for stats)"""
+    counts = rows = None
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            counts = json.load(f)
+    if with_rows:
+        rows = {}
+        if os.path.exists(rows_path(path)):
+            with open(rows_path(path), 'r', encoding='utf-8') as f:
+                rows = json.load(f)
+    return Aggregates(counts, rows, variant_ids(load_registry()) if with_rows else None)
+
+
+def save(aggregates, path=AGGREGATES_FILE):
+    # Records first: a crash in between leaves counts that a rebuild can fix, not records that lie
+    write_json_atomic(rows_path(path), aggregates.rows)
+    write_json_atomic(path, aggregates.counts)
+
+
+def update_store(posts, path=AGGREGATES_FILE):
+    """Fold one run's posts into the stored aggregates; returns (added, changed)"""
+    aggregates = load(path)
+    result = aggregates.update(posts)
+    save(aggregates, path)
+    return result
+
+
+def _parsed_csvs():
+    # final_parse.py's outputs next to their sessions only: the synth/, shadow/
+    # and batch/ folders hold test rows and copies of the same posts
+    return sorted(glob.glob(os.path.join(PARSED_DIR, '*parsed#*-parsed.csv')))
+
+
+def print_stats(counts, top, registry):
+    events = counts['events']
+    print(f"{counts['posts']} parsed posts, {events} events")
+    if counts['posts']:
+        print(f"Posts without phone: {counts['no_phone']} ({counts['no_phone'] / counts['posts']:.1%})")
+    if events:
+        fees = counts['fee']
+        print(f"Free events: {fees.get(FREE, 0)} ({fees.get(FREE, 0) / events:.1%}), "
+              f"paid {fees.get(PAID, 0)}, fee unknown {fees.get(UNKNOWN, 0)}")
+
+    print("\nEvents per month:")
+    for month, count in sorted(counts['month'].items()):
+        print(f"  {month}  {count}")
+
+    print(f"\nTop {top} organizers:")
+    ranked = sorted(counts['organizer'].items(), key=lambda item: (-item[1], item[0]))
+    for organizer, count in ranked[:top]:
+        name = registry.get(organizer, {}).get('canonical', organizer)
+        print(f"  {count:5}  {name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Event aggregates kept up to date by parse runs')
+    parser.add_argument('--path', default=AGGREGATES_FILE, help=f'Aggregates file (default: {AGGREGATES_FILE})')
+    commands = parser.add_subparsers(dest='command', required=True)
+    stats = commands.add_parser('stats', help='Print the aggregates')
+    stats.add_argument('--top', type=int, default=10, help='Organizers to list (default: 10)')
+    stats.add_argument('--json', action='store_true', help='Print the raw counters as JSON')
+    update = commands.add_parser('update', help='Fold parsed CSVs into the aggregates')
+    update.add_argument('inputs', nargs='+')
+    rebuild = commands.add_parser('rebuild', help='Recompute the aggregates from scratch')
+    rebuild.add_argument('inputs', nargs='*', help='Parsed CSVs (default: parsed/*parsed#*-parsed.csv)')
+    args = parser.parse_args()
+
+    if args.command == 'stats':
+        counts = load(args.path, with_rows=False).counts
+        if args.json:
+            print(json.dumps(counts, ensure_ascii=False, indent=2))
+        else:
+            print_stats(counts, args.top, load_registry())
+        return
+
+    if args.command == 'update':
+        aggregates = load(args.path)
+    else:
+        aggregates = Aggregates(rows={}, organizer_ids=variant_ids(load_registry()))
+    added = changed = 0
+    for path in args.inputs or _parsed_csvs():
+        file_added, file_changed = aggregates.update(read_posts(path))
+        added += file_added
+        changed += file_changed
+    save(aggregates, args.path)
+    print(f"{added} posts added, {changed} updated; {aggregates.counts['events']} events in {args.path}")
+
+
+if __name__ == '__main__':
+    main()
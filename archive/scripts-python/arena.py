@@ -0,0 +1,93 @@
+import struct
+from multiprocessing import shared_memory
+
+# The captions of one input file in a single shared-memory block, so
+# batch.py's workers read them in place instead of receiving every chunk of
+# multi-kilobyte captions pickled. A task then only carries the block's
+# name and an index range.
+#
+# Layout: the caption count (uint64), count + 1 offsets (uint64, relative to
+# the text), then every caption as one UTF-8 buffer; caption i is
+# text[offsets[i]:offsets[i + 1]]. The parent creates the block and unlinks
+# it when the file is done. A worker maps a block on its first task for it
+# and keeps the last few mapped, so its memory does not grow with the
+# number of files or rows.
+
+_COUNT = struct.Struct('<Q')
+_OFFSET_SIZE = 8
+# Lone surrogates can come out of scraped JSON; keep them round-tripping
+_ERRORS = 'surrogatepass'
+# Blocks a worker keeps mapped (batch.py reads READ_AHEAD files ahead of the one being parsed)
+ATTACHED_MAX = 4
+
+
+class CaptionArena:
+    """Captions in shared memory: CaptionArena.create() in the parent, attach() in workers"""
+
+    def __init__(self, shm, owner=False):
+        self.shm = shm
+        self.name = shm.name
+        self.owner = owner
+        self.count = _COUNT.unpack_from(shm.buf, 0)[0]
+        text_start = _COUNT.size + (self.count + 1) * _OFFSET_SIZE
+        self._offsets = shm.buf[_COUNT.size:text_start].cast('Q')
+        self._text = shm.buf[text_start:]
+
+    @classmethod
+    def create(cls, captions):
+        """Copy captions (a sequence of str) into a new block owned by this process"""
+        # Sizes first, so the parent never holds an encoded copy of the whole file
+        sizes = [len(caption.encode('utf-8', _ERRORS)) for caption in captions]
+        text_start = _COUNT.size + (len(sizes) + 1) * _OFFSET_SIZE
+        shm = shared_memory.SharedMemory(create=True, size=text_start + sum(sizes))
+        try:
+            _COUNT.pack_into(shm.buf, 0, len(sizes))
+            with shm.buf[_COUNT.size:text_start].cast('Q') as offsets:
+                position = 0
+                for i, (caption, size) in enumerate(zip(captions, sizes)):
+                    offsets[i] = position
+                    shm.buf[text_start + position:text_start + position + size] = caption.encode('utf-8', _ERRORS)
+                    position += size
+                offsets[len(sizes)] = position
+        except BaseException:
+            shm.close()
+            shm.unlink()
+            raise
+        return cls(shm, owner=True)
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        return str(self._text[self._offsets[index]:self._offsets[index + 1]], 'utf-8', _ERRORS)
+
+    def captions(self, start, stop):
+        """Decoded captions start..stop-1"""
+        return [self[index] for index in range(start, min(stop, self.count))]
+
+    def close(self):
+        """Unmap the block (and remove it, in the process that created it)"""
+        self._offsets.release()
+        self._text.release()
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+_attached = {}
+
+
+def attach(name):
+    """Worker side: the arena called name, mapped on first use"""
+    arena = _attached.get(name)
+    if arena is None:
+        while len(_attached) >= ATTACHED_MAX:
+            _attached.pop(next(iter(_attached))).close()
+        arena = _attached[name] = CaptionArena(shared_memory.SharedMemory(name=name))
+    return arena
@@ -0,0 +1,329 @@
+"""Parse every session in parsed/ and output/ in one run.
+
+Finds parsed#N-*.csv files in /parsed and scraped JSON files in /output,
+reads them on an I/O thread and feeds their captions to a process pool, so
+reading and writing files overlaps with parsing. Each file's captions are
+copied once into a shared-memory arena (arena.py); pool tasks only carry an
+index range, and workers send back each row's field values as a tuple.
+Each input gets a parsed CSV (and optionally MASTER_RULE JSON) in the
+output folder, and the run writes a manifest with rows, timings and
+failures per file.
+
+Usage:
+  python batch.py [inputs ...] [--out-dir DIR] [--workers N] [--chunk-size N] [--json] [--metrics PATH]
+                  [--aggregates [PATH]] [--schedule] [--today YYYY-MM-DD] [--fields title,date,...]
+"""
+import argparse
+import glob
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+
+import aggregates
+from arena import CaptionArena, attach
+from extractors import FIELDS, select_fields
+from final_parse import parse_caption, parse_post
+from metrics import add_cache_counts, cache_counts, cache_since, field_missing, write_textfile
+from parsed_post import read_posts, read_scraped_posts, write_posts, write_posts_json
+
+REPO_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+PARSED_DIR = os.path.join(REPO_DIR, 'parsed')
+OUTPUT_DIR = os.path.join(REPO_DIR, 'output')
+BATCH_DIR = os.path.join(PARSED_DIR, 'batch')
+
+DEFAULT_CHUNK_SIZE = 50
+# Files read ahead of the one currently being parsed
+READ_AHEAD = 2
+
+
+def discover(parsed_dir=PARSED_DIR, output_dir=OUTPUT_DIR):
+    """Every parsed#N CSV and scraped JSON, oldest first"""
+    paths = glob.glob(os.path.join(parsed_dir, '*parsed#*.csv'))
+    # Outputs of earlier final_parse.py runs are not inputs
+    paths = [path for path in paths if not path.endswith('-parsed.csv')]
+    paths += glob.glob(os.path.join(output_dir, 'scraped#*.json'))
+    paths += glob.glob(os.path.join(output_dir, 'scraped-*.json'))
+    return sorted(set(paths), key=os.path.getmtime)
+
+
+def load(path):
+    """Return (posts, metadata) for a parsed CSV or a scraped JSON"""
+    if path.endswith('.json'):
+        return read_scraped_posts(path)
+    return read_posts(path), {}
+
+
+def _parse_captions(captions, select=None):
+    """parse_caption over captions -> (records, cpu_seconds, cache counts)
+
+    A record is the row's field values in `select` order (every field
+    without one), or an error message string. The cache counts are the
+    worker's metrics.cache_counts() for this chunk.
+    """
+    names = select or FIELDS
+    caches = cache_counts()
+    start = time.process_time()
+    records = []
+    for caption in captions:
+        try:
+            fields = parse_caption(caption, fields=names)
+            records.append(tuple(fields[name] for name in names))
+        except Exception as e:
+            records.append(f"{type(e).__name__}: {e}")
+    return records, time.process_time() - start, cache_since(caches)
+
+
+def _parse_range(arena_name, start, stop, select=None):
+    """Worker: parse captions start..stop-1 of a shared CaptionArena"""
+    return _parse_captions(attach(arena_name).captions(start, stop), select)
+
+
+def _parse_chunk(captions, select=None):
+    """Worker: parse a pickled chunk of captions (when shared memory is not available)"""
+    return _parse_captions(captions, select)
+
+
+class FileJob:
+    """One input file moving through the batch, plus its manifest entry"""
+
+    def __init__(self, path):
+        self.path = path
+        self.posts = []
+        self.metadata = {}
+        self.futures = []
+        self.arena = None
+        self.error = None
+        self.read_seconds = 0.0
+        self.submitted_at = 0.0
+
+    def read(self, pool, chunk_size, select=None):
+        start = time.perf_counter()
+        try:
+            self.posts, self.metadata = load(self.path)
+        except Exception as e:
+            # One unreadable file is recorded in the manifest, not fatal to the run
+            self.error = f"{type(e).__name__}: {e}"
+        if self.posts:
+            try:
+                self.arena = CaptionArena.create([post.original_caption for post in self.posts])
+            except OSError as e:
+                # e.g. no /dev/shm in a container; fall back to pickling the captions
+                print(f"\nShared memory unavailable for {os.path.basename(self.path)} ({e}), sending captions")
+        self.read_seconds = time.perf_counter() - start
+        self.submitted_at = time.perf_counter()
+        for i in range(0, len(self.posts), chunk_size):
+            if self.arena is not None:
+                self.futures.append(pool.submit(_parse_range, self.arena.name, i, i + chunk_size, select))
+            else:
+                captions = [post.original_caption for post in self.posts[i:i + chunk_size]]
+                self.futures.append(pool.submit(_parse_chunk, captions, select))
+
+    def release(self):
+        """Remove the file's shared captions once its chunks are done"""
+        if self.arena is not None:
+            self.arena.close()
+            self.arena = None
+
+
+def _reader(paths, pool, chunk_size, jobs, select=None):
+    """I/O thread: read each file and queue its chunks on the pool"""
+    try:
+        for path in paths:
+            job = FileJob(path)
+            job.read(pool, chunk_size, select)
+            jobs.put(job)
+    finally:
+        jobs.put(None)
+
+
+def output_paths(path, out_dir):
+    stem = os.path.splitext(os.path.basename(path))[0]
+    base = os.path.join(out_dir, stem + '-parsed')
+    return base + '.csv', base + '.json'
+
+
+def finish(job, position, total, out_dir, chunk_size, write_json, totals=None, select=None):
+    """Collect a file's chunks (printing progress), write its outputs, return its manifest entry
+
+    totals: an aggregates.Aggregates to fold the file's parsed posts into.
+    select: the field names the workers extracted (the order of their records).
+    """
+    name = os.path.basename(job.path)
+    entry = {
+        'input': job.path,
+        'rows': len(job.posts),
+        'parsed': 0,
+        'errors': 0,
+        'missing': {},
+        'caches': {},
+        'read_seconds': round(job.read_seconds, 3),
+    }
+    if job.error:
+        print(f"[{position}/{total}] {name}: FAILED to read ({job.error})")
+        entry.update(status='failed', error=job.error)
+        return entry
+
+    names = select or FIELDS
+    cpu = 0.0
+    failures = []
+    done = 0
+    try:
+        for i, future in enumerate(job.futures):
+            records, chunk_cpu, caches = future.result()
+            cpu += chunk_cpu
+            add_cache_counts(entry['caches'], caches)
+            for post, record in zip(job.posts[i * chunk_size:(i + 1) * chunk_size], records):
+                if isinstance(record, str):
+                    post.parse_status = 'error'
+                    failures.append({'post_index': post.post_index, 'error': record})
+                else:
+                    parse_post(post, dict(zip(names, record)))
+            done += len(records)
+            print(f"\r[{position}/{total}] {name}: {done}/{len(job.posts)} rows", end='', flush=True)
+    except Exception as e:
+        # A worker died (e.g. killed by the OS); the rest of the file is unparsed
+        print()
+        print(f"[{position}/{total}] {name}: FAILED ({type(e).__name__}: {e})")
+        entry.update(status='failed', error=f"{type(e).__name__}: {e}", parsed=done)
+        return entry
+    finally:
+        job.release()
+    parse_seconds = time.perf_counter() - job.submitted_at
+
+    start = time.perf_counter()
+    csv_path, json_path = output_paths(job.path, out_dir)
+    write_posts(csv_path, job.posts)
+    if write_json:
+        write_posts_json(json_path, job.posts, **job.metadata)
+    write_seconds = time.perf_counter() - start
+    if totals is not None:
+        totals.update(job.posts)
+
+    entry.update(
+        status='ok' if not failures else 'partial',
+        output=csv_path,
+        json_output=json_path if write_json else None,
+        parsed=done - len(failures),
+        errors=len(failures),
+        failures=failures,
+        missing=field_missing(job.posts),
+        parse_seconds=round(parse_seconds, 3),
+        cpu_seconds=round(cpu, 3),
+        write_seconds=round(write_seconds, 3),
+    )
+    print(f"\r[{position}/{total}] {name}: {done}/{len(job.posts)} rows, "
+          f"{len(failures)} errors, {parse_seconds:.1f}s")
+    return entry
+
+
+def run(paths, out_dir=BATCH_DIR, workers=None, chunk_size=DEFAULT_CHUNK_SIZE, write_json=False,
+        metrics_path=None, aggregates_path=None, select=None):
+    """Parse every path, write outputs and the manifest (and metrics_path, aggregates_path); returns the manifest dict
+
+    select: field names to extract (extractors.select_fields()); other columns keep their input values.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    totals = aggregates.load(aggregates_path) if aggregates_path else None
+    started = datetime.now()
+    start = time.perf_counter()
+    jobs = queue.Queue(maxsize=READ_AHEAD)
+    entries = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        reader = threading.Thread(target=_reader, args=(paths, pool, chunk_size, jobs, select), daemon=True)
+        reader.start()
+        while True:
+            job = jobs.get()
+            if job is None:
+                break
+            entries.append(finish(job, len(entries) + 1, len(paths), out_dir, chunk_size, write_json, totals,
+                                  select))
+        reader.join()
+
+    elapsed = time.perf_counter() - start
+    rows = sum(entry['rows'] for entry in entries)
+    manifest = {
+        'started': started.isoformat(),
+        'elapsed_seconds': round(elapsed, 3),
+        'workers': workers or os.cpu_count(),
+        'chunk_size': chunk_size,
+        'fields': list(select) if select else 'all',
+        'files': entries,
+        'totals': {
+            'files': len(entries),
+            'failed_files': sum(entry['status'] == 'failed' for entry in entries),
+            'rows': rows,
+            'parsed': sum(entry['parsed'] for entry in entries),
+            'errors': sum(entry['errors'] for entry in entries),
+            'rows_per_second': round(rows / elapsed, 1) if elapsed else 0,
+        },
+    }
+    if metrics_path:
+        missing = {}
+        caches = {}
+        for entry in entries:
+            for field, count in entry['missing'].items():
+                missing[field] = missing.get(field, 0) + count
+            add_cache_counts(caches, entry['caches'])
+        write_textfile(metrics_path, rows, elapsed, missing, manifest['totals']['errors'],
+                       labels={'script': 'batch'}, caches=caches)
+    if totals is not None:
+        aggregates.save(totals, aggregates_path)
+    manifest_path = os.path.join(out_dir, f"manifest-{started.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    manifest['path'] = manifest_path
+    return manifest
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Parse every parsed#N CSV and scraped JSON in one run')
+    parser.add_argument('inputs', nargs='*',
+                        help='Files to parse (default: every session in parsed/ and output/)')
+    parser.add_argument('--out-dir', default=BATCH_DIR, help=f'Output folder (default: {BATCH_DIR})')
+    parser.add_argument('--workers', type=int, default=None, help='Parser processes (default: CPU count)')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                        help=f'Captions per pool task (default: {DEFAULT_CHUNK_SIZE})')
+    parser.add_argument('--json', action='store_true', help='Also write MASTER_RULE JSON per file')
+    parser.add_argument('--metrics', default=None, metavar='PATH',
+                        help='Write a Prometheus textfile for the run (e.g. for node-exporter)')
+    parser.add_argument('--aggregates', nargs='?', const=aggregates.AGGREGATES_FILE, default=None, metavar='PATH',
+                        help=f'Update the event aggregates with this run (default path: {aggregates.AGGREGATES_FILE})')
+    parser.add_argument('--fields', default=None,
+                        help='Only extract these fields, e.g. title,date or contacts (default: all); '
+                             'rows not parsed before get parse_status "partial"')
+    parser.add_argument('--schedule', action='store_true',
+                        help='Parse the files with the soonest deadlines / newest posts first (see scheduler.py)')
+    parser.add_argument('--today', type=date.fromisoformat, default=None,
+                        help='Reference date for --schedule, YYYY-MM-DD (default: today)')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    try:
+        select = select_fields(args.fields) if args.fields else None
+    except ValueError as e:
+        raise SystemExit(f"--fields: {e}")
+    paths = args.inputs or discover()
+    if not paths:
+        print(f"No parsed#N CSV in {PARSED_DIR} or scraped JSON in {OUTPUT_DIR}")
+        return
+    if args.schedule:
+        from scheduler import order_files
+        paths = order_files(paths, args.today)
+    print(f"Batch: {len(paths)} files -> {args.out_dir}")
+    manifest = run(paths, args.out_dir, args.workers, args.chunk_size, args.json, args.metrics, args.aggregates,
+                   select)
+    totals = manifest['totals']
+    print(f"\nDone: {totals['parsed']}/{totals['rows']} rows parsed, {totals['errors']} row errors, "
+          f"{totals['failed_files']} failed files in {manifest['elapsed_seconds']:.1f}s "
+          f"({totals['rows_per_second']} rows/s)")
+    print(f"Manifest: {manifest['path']}")
+
+
+if __name__ == '__main__':
+    main()
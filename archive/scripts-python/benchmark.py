@@ -0,0 +1,390 @@
+"""Benchmarks for the caption parsing scripts.
+
+The benchmark corpus is every parsed#N CSV in the repo's /parsed folder,
+cycled up to the requested row count (post_index is renumbered so rows stay
+distinct). --corpus runs on other files instead, e.g. a synth.py corpus.
+
+Usage:
+  python benchmark.py [--corpus FILE] ... <benchmark> [options]
+  python benchmark.py memory [--rows N]
+  python benchmark.py sections [--repeat N] [--min-chars N]
+  python benchmark.py adversarial [--sizes N ...] [--budget SECONDS]
+  python benchmark.py tokens [--repeat N]
+  python benchmark.py coldstart [--repeat N]
+  python benchmark.py bulk [--rows N] [--repeat N]   (needs pandas)
+"""
+import argparse
+import csv
+import glob
+import io
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from parsed_post import ENCODED_FIELDS, FIELDNAMES, INTERNED_FIELDS, ParsedPost, read_scraped_posts
+
+REPO_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+PARSED_DIR = os.path.join(REPO_DIR, 'parsed')
+
+# Set by --corpus; None means the parsed#N CSVs in PARSED_DIR
+corpus_paths = None
+
+
+def load_corpus():
+    """Return the corpus rows as dicts (only rows with a caption).
+
+    Some scraped CSVs have unquoted captions containing commas; those rows
+    have more columns than the header and the surplus is folded back into the caption.
+    """
+    rows = []
+    for path in corpus_paths or sorted(glob.glob(os.path.join(PARSED_DIR, '*parsed#*.csv'))):
+        if path.endswith('.json'):
+            posts, _metadata = read_scraped_posts(path)
+            rows += [post.to_row() for post in posts if post.original_caption]
+            continue
+        with open(path, 'r', encoding='utf-8', newline='') as f:
+            reader = csv.reader(f)
+            header = next(reader, None) or FIELDNAMES
+            caption_at = header.index('original_caption')
+            extra = len(header) - caption_at - 1
+            for values in reader:
+                if len(values) > len(header):
+                    caption = ','.join(values[caption_at:len(values) - extra])
+                    values = values[:caption_at] + [caption] + values[len(values) - extra:]
+                row = dict(zip(header, values))
+                if row.get('original_caption'):
+                    rows.append(row)
+    if not rows:
+        raise SystemExit(f"No corpus rows found in {corpus_paths or PARSED_DIR}")
+    return rows
+
+
+def corpus_csv(rows, count):
+    """Render `count` corpus rows as CSV text, cycling the corpus"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=FIELDNAMES, extrasaction='ignore')
+    writer.writeheader()
+    for i in range(count):
+        row = dict(rows[i % len(rows)])
+        row['post_index'] = str(i)
+        writer.writerow(row)
+    return buffer.getvalue()
+
+
+def measure(build):
+    """Run build() under tracemalloc, return (result, retained bytes, seconds)"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = build()
+    elapsed = time.perf_counter() - start
+    retained, _peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, retained, elapsed
+
+
+# Free-text columns (str in dict rows; ENCODED_FIELDS are bytes in ParsedPost)
+PAYLOAD_FIELDS = [name for name in FIELDNAMES
+                  if name not in INTERNED_FIELDS and name != 'post_index']
+
+
+def _stored_bytes(values):
+    # Count each object once ('' and other constants are shared)
+    unique = {id(value): value for value in values}
+    return sum(map(sys.getsizeof, unique.values()))
+
+
+def bench_memory(args):
+    rows = load_corpus()
+    text = corpus_csv(rows, args.rows)
+
+    def as_dicts():
+        return list(csv.DictReader(io.StringIO(text)))
+
+    def as_posts():
+        return [ParsedPost.from_row(row) for row in csv.DictReader(io.StringIO(text))]
+
+    # ParsedPost keeps ENCODED_FIELDS as UTF-8 bytes in '_'-prefixed slots
+    slots = [f'_{name}' if name in ENCODED_FIELDS else name for name in PAYLOAD_FIELDS]
+    print(f"Corpus: {len(rows)} source rows cycled to {args.rows} rows\n")
+    totals = {}
+    payload = {}
+    for name, build in (('dict rows', as_dicts), ('ParsedPost', as_posts)):
+        data, retained, elapsed = measure(build)
+        if name == 'ParsedPost':
+            payload[name] = _stored_bytes(getattr(post, slot) for post in data for slot in slots)
+        else:
+            payload[name] = _stored_bytes(row[field] for row in data for field in PAYLOAD_FIELDS)
+        totals[name] = retained
+        print(f"{name:<12} {retained / 1e6:8.1f} MB total  "
+              f"{retained / args.rows:8.0f} B/row  {elapsed:6.2f}s")
+        del data
+
+    print()
+    for name in totals:
+        print(f"{name:<12} {payload[name] / args.rows:8.0f} B/row of free text, "
+              f"{(totals[name] - payload[name]) / args.rows:6.0f} B/row of row structure")
+    print(f"\nTotal reduction:         {totals['dict rows'] / totals['ParsedPost']:.1f}x")
+    print(f"Free text reduction:     {payload['dict rows'] / payload['ParsedPost']:.1f}x")
+    print(f"Row structure reduction: "
+          f"{(totals['dict rows'] - payload['dict rows']) / (totals['ParsedPost'] - payload['ParsedPost']):.1f}x")
+
+
+def bench_sections(args):
+    import final_parse
+    from segment import segment_caption
+
+    captions = [final_parse.clean_caption(row['original_caption']) for row in load_corpus()]
+    captions = [caption for caption in captions if len(caption) >= args.min_chars]
+
+    def full_text(caption):
+        return {
+            'date': final_parse.extract_date(caption),
+            'location': final_parse.extract_location(caption),
+            'fee': final_parse.extract_fee(caption),
+            'contacts': final_parse.extract_contacts(caption),
+        }
+
+    def sectioned(caption):
+        sections = segment_caption(caption)
+        return {
+            'date': final_parse._from_section(final_parse.extract_date, caption, sections.get('date')),
+            'location': final_parse._from_section(final_parse.extract_location, caption, sections.get('location')),
+            'fee': final_parse._from_section(final_parse.extract_fee, caption, sections.get('fee')),
+            'contacts': final_parse._from_section(final_parse.extract_contacts, caption,
+                                                  sections.get('contacts'), miss="[]"),
+        }
+
+    print(f"Corpus: {len(captions)} captions, "
+          f"avg {sum(map(len, captions)) // len(captions)} chars\n")
+    timings = {}
+    for name, run in (('full text', full_text), ('sectioned', sectioned)):
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            results = [run(caption) for caption in captions]
+        timings[name] = (time.perf_counter() - start) / (args.repeat * len(captions))
+        timings[name + ' results'] = results
+        print(f"{name:<10} {timings[name] * 1e6:8.1f} us/caption (date, location, fee, contacts)")
+
+    changed = sum(a != b for a, b in zip(timings['full text results'], timings['sectioned results']))
+    print(f"\nSpeedup: {timings['full text'] / timings['sectioned']:.2f}x, "
+          f"{changed}/{len(captions)} captions with a different value")
+
+
+# The organizer and fee patterns as they were before they were made linear:
+# "proudly present" with an unbounded lazy name run, and a fee with an open-ended
+# [\w\s]+ wave name, both of which backtrack on long captions
+LEGACY_PATTERNS = {
+    'organizer': r'([A-Z][A-Za-z\s]+?)(?:\s+proudly\s+present)',
+    'fee': r'(?:biaya|fee|harga|pendaftaran|registration)\s*(?:gelombang\s+[\w\s]+\s*)?[:\-]?\s*Rp\.?\s*([\d\.]+)',
+}
+
+
+def adversarial_captions(size):
+    """Captions that make the legacy patterns backtrack (quadratic / cubic in size)"""
+    return {
+        'organizer': 'A' + ' a' * size,
+        'fee': 'biaya gelombang ' + ' ' * (size // 10) + '!',
+        # A long whitespace run: any pattern that starts with \s+ retries at every position of it
+        'spaces': 'biaya gelombang ' + ' ' * size + '!',
+    }
+
+
+def legacy_extract(caption):
+    for pattern in LEGACY_PATTERNS.values():
+        re.search(pattern, caption, re.IGNORECASE)
+
+
+def bench_adversarial(args):
+    import final_parse
+    from guard import RowGuard
+
+    print(f"Legacy patterns run under RowGuard with a {args.budget}s budget\n")
+    print(f"{'size':>6}  {'case':<10} {'parse_caption':>14} {'legacy (guarded)':>24}")
+    worst = 0.0
+    with RowGuard(args.budget, target=legacy_extract) as legacy, \
+            RowGuard(args.budget) as current:
+        for size in args.sizes:
+            for name, caption in adversarial_captions(size).items():
+                start = time.perf_counter()
+                fields = current.run(caption)
+                current_time = time.perf_counter() - start
+                worst = max(worst, current_time)
+                status = f"{current_time:.3f}s" if fields is not None else 'QUARANTINED'
+
+                start = time.perf_counter()
+                legacy_result = legacy.run(caption)
+                legacy_time = time.perf_counter() - start
+                legacy_status = f"{legacy_time:.3f}s"
+                if legacy_result is None and legacy.quarantined:
+                    legacy_status = f"quarantined at {legacy_time:.2f}s"
+                    legacy.quarantined = 0
+                print(f"{size:>6}  {name:<10} {status:>14} {legacy_status:>24}")
+
+    print(f"\nWorst parse_caption time: {worst:.3f}s (budget {args.budget}s)")
+
+
+# The sweeps extract_contacts made before it read the token stream
+LEGACY_SWEEPS = (r'wa\.me/(\+62|62)?(\d{8,12})', r'(?:0|\+62|62)(\d{8,12})')
+
+
+def bench_tokens(args):
+    import final_parse
+    from tokens import token_fields, tokenize
+
+    captions = [final_parse.clean_caption(row['original_caption']) for row in load_corpus()]
+
+    def legacy_sweeps(caption):
+        for pattern in LEGACY_SWEEPS:
+            list(re.finditer(pattern, caption))
+
+    def one_pass(caption):
+        tokenize.__wrapped__(caption)
+
+    def one_pass_fields(caption):
+        token_fields(tokenize.__wrapped__(caption))
+
+    def timed(run):
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            for caption in captions:
+                run(caption)
+        return (time.perf_counter() - start) / (args.repeat * len(captions))
+
+    print(f"Corpus: {len(captions)} captions, "
+          f"avg {sum(map(len, captions)) // len(captions)} chars\n")
+    parse = timed(final_parse.parse_caption)
+    for name, run in (('wa.me + phone sweeps (old)', legacy_sweeps),
+                      ('tokenize', one_pass),
+                      ('tokenize + link/tag/mention fields', one_pass_fields)):
+        elapsed = timed(run)
+        print(f"{name:<36} {elapsed * 1e6:8.1f} us/caption  ({elapsed / parse:5.1%} of parse_caption)")
+    print(f"{'parse_caption':<36} {parse * 1e6:8.1f} us/caption")
+
+    counts = {}
+    for caption in captions:
+        for field, values in token_fields(tokenize(caption)).items():
+            counts[field] = counts.get(field, 0) + bool(values)
+    print('\nCaptions with values: ' + ', '.join(f"{field} {n}/{len(captions)}" for field, n in counts.items()))
+
+
+COLDSTART_SNIPPETS = {
+    'python (no imports)': 'pass',
+    'import extractors': 'import extractors',
+    'import final_parse': 'import final_parse',
+    'import + first parse_caption': 'import final_parse; final_parse.parse_caption(CAPTION)',
+}
+
+
+def bench_coldstart(args):
+    """Fresh-interpreter timings: what the parse-manager UI / a watcher pays per call"""
+    caption = load_corpus()[0]['original_caption']
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    print(f"Median of {args.repeat} fresh interpreters ({sys.executable})\n")
+    baseline = None
+    for name, snippet in COLDSTART_SNIPPETS.items():
+        code = f"CAPTION = {caption!r}\n{snippet}"
+        times = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, '-c', code], cwd=script_dir, check=True)
+            times.append(time.perf_counter() - start)
+        median = statistics.median(times)
+        if baseline is None:
+            baseline = median
+        print(f"{name:<32} {median * 1000:7.1f} ms  (+{(median - baseline) * 1000:6.1f} ms over bare python)")
+
+    import final_parse
+    start = time.perf_counter()
+    final_parse.parse_caption(caption)
+    warm = time.perf_counter() - start
+    print(f"\n{'warm parse_caption (same caption)':<32} {warm * 1000:7.1f} ms")
+
+
+def bench_bulk(args):
+    import final_parse
+    from bulk import CHEAP_FIELDS, bulk_parse, require_pandas
+
+    require_pandas()
+    text = corpus_csv(load_corpus(), args.rows)
+
+    def posts():
+        return [ParsedPost.from_row(row) for row in csv.DictReader(io.StringIO(text))]
+
+    def row_loop(batch):
+        for post in batch:
+            final_parse.parse_post(post)
+
+    print(f"Corpus cycled to {args.rows} rows, best CPU time of {args.repeat} alternating runs\n")
+    # Rules, compiled patterns and the gazetteer load on first use; do that outside the timings
+    warm = posts()[:200]
+    row_loop(warm)
+    bulk_parse(warm)
+
+    timings = {'row loop (parse_post)': [], 'bulk (pandas + rest)': []}
+    for _ in range(args.repeat):
+        loop_posts, bulk_posts = posts(), posts()
+        start = time.process_time()
+        row_loop(loop_posts)
+        timings['row loop (parse_post)'].append(time.process_time() - start)
+        start = time.process_time()
+        resolved = bulk_parse(bulk_posts)
+        timings['bulk (pandas + rest)'].append(time.process_time() - start)
+    for name, runs in timings.items():
+        print(f"{name:<24} {min(runs):7.2f}s  {args.rows / min(runs):8.0f} rows/s")
+
+    loop, bulk = (min(runs) for runs in timings.values())
+    print(f"\nSpeedup: {loop / bulk:.2f}x")
+    for name in CHEAP_FIELDS:
+        print(f"  {name}: {resolved[name]}/{args.rows} rows resolved column-wise")
+    fields = [name for name in FIELDNAMES if name != 'parse_timestamp']
+    differ = sum(getattr(a, name) != getattr(b, name)
+                 for a, b in zip(loop_posts, bulk_posts) for name in fields)
+    print(f"Values differing from the row loop: {differ}")
+
+
+def main():
+    global corpus_paths
+
+    parser = argparse.ArgumentParser(description='Caption parsing benchmarks')
+    parser.add_argument('--corpus', action='append', default=None, metavar='FILE',
+                        help='parsed#N CSV or scraped JSON to use instead of /parsed, e.g. from synth.py (repeatable)')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    memory = commands.add_parser('memory', help='Row model memory: dict rows vs ParsedPost')
+    memory.add_argument('--rows', type=int, default=100000)
+    memory.set_defaults(func=bench_memory)
+
+    sections = commands.add_parser('sections', help='Date/location/fee/contacts: full text vs sections')
+    sections.add_argument('--repeat', type=int, default=20)
+    sections.add_argument('--min-chars', type=int, default=0, help='Only captions at least this long')
+    sections.set_defaults(func=bench_sections)
+
+    adversarial = commands.add_parser('adversarial', help='Backtracking worst cases, current vs legacy patterns')
+    adversarial.add_argument('--sizes', type=int, nargs='+', default=[1000, 2000, 4000, 8000])
+    adversarial.add_argument('--budget', type=float, default=1.0)
+    adversarial.set_defaults(func=bench_adversarial)
+
+    tokens = commands.add_parser('tokens', help='One-pass tokenizer vs the contact sweeps it replaced')
+    tokens.add_argument('--repeat', type=int, default=20)
+    tokens.set_defaults(func=bench_tokens)
+
+    coldstart = commands.add_parser('coldstart', help='Import and first-call time in a fresh interpreter')
+    coldstart.add_argument('--repeat', type=int, default=15)
+    coldstart.set_defaults(func=bench_coldstart)
+
+    bulk = commands.add_parser('bulk', help='pandas bulk mode vs the per-row loop (measured 0.93x)')
+    bulk.add_argument('--rows', type=int, default=5000)
+    bulk.add_argument('--repeat', type=int, default=3)
+    bulk.set_defaults(func=bench_bulk)
+
+    args = parser.parse_args()
+    corpus_paths = args.corpus
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
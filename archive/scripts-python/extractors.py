@@ -0,0 +1,564 @@
+import json
+import re
+from collections import namedtuple
+from functools import cached_property, lru_cache
+from string import ascii_letters
+
+from gazetteer import locate
+from parsed_post import join_list
+from rules import current as current_rules, on_reload
+from segment import MARKER_EMOJI, segment_caption
+from tokens import token_fields, tokenize
+
+# Caption field extractors used by final_parse.py, batch.py and the other
+# tools. The extract_* functions take a caption body: parse_caption splits
+# the Instagram header off once (parse_header / clean_caption) and hands the
+# body, or one of its sections, to each of them. Importing this module does
+# no work: every pattern is compiled on first use through _re() and kept
+# until the rules change. Keyword lists and month tables come from
+# rules/extraction.json (see rules.py); each reload of that file builds new
+# pattern sources, so the cache is cleared then, and its size is capped as
+# well (a full parse uses about 60 patterns).
+PATTERN_CACHE_SIZE = 256
+
+
+@lru_cache(maxsize=PATTERN_CACHE_SIZE)
+def _re(pattern, flags=0):
+    """Compiled pattern, built on first use"""
+    return re.compile(pattern, flags)
+
+
+# [hits, misses] the pattern cache had when it was last cleared
+_cleared_counts = [0, 0]
+
+
+def _clear_patterns():
+    info = _re.cache_info()
+    _cleared_counts[0] += info.hits
+    _cleared_counts[1] += info.misses
+    _re.cache_clear()
+
+
+on_reload(_clear_patterns)
+
+
+def compiled_pattern(pattern, flags=0):
+    """Compiled pattern from the extractors' cache, for other modules building on the rule patterns"""
+    return _re(pattern, flags)
+
+
+def pattern_cache_counts():
+    """(hits, misses) of the compiled-pattern cache since the process started"""
+    info = _re.cache_info()
+    return _cleared_counts[0] + info.hits, _cleared_counts[1] + info.misses
+
+
+# Caption header written by Instagram before the caption itself:
+#   1,074 likes, 37 comments - infolomba on December 6, 2025: "<caption>".
+# or, for a truncated preview, "<start of caption>... December 6, 2025".
+CaptionHeader = namedtuple('CaptionHeader', 'likes comments account post_date body truncated')
+
+# A like/comment count as Instagram writes it (1,074 / 1.2K)
+COUNT_PATTERN = r'\d[\d.,]*[KkMm]?'
+_HEADER = (
+    rf'(?:(?P<likes>{COUNT_PATTERN})\s+(?:likes?|suka),\s*)?'
+    rf'(?P<comments>{COUNT_PATTERN})\s+(?:comments?|komentar)\s+-\s+'
+    r'(?P<account>[\w.]+)\s+(?:on|pada)\s+(?P<date>[^:"\n]{6,30}?)[\u200e\u200f\s]*:\s*'
+)
+# The header is never longer than this, and a truncated preview's date is
+# within the last TAIL_CHARS, so a caption is parsed without scanning its body
+HEADER_CHARS = 160
+TAIL_CHARS = 40
+
+
+def _count(text):
+    """'1,074' / '1.074' -> 1074, '1.2K' / '1,2K' -> 1200"""
+    if not text:
+        return None
+    scale = {'k': 1000, 'm': 1000000}.get(text[-1].lower())
+    if scale:
+        return int(float(text[:-1].replace(',', '.')) * scale)
+    return int(text.replace(',', '').replace('.', ''))
+
+
+def _header_date(text):
+    """'December 6, 2025' or '6 Desember 2025' -> '2025-12-06' ('' if it is neither)"""
+    rules = current_rules()
+    match = _re(rules.mdy_date, re.IGNORECASE).fullmatch(text.strip())
+    if match:
+        month_name, day, year = match.groups()
+    else:
+        match = _re(rules.dmy_date, re.IGNORECASE).fullmatch(text.strip())
+        if not match:
+            return ''
+        day, month_name, year = match.groups()
+    return f"{year}-{rules.months.get(month_name.lower(), '01')}-{day.zfill(2)}"
+
+
+def parse_header(caption):
+    """Split a scraped caption into its Instagram header fields and the caption body"""
+    caption = caption or ''
+    likes = comments = None
+    account = post_date = ''
+    truncated = False
+    match = _re(_HEADER).match(caption[:HEADER_CHARS])
+    if match:
+        likes = _count(match.group('likes'))
+        comments = _count(match.group('comments'))
+        account = match.group('account')
+        post_date = _header_date(match.group('date'))
+        caption = caption[match.end():]
+    else:
+        # Instagram stamps previews in its own "December 6, 2025" form; a trailing
+        # "… 20 Desember 2025" is the caption's own text (usually the event date)
+        tail = caption[-TAIL_CHARS:]
+        match = _re(rf'(?:\.\.\.|…)\s*({current_rules().mdy_date})\s*$', re.IGNORECASE).search(tail)
+        if match:
+            post_date = _header_date(match.group(1))
+            caption = caption[:len(caption) - len(tail) + match.start()]
+            truncated = True
+    if caption.startswith('"'):
+        caption = caption[1:]
+    if caption.endswith('".'):
+        caption = caption[:-2]
+    elif account and caption.endswith('"'):
+        caption = caption[:-1]
+    return CaptionHeader(likes, comments, account, post_date, caption.strip(), truncated)
+
+
+def clean_caption(caption):
+    """Clean the Instagram caption format"""
+    if not caption:
+        return ""
+    return parse_header(caption).body
+
+
+def keyword_alternation(kind):
+    """One alternation of every language's `kind` ('organizer' or 'location') phrases.
+
+    A single search keeps the leftmost match in the caption, whichever
+    language its keyword is in.
+    """
+    return '|'.join(current_rules().phrases[kind].values())
+
+
+def extract_title(caption):
+    """Extract event title from caption"""
+    if not caption:
+        return "NON-EVENT"
+
+    # Remove common prefixes
+    caption = _re(r'^\[?\s*(OPEN|PENDAFTARAN|📣|📢)\s+', re.IGNORECASE).sub('', caption)
+
+    # Look for specific title patterns
+    patterns = current_rules().title_patterns
+
+    for pattern in patterns:
+        match = _re(pattern, re.IGNORECASE).search(caption)
+        if match:
+            title = match.group(1).strip()
+            # Clean up title
+            title = _re(r'\s+').sub(' ', title)
+            title = title.strip()
+            if 5 < len(title) < 150:
+                return title
+
+    # Get first meaningful line
+    lines = caption.split('\n')
+    for line in lines[:5]:
+        line = line.strip()
+        # Skip hashtags, emojis-only lines, and common prefixes
+        if line and not line.startswith('#') and 5 < len(line) < 150:
+            # Remove emojis and special chars
+            line = _re(r'[^\w\s\-\(\)\.]+').sub(' ', line)
+            line = ' '.join(line.split())
+            if len(line) > 5:
+                return line[:100]
+
+    return "Not specified"
+
+
+def extract_organizer(caption):
+    """Extract organizer from caption"""
+    if not caption:
+        return "Not specified"
+
+    # Pattern 1: "diselenggarakan oleh / organized by"
+    match = _re(rf'(?:{keyword_alternation("organizer")})\s*[:\-]\s*([^\n\.]+?)(?:\.|\n|merupakan|adalah)',
+                re.IGNORECASE).search(caption)
+    if match:
+        org = match.group(1).strip()
+        if len(org) > 3 and len(org) < 150:
+            return org[:100]
+
+    # Pattern 2: "PROUDLY PRESENT" pattern
+    match = _re(r'PROUDLY\s+PRESENTS?(?:!)?\s+([^\n]+?)(?:\n|Pendaftaran|merupakan|adalah)', re.IGNORECASE).search(caption)
+    if match:
+        org = match.group(1).strip()
+        if len(org) > 3 and len(org) < 150:
+            return org[:100]
+
+    # Pattern 3: Look for organization names directly
+    org_patterns = current_rules().organizer_aliases
+
+    for pattern in org_patterns:
+        match = _re(pattern, re.IGNORECASE).search(caption)
+        if match:
+            org = match.group(1).strip()
+            if len(org) > 3:
+                return org[:100]
+
+    # Pattern 4: Look for "proudly present" after organization name.
+    # Find the literal phrase first and walk back over the whitespace and then
+    # the letters/spaces before it. Starting the pattern with \s+ (or a lazy
+    # ([A-Z][A-Za-z\s]+?) name) retries at every position of a whitespace run,
+    # which is quadratic in its length.
+    for match in _re(r'proudly\s+present', re.IGNORECASE).finditer(caption):
+        end = match.start()
+        while end > 0 and caption[end - 1].isspace():
+            end -= 1
+        if end == match.start():
+            continue
+        start = end
+        while start > 0 and (caption[start - 1] in ascii_letters or caption[start - 1].isspace()):
+            start -= 1
+        org = caption[start:end].strip()
+        if org:
+            if len(org) > 3 and len(org) < 150:
+                return org[:100]
+            break
+
+    return "Not specified"
+
+
+def extract_date(caption):
+    """Extract event date in YYYY-MM-DD format"""
+    if not caption:
+        return "Not specified"
+
+    rules = current_rules()
+
+    # Pattern: DD Month YYYY
+    match = _re(rules.dmy_date, re.IGNORECASE).search(caption)
+    if match:
+        day, month_name, year = match.groups()
+        month = rules.months.get(month_name.lower(), '01')
+        return f"{year}-{month}-{day.zfill(2)}"
+
+    # Pattern: Month DD, YYYY
+    match = _re(rules.mdy_date, re.IGNORECASE).search(caption)
+    if match:
+        month_name, day, year = match.groups()
+        month = rules.months.get(month_name.lower(), '01')
+        return f"{year}-{month}-{day.zfill(2)}"
+
+    # Try YYYY-MM-DD
+    match = _re(r'(\d{4})-(\d{1,2})-(\d{1,2})').search(caption)
+    if match:
+        return f"{match.group(1)}-{match.group(2).zfill(2)}-{match.group(3).zfill(2)}"
+
+    # Try MM/DD/YYYY or DD/MM/YYYY
+    match = _re(r'(\d{1,2})/(\d{1,2})/(\d{4})').search(caption)
+    if match:
+        m, d, y = match.groups()
+        # Assume first is month
+        return f"{y}-{m.zfill(2)}-{d.zfill(2)}"
+
+    return "Not specified"
+
+
+# A location value ends at a newline, a 📝 list item or the next date/fee/contact marker
+_LOCATION_STOPS = '\n📝' + MARKER_EMOJI['date'] + MARKER_EMOJI['fee'] + MARKER_EMOJI['contacts']
+
+
+def extract_location(caption):
+    """Extract event location"""
+    if not caption:
+        return "Not specified"
+
+    caption_lower = caption.lower()
+
+    # Check for explicit location keywords, also after the 📍 emoji ("📍 Tempat: ..."), then "pelaksanaan"
+    keywords = keyword_alternation("location")
+    markers = rf'[{MARKER_EMOJI["location"]}]\s*(?:{keywords})?|{keywords}'
+    patterns = [
+        rf'(?:{markers})\s*[:\-]?\s*([^{_LOCATION_STOPS}]+?)(?:[{_LOCATION_STOPS}]|$)',
+        rf'pelaksanaan\s*[:\-]?\s*([^{_LOCATION_STOPS}]+?)(?:[{_LOCATION_STOPS}]|$)',
+    ]
+
+    for pattern in patterns:
+        match = _re(pattern, re.IGNORECASE).search(caption)
+        if match:
+            loc = match.group(1).strip()
+            loc = _re(r'\s+').sub(' ', loc)
+            loc = _re(r'[^\w\s\-\.\,]+').sub('', loc)
+            if 2 < len(loc) < 100:
+                return loc
+
+    # Check for online/offline
+    if 'online' in caption_lower and 'offline' not in caption_lower:
+        return "Online"
+    if 'offline' in caption_lower:
+        match = _re(rf'offline\s+(?:di\s+)?([^{_LOCATION_STOPS}]+)').search(caption_lower)
+        if match:
+            loc = match.group(1).strip()
+            loc = _re(r'\s+').sub(' ', loc)
+            loc = _re(r'[^\w\s\-\.\,]+').sub('', loc)
+            if len(loc) > 2:
+                return f"Offline: {loc[:50]}"
+
+    return "Not specified"
+
+
+def extract_fee(caption):
+    """Extract registration fee"""
+    if not caption:
+        return "Not specified"
+
+    rules = current_rules()
+
+    # Look for FREE/Gratis
+    if _re(rules.free_fee).search(caption):
+        return "FREE"
+
+    fees = []
+    # Look for fee patterns - extract Rp values
+    for pattern in rules.fee_patterns:
+        matches = _re(pattern, re.IGNORECASE).finditer(caption)
+        for match in matches:
+            fee = match.group(1) if match.groups() else match.group(0)
+            # Clean up fee
+            fee = _re(r'[^\d]').sub('', fee)
+            if fee.isdigit() and int(fee) > 1000:  # Minimum fee of 1000
+                fees.append(int(fee))
+
+    if fees:
+        min_fee = min(fees)
+        max_fee = max(fees)
+        if min_fee == max_fee:
+            return f"Rp {min_fee:,}"
+        else:
+            return f"Rp {min_fee:,} - Rp {max_fee:,}"
+
+    return "Not specified"
+
+
+def extract_contacts(caption):
+    """Extract contact persons as JSON array"""
+    if not caption:
+        return "[]"
+
+    contacts = []
+    seen_phones = set()
+
+    # Pattern 1: "Name : Phone" or "Name Telepon : Phone"
+    matches = _re(r'([A-Z][a-z]+(?:\s+[A-Z][a-z]+)?)\s*(?:Telepon|Phone|WA|wa\.me)?\s*[:\-]\s*(?:0|\+62|62)?(\d{8,12})').finditer(caption)
+    for match in matches:
+        name = match.group(1).strip()
+        phone = match.group(2)
+        if not phone.startswith('0'):
+            phone = '0' + phone
+        if len(phone) >= 10 and phone not in seen_phones:
+            contacts.append({"name": name, "phone": phone})
+            seen_phones.add(phone)
+
+    # Patterns 2 and 5 read the shared token stream instead of sweeping the caption again
+    tokens = tokenize(caption)
+
+    # Pattern 2: "wa.me/phone"
+    for token in tokens:
+        if token.kind != 'url':
+            continue
+        match = _re(r'wa\.me/(?:\+62|62)?(\d{8,12})').search(token.value)
+        if match:
+            phone = match.group(1)
+            if not phone.startswith('0'):
+                phone = '0' + phone
+            if len(phone) >= 10 and phone not in seen_phones:
+                contacts.append({"name": "Admin", "phone": phone})
+                seen_phones.add(phone)
+
+    # Pattern 3: Look for phone numbers in format "Name (Phone)"
+    paren_matches = _re(r'([A-Z][a-z]+(?:\s+[A-Z][a-z]+)?)\s*\((0|\+62|62)?(\d{8,12})\)').finditer(caption)
+    for match in paren_matches:
+        name = match.group(1).strip()
+        phone = match.group(3) if match.group(3) else match.group(2)
+        if not phone.startswith('0'):
+            phone = '0' + phone
+        if len(phone) >= 10 and phone not in seen_phones:
+            contacts.append({"name": name, "phone": phone})
+            seen_phones.add(phone)
+
+    # Pattern 4: Look for standalone phone numbers preceded by names
+    # This catches patterns like "Kristian : 082110608308"
+    standalone_matches = _re(r'([A-Z][a-z]+(?:\s+[A-Z][a-z]+)?)\s*:\s*(0|\+62|62)?(\d{8,12})').finditer(caption)
+    for match in standalone_matches:
+        name = match.group(1).strip()
+        phone = match.group(3) if match.group(3) else match.group(2)
+        if not phone.startswith('0'):
+            phone = '0' + phone
+        if len(phone) >= 10 and phone not in seen_phones:
+            contacts.append({"name": name, "phone": phone})
+            seen_phones.add(phone)
+
+    # Pattern 5: Look for any remaining phone numbers
+    for token in tokens:
+        if token.kind != 'phone':
+            continue
+        phone = token.value
+        if phone.startswith('+62'):
+            phone = '0' + phone[3:]
+        elif phone.startswith('62'):
+            phone = '0' + phone[2:]
+        if len(phone) >= 10 and phone not in seen_phones:
+            contacts.append({"name": "Admin", "phone": phone})
+            seen_phones.add(phone)
+
+    return json.dumps(contacts, ensure_ascii=False)
+
+
+def _from_section(extract, caption, section, miss=None):
+    """Run an extractor on its caption section, or on the full caption if there is none.
+
+    With `miss` set, a section that yields nothing also falls back to the full
+    caption (used for contacts, where a phone anywhere in the caption counts).
+    """
+    if section:
+        result = extract(section)
+        if miss is None or result != miss:
+            return result
+    return extract(caption)
+
+
+# parse_caption() field name -> short name accepted by --fields
+FIELD_ALIASES = {
+    'extracted_title': 'title',
+    'extracted_organizer': 'organizer',
+    'extracted_date': 'date',
+    'extracted_location': 'location',
+    'registration_fee': 'fee',
+    'contact_persons': 'contacts',
+    'registration_links': 'links',
+    'hashtags': 'hashtags',
+    'mentions': 'mentions',
+    'post_likes': 'likes',
+    'post_comments': 'comments',
+    'post_date': 'post_date',
+    'location_city': 'city',
+    'location_province': 'province',
+}
+FIELDS = tuple(FIELD_ALIASES)
+
+
+def select_fields(spec):
+    """'title,date' / column names -> tuple of field names (None or 'all' -> every field)"""
+    if spec is None or spec == 'all':
+        return FIELDS
+    names = {alias: name for name, alias in FIELD_ALIASES.items()}
+    selected = []
+    for item in (spec.split(',') if isinstance(spec, str) else spec):
+        item = item.strip()
+        name = item if item in FIELD_ALIASES else names.get(item)
+        if name is None:
+            raise ValueError(f"unknown field {item!r} (choose from {', '.join(FIELD_ALIASES.values())})")
+        if name not in selected:
+            selected.append(name)
+    return tuple(selected)
+
+
+class ParsedCaption:
+    """One caption whose fields are extracted on first access and then kept.
+
+    The header, sections, token stream and gazetteer place are
+    shared steps, also computed only when a field needs them. Title,
+    organizer and the header fields read the body alone; date, location,
+    fee and contacts segment the caption (once, however many of them are
+    read), city and province also run the gazetteer, and links, hashtags
+    and mentions tokenize it. `known` holds fields already resolved
+    elsewhere (bulk.py), which are returned as-is.
+    """
+
+    def __init__(self, caption, known=None):
+        self.caption = caption
+        self._values = dict(known or {})
+
+    @cached_property
+    def header(self):
+        return parse_header(self.caption)
+
+    @cached_property
+    def body(self):
+        return self.header.body
+
+    @cached_property
+    def sections(self):
+        return segment_caption(self.body)
+
+    @cached_property
+    def place(self):
+        return locate(self.body, self.sections.get('location'))
+
+    @cached_property
+    def token_values(self):
+        return {name: join_list(values) for name, values in token_fields(tokenize(self.body)).items()}
+
+    def _section_field(self, extract, label, miss=None):
+        return _from_section(extract, self.body, self.sections.get(label), miss)
+
+    def _extract(self, name):
+        if name == 'extracted_title':
+            return extract_title(self.body)
+        if name == 'extracted_organizer':
+            return extract_organizer(self.body)
+        if name == 'extracted_date':
+            return self._section_field(extract_date, 'date')
+        if name == 'extracted_location':
+            return self._section_field(extract_location, 'location')
+        if name == 'registration_fee':
+            return self._section_field(extract_fee, 'fee')
+        if name == 'contact_persons':
+            return self._section_field(extract_contacts, 'contacts', miss="[]")
+        if name in ('registration_links', 'hashtags', 'mentions'):
+            return self.token_values[name]
+        if name == 'post_likes':
+            return '' if self.header.likes is None else str(self.header.likes)
+        if name == 'post_comments':
+            return '' if self.header.comments is None else str(self.header.comments)
+        if name == 'post_date':
+            return self.header.post_date
+        if name == 'location_city':
+            return self.place.city
+        if name == 'location_province':
+            return self.place.province
+        raise KeyError(name)
+
+    def __getitem__(self, name):
+        if name not in self._values:
+            self._values[name] = self._extract(name)
+        return self._values[name]
+
+    def __getattr__(self, name):
+        # parsed.title, parsed.extracted_title, ...
+        if name.startswith('_') or name not in FIELD_ALIASES and name not in _ALIAS_NAMES:
+            raise AttributeError(name)
+        return self[_ALIAS_NAMES.get(name, name)]
+
+    def select(self, fields=FIELDS):
+        """{field: value} for the given field names"""
+        return {name: self[name] for name in fields}
+
+
+_ALIAS_NAMES = {alias: name for name, alias in FIELD_ALIASES.items()}
+
+
+def parse_caption(caption, fields=None, known=None):
+    """Extract fields from one caption (all of them, or the names in `fields`).
+
+    The Instagram header (likes, comments, post date) is split off, then the
+    caption is segmented and tokenized once; date, location, fee and
+    contacts extractors only scan their own section when the caption has
+    one, and links/hashtags/mentions come straight from the token stream.
+    With `fields`, only those fields are extracted (see ParsedCaption);
+    `known` fields are used as-is instead of being extracted again.
+    """
+    return ParsedCaption(caption, known).select(fields or FIELDS)
@@ -1,378 +1,289 @@
-import csv
+import argparse
 import json
-import re
+import os
+import time
 from datetime import datetime
-
-# Read the CSV file
-input_file = r'D:\Hilmi\Coding\WebScraper\parsed\parsed-304b7acd-1768128145689.csv'
-output_file = r'D:\Hilmi\Coding\WebScraper\parsed\parsed-304b7acd-1768128145689-parsed.csv'
-
-def clean_caption(caption):
-    """Clean the Instagram caption format"""
-    if not caption:
-        return ""
-    # Remove the prefix "X likes, Y comments - username on date: "
-    caption = re.sub(r'^\d+\s+(?:likes|comments).*?:\s*"', '', caption, flags=re.DOTALL)
-    caption = re.sub(r'^"', '', caption)
-    caption = re.sub(r'"\.$', '', caption)  # Remove trailing quote and dot
-    return caption.strip()
-
-def extract_title(caption):
-    """Extract event title from caption"""
-    caption = clean_caption(caption)
-    if not caption:
-        return "NON-EVENT"
-
-    # Remove common prefixes
-    caption = re.sub(r'^\[?\s*(OPEN|PENDAFTARAN|📣|📢)\s+', '', caption, flags=re.IGNORECASE)
-
-    # Look for specific title patterns
-    patterns = [
-        r'REGISTRATION\s+(.*?)(?:\n|📆|📍|💰|📞|PROUDLY|proudly|diselenggarakan|merupakan|adalah)',
-        r'(LOMBAs?\s+.*?)(?:\n|📆|📍|💰|📞|merupakan|adalah)',
-        r'(WRITING\s+COMPETITION.*?)(?:\n|📆|📍|💰|📞|merupakan|adalah)',
-        r'(SINGING\s+COMPETITION.*?)(?:\n|📆|📍|💰|📞|merupakan|adalah)',
-        r'(VIDEO\s+COMPETITION.*?)(?:\n|📆|📍|💰|📞|merupakan|adalah)',
-        r'(DESIGN\s+COMPETITION.*?)(?:\n|📆|📍|💰|📞|merupakan|adalah)',
-        r'(ENGLISH\s+SKILLS\s+COMPETITION.*?)(?:\n|📆|📍|💰|📞|merupakan|adalah)',
-        r'(COMPETITION.*?)(?:\n|📆|📍|💰|📞|merupakan|adalah)',
-        r'(COMPETISI.*?)(?:\n|📆|📍|💰|📞|merupakan|adalah)',
-        r'(KOMPETISI.*?)(?:\n|📆|📍|💰|📞|merupakan|adalah)',
-        r'(FESTIVAL.*?)(?:\n|📆|📍|💰|📞|merupakan|adalah)',
-        r'(FAIR.*?)(?:\n|📆|📍|💰|📞|merupakan|adalah)',
-        r'(PROJECT.*?)(?:\n|📆|📍|💰|📞|merupakan|adalah)',
-        r'(CHALLENGE.*?)(?:\n|📆|📍|💰|📞|merupakan|adalah)',
-    ]
-
-    for pattern in patterns:
-        match = re.search(pattern, caption, re.IGNORECASE)
-        if match:
-            title = match.group(1).strip()
-            # Clean up title
-            title = re.sub(r'\s+', ' ', title)
-            title = title.strip()
-            if 5 < len(title) < 150:
-                return title
-
-    # Get first meaningful line
-    lines = caption.split('\n')
-    for line in lines[:5]:
-        line = line.strip()
-        # Skip hashtags, emojis-only lines, and common prefixes
-        if line and not line.startswith('#') and 5 < len(line) < 150:
-            # Remove emojis and special chars
-            line = re.sub(r'[^\w\s\-\(\)\.]+', ' ', line)
-            line = ' '.join(line.split())
-            if len(line) > 5:
-                return line[:100]
-
-    return "Not specified"
-
-def extract_organizer(caption):
-    """Extract organizer from caption"""
-    caption = clean_caption(caption)
-    if not caption:
-        return "Not specified"
-
-    # Pattern 1: "diselenggarakan oleh / organized by"
-    match = re.search(r'(?:diselenggarakan\s+oleh|organized\s+by|hosted\s+by|presented\s+by)\s*[:\-]\s*([^\n\.]+?)(?:\.|\n|merupakan|adalah)', caption, re.IGNORECASE)
-    if match:
-        org = match.group(1).strip()
-        if len(org) > 3 and len(org) < 150:
-            return org[:100]
-
-    # Pattern 2: "PROUDLY PRESENT" pattern
-    match = re.search(r'PROUDLY\s+PRESENTS?(?:!)?\s+([^\n]+?)(?:\n|Pendaftaran|merupakan|adalah)', caption, re.IGNORECASE)
-    if match:
-        org = match.group(1).strip()
-        if len(org) > 3 and len(org) < 150:
-            return org[:100]
-
-    # Pattern 3: Look for organization names directly
-    org_patterns = [
-        r'(HIMAPAJAK\s+FIA\s+UB)(?:\s+PROUDLY)?',
-        r'(Himpunan\s+Mahasiswa\s+Perpajakan)(?:\s+\([^)]+\))?',
-        r'(Fakultas\s+Ilmu\s+Administrasi,\s+Universitas\s+Brawijaya)',
-        r'(Universitas\s+Brawijaya)',
-        r'(English\s+Students\s+Association)',
-        r'(ESA\s+2025)',
-        r'(OSIS\s+SMA\s+PU\s+AL\s+BAYAN\s+PUTRI\s+SUKABUMI)',
-        r'(BEM\s+FMIPA\s+UM)',
-        r'(DEPARTEMEN\s+KEILMUAN)',
-        r'(IPB\s+Mathematics\s+Challenge)',
-        r'(AAPG\s+ITB)',
-        r'(Wildcat\s+AAPG\s+ITB)',
-        r'(FPCI\s+Climate\s+Unit)',
-        r'(Bisnis\s+Muda)',
-        r'(LSPR)',
-        r'(Taxion\s+UPNVJ)',
-        r'(Tax\s+Center\s+UPNVJ)',
-        r'(AMSA\s+Youth\s+Project)',
-        r'(AYP\s+UGM)',
-        r'(Information\s+System\s+Festival\s+UKSW)',
-        r'(Cakrawala\s+Invention\s+and\s+Innovation\s+Fair)',
-        r'(Chem\s+Cup\s+2025)',
-        r'(NARRATHON\s+2025)',
-    ]
-
-    for pattern in org_patterns:
-        match = re.search(pattern, caption, re.IGNORECASE)
-        if match:
-            org = match.group(1).strip()
-            if len(org) > 3:
-                return org[:100]
-
-    # Pattern 4: Look for "proudly present" after organization name
-    match = re.search(r'([A-Z][A-Za-z\s]+?)(?:\s+proudly\s+present)', caption, re.IGNORECASE)
-    if match:
-        org = match.group(1).strip()
-        if len(org) > 3 and len(org) < 150:
-            return org[:100]
-
-    return "Not specified"
-
-def extract_date(caption):
-    """Extract event date in YYYY-MM-DD format"""
-    caption = clean_caption(caption)
-    if not caption:
-        return "Not specified"
-
-    month_map = {
-        'januari': '01', 'january': '01', 'jan': '01',
-        'februari': '02', 'february': '02', 'feb': '02',
-        'maret': '03', 'march': '03', 'mar': '03',
-        'april': '04', 'apr': '04',
-        'mei': '05', 'may': '05',
-        'juni': '06', 'june': '06', 'jun': '06',
-        'juli': '07', 'july': '07', 'jul': '07',
-        'agustus': '08', 'august': '08', 'aug': '08',
-        'september': '09', 'sep': '09', 'sept': '09',
-        'oktober': '10', 'october': '10', 'oct': '10',
-        'november': '11', 'nov': '11',
-        'desember': '12', 'december': '12', 'dec': '12'
-    }
-
-    # Pattern: DD Month YYYY
-    match = re.search(r'(\d{1,2})\s+(Januari|Februari|Maret|April|Mei|Juni|Juli|Agustus|September|Oktober|November|Desember|January|February|March|April|May|June|July|August|September|October|November|December)\s+(\d{4})', caption, re.IGNORECASE)
-    if match:
-        day, month_name, year = match.groups()
-        month = month_map.get(month_name.lower(), '01')
-        return f"{year}-{month}-{day.zfill(2)}"
-
-    # Pattern: Month DD, YYYY
-    match = re.search(r'(Januari|Februari|Maret|April|Mei|Juni|Juli|Agustus|September|Oktober|November|Desember|January|February|March|April|May|June|July|August|September|October|November|December)\s+(\d{1,2}),?\s+(\d{4})', caption, re.IGNORECASE)
-    if match:
-        month_name, day, year = match.groups()
-        month = month_map.get(month_name.lower(), '01')
-        return f"{year}-{month}-{day.zfill(2)}"
-
-    # Try YYYY-MM-DD
-    match = re.search(r'(\d{4})-(\d{1,2})-(\d{1,2})', caption)
-    if match:
-        return f"{match.group(1)}-{match.group(2).zfill(2)}-{match.group(3).zfill(2)}"
-
-    # Try MM/DD/YYYY or DD/MM/YYYY
-    match = re.search(r'(\d{1,2})/(\d{1,2})/(\d{4})', caption)
-    if match:
-        m, d, y = match.groups()
-        # Assume first is month
-        return f"{y}-{m.zfill(2)}-{d.zfill(2)}"
-
-    return "Not specified"
-
-def extract_location(caption):
-    """Extract event location"""
-    caption = clean_caption(caption)
-    if not caption:
-        return "Not specified"
-
-    caption_lower = caption.lower()
-
-    # Check for explicit location keywords
-    patterns = [
-        r'(?:tempat|location|venue|lokasi|place|platform)\s*[:\-]?\s*([^\n📝📅📆💰📞📲]+?)(?:\n|📝|📅|📆|💰|📞|📲|$)',
-        r'pelaksanaan\s*[:\-]?\s*([^\n📝📅📆💰📞]+?)(?:\n|📝|📅|📆|💰|📞|$)',
-    ]
-
-    for pattern in patterns:
-        match = re.search(pattern, caption, re.IGNORECASE)
-        if match:
-            loc = match.group(1).strip()
-            loc = re.sub(r'\s+', ' ', loc)
-            loc = re.sub(r'[^\w\s\-\.\,]+', '', loc)
-            if 2 < len(loc) < 100:
-                return loc
-
-    # Check for online/offline
-    if 'online' in caption_lower and 'offline' not in caption_lower:
-        return "Online"
-    if 'offline' in caption_lower:
-        match = re.search(r'offline\s+(?:di\s+)?([^\n📝📅📆💰📞]+)', caption_lower)
-        if match:
-            loc = match.group(1).strip()
-            loc = re.sub(r'\s+', ' ', loc)
-            loc = re.sub(r'[^\w\s\-\.\,]+', '', loc)
-            if len(loc) > 2:
-                return f"Offline: {loc[:50]}"
-
-    return "Not specified"
-
-def extract_fee(caption):
-    """Extract registration fee"""
-    caption = clean_caption(caption)
-    if not caption:
-        return "Not specified"
-
-    # Look for FREE/Gratis
-    if re.search(r'\b(?:FREE|Gratis|gratis|free)\b', caption):
-        return "FREE"
-
-    # Look for fee patterns - extract Rp values
-    patterns = [
-        r'(?:biaya|fee|harga|pendaftaran|registration)\s*(?:gelombang\s+[\w\s]+\s*)?[:\-]?\s*Rp\.?\s*([\d\.]+)',
-        r'gelombang\s+[\w\s]+\s*[:\-]?\s*Rp\.?\s*([\d\.]+)',
-        r'Rp\.?\s*([\d\.]+)\s*(?:,-|\.)\s*',
-        r'Insert\s*[:\.]?\s*(?:\d+[\.\s]*)+',
-    ]
-
-    fees = []
-    for pattern in patterns:
-        matches = re.finditer(pattern, caption, re.IGNORECASE)
-        for match in matches:
-            fee = match.group(1) if match.groups() else match.group(0)
-            # Clean up fee
-            fee = re.sub(r'[^\d]', '', fee)
-            if fee.isdigit() and int(fee) > 1000:  # Minimum fee of 1000
-                fees.append(int(fee))
-
-    if fees:
-        min_fee = min(fees)
-        max_fee = max(fees)
-        if min_fee == max_fee:
-            return f"Rp {min_fee:,}"
+from functools import partial
+
+# The extractors live in extractors.py; they are re-exported here so existing
+# `from final_parse import parse_caption` callers keep working.
+from extractors import (  # noqa: F401
+    FIELDS, _from_section, clean_caption, extract_contacts, extract_date, extract_fee,
+    extract_location, extract_organizer, extract_title, parse_caption, select_fields,
+)
+from parsed_post import ParsedPost, parsed_output_path, read_posts, write_posts, write_posts_json
+
+# Rows between checkpoints of a run (see --checkpoint-every / --resume)
+DEFAULT_CHECKPOINT_EVERY = 200
+# Captions with the sections and fields they should give (see --check)
+CAPTION_FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'captions.json')
+
+def parse_post(post, fields=None, select=None):
+    """Fill the extracted fields of a ParsedPost in place (fields: precomputed parse_caption result,
+    select: only extract these field names; the other columns are left as they are).
+    A row that was not parsed before and gets only some of the fields is marked 'partial'."""
+    if fields is None:
+        fields = parse_caption(post.original_caption, fields=select)
+    for field, value in fields.items():
+        setattr(post, field, value)
+    if post.parse_status != 'parsed' and not all(name in fields for name in FIELDS):
+        post.parse_status = 'partial'
+    else:
+        post.parse_status = 'parsed'
+    post.parse_timestamp = datetime.now().isoformat() + 'Z'
+    post.last_edited = 'claude'
+    return post
+
+def parse_args():
+    # guard pulls in multiprocessing; only the command line needs it, not importers
+    from guard import DEFAULT_ROW_BUDGET
+
+    parser = argparse.ArgumentParser(description='Parse infolomba captions in a parsed#N CSV')
+    parser.add_argument('input', nargs='?', help='parsed#N CSV to read')
+    parser.add_argument('output', nargs='?', default=None, help='CSV to write (default: <input>-parsed.csv)')
+    parser.add_argument('--guard', action='store_true',
+                        help='Run extraction in a worker with a per-row time budget')
+    parser.add_argument('--row-budget', type=float, default=DEFAULT_ROW_BUDGET,
+                        help=f'Seconds per caption in --guard mode (default: {DEFAULT_ROW_BUDGET})')
+    parser.add_argument('--quarantine', default=None,
+                        help='JSONL file for rows over budget (default: <output>.quarantine.jsonl)')
+    parser.add_argument('--json', default=None, metavar='PATH',
+                        help='Also write the posts as MASTER_RULE output JSON')
+    parser.add_argument('--checkpoint', default=None,
+                        help='Checkpoint journal (default: <output>.checkpoint.jsonl)')
+    parser.add_argument('--checkpoint-every', type=int, default=DEFAULT_CHECKPOINT_EVERY,
+                        help=f'Rows between checkpoints (default: {DEFAULT_CHECKPOINT_EVERY})')
+    parser.add_argument('--resume', action='store_true',
+                        help='Continue from the checkpoint of an interrupted run')
+    parser.add_argument('--metrics', default=None, metavar='PATH',
+                        help='Write a Prometheus textfile for the run (e.g. for node-exporter)')
+    parser.add_argument('--fields', default=None,
+                        help='Only extract these fields, e.g. title,date or contacts (default: all); '
+                             'rows not parsed before get parse_status "partial"')
+    parser.add_argument('--check', nargs='?', const=CAPTION_FIXTURES, default=None, metavar='PATH',
+                        help='Check the segmenter and extractors against fixture captions '
+                             '(default: fixtures/captions.json)')
+    # '' means aggregates.py's default file; resolved in main() so startup does not import aggregates
+    parser.add_argument('--aggregates', nargs='?', const='', default=None, metavar='PATH',
+                        help='Update the event aggregates with this run (default path: parsed/aggregates.json)')
+    args = parser.parse_args()
+    if args.check:
+        return args
+    if args.input is None:
+        parser.error('the following arguments are required: input')
+    if args.output is None:
+        args.output = parsed_output_path(args.input)
+    try:
+        args.fields = select_fields(args.fields) if args.fields else None
+    except ValueError as e:
+        parser.error(f"--fields: {e}")
+    if args.quarantine is None:
+        args.quarantine = os.path.splitext(args.output)[0] + '.quarantine.jsonl'
+    if args.checkpoint is None:
+        args.checkpoint = os.path.splitext(args.output)[0] + '.checkpoint.jsonl'
+    return args
+
+def append_journal(journal, records):
+    """Append JSON lines to the checkpoint journal and flush them to disk"""
+    for record in records:
+        journal.write(json.dumps(record, ensure_ascii=False) + '\n')
+    journal.flush()
+    os.fsync(journal.fileno())
+
+def open_journal(path, input_path, posts):
+    """Start a checkpoint journal: a header line, then one line per finished row.
+
+    Rows are only ever appended, so a checkpoint costs the rows since the
+    last one, not a rewrite of everything done so far."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    journal = open(path, 'w', encoding='utf-8')
+    append_journal(journal, [{
+        'input': os.path.abspath(input_path),
+        'total': len(posts),
+        'started': datetime.now().isoformat() + 'Z',
+    }])
+    return journal
+
+def resume_journal(path, input_path, posts, row_budget, quarantine_path):
+    """Restore journaled rows into posts; returns (rows already done, journal open for appending).
+
+    A row the interrupted run failed on (an exception, or Ctrl-C after it had
+    run for row_budget seconds) is quarantined instead of being parsed
+    again, so a caption that crashes or hangs the parser cannot stop every
+    resumed run at the same row."""
+    completed = 0
+    try:
+        with open(path, 'rb') as f:
+            header = json.loads(f.readline())
+    except (OSError, ValueError):
+        print(f"No checkpoint at {path}, starting from the first row")
+        return 0, open_journal(path, input_path, posts)
+    if header['input'] != os.path.abspath(input_path) or header['total'] != len(posts):
+        raise SystemExit(f"Checkpoint {path} was written for a different input; "
+                         f"delete it or run without --resume")
+    with open(path, 'r+b') as f:
+        good = len(f.readline())
+        failed = None
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break  # torn last line of a killed run
+            index = record['index']
+            if index >= len(posts):
+                raise SystemExit(f"Checkpoint {path} has row {index} but {input_path} only has {len(posts)} rows; "
+                                 f"delete it or run without --resume")
+            if index != completed or posts[index].post_index != record['post_index']:
+                raise SystemExit(f"Checkpoint {path} does not match {input_path} at row {index}; "
+                                 f"delete it or run without --resume")
+            good += len(line)
+            if 'failed' in record:
+                failed = record
+            else:
+                posts[index] = ParsedPost.from_row(record['row'])
+                completed, failed = index + 1, None
+        f.truncate(good)
+    journal = open(path, 'a', encoding='utf-8')
+    print(f"Resuming after {completed}/{len(posts)} rows")
+
+    if failed is not None and (failed['failed'] != 'interrupted' or failed['elapsed'] >= row_budget):
+        from guard import write_quarantined
+
+        post = posts[completed]
+        post.parse_status = 'quarantined'
+        write_quarantined(quarantine_path, post.original_caption, post, failed['failed'], failed['elapsed'])
+        print(f"  ! Quarantined post {post.post_index}: the last run stopped on it ({failed['failed']})")
+        append_journal(journal, [{'index': completed, 'post_index': post.post_index, 'row': post.to_row()}])
+        completed += 1
+    return completed, journal
+
+def check_fixtures(path):
+    """Segment and parse each fixture caption and compare; returns the number of mismatches.
+
+    A case lists its expected sections (all of them, head aside) and any
+    subset of the extracted fields."""
+    from segment import segment_caption
+
+    with open(path, 'r', encoding='utf-8') as f:
+        cases = json.load(f)
+    failures = 0
+    for number, case in enumerate(cases, 1):
+        sections = segment_caption(clean_caption(case['caption']))
+        sections.pop('head', None)
+        fields = parse_caption(case['caption'], fields=list(case.get('fields', ())))
+        wrong = [('sections', sections, case['sections'])] if sections != case['sections'] else []
+        wrong += [(name, fields[name], want) for name, want in case.get('fields', {}).items() if fields[name] != want]
+        label = case['caption'].split('\n', 1)[0][:40]
+        if wrong:
+            failures += 1
+            print(f"  FAIL {number} {label}:")
+            for name, got, want in wrong:
+                print(f"    {name}: got {got!r}, expected {want!r}")
         else:
-            return f"Rp {min_fee:,} - Rp {max_fee:,}"
-
-    return "Not specified"
-
-def extract_contacts(caption):
-    """Extract contact persons as JSON array"""
-    caption = clean_caption(caption)
-    if not caption:
-        return "[]"
-
-    contacts = []
-    seen_phones = set()
-
-    # Pattern 1: "Name : Phone" or "Name Telepon : Phone"
-    matches = re.finditer(r'([A-Z][a-z]+(?:\s+[A-Z][a-z]+)?)\s*(?:Telepon|Phone|WA|wa\.me)?\s*[:\-]\s*(?:0|\+62|62)?(\d{8,12})', caption)
-    for match in matches:
-        name = match.group(1).strip()
-        phone = match.group(2)
-        if not phone.startswith('0'):
-            phone = '0' + phone
-        if len(phone) >= 10 and phone not in seen_phones:
-            contacts.append({"name": name, "phone": phone})
-            seen_phones.add(phone)
-
-    # Pattern 2: "wa.me/phone"
-    wa_matches = re.finditer(r'wa\.me/(\+62|62)?(\d{8,12})', caption)
-    for match in wa_matches:
-        phone = match.group(2) if match.group(2) else match.group(1)
-        if not phone.startswith('0'):
-            phone = '0' + phone
-        if len(phone) >= 10 and phone not in seen_phones:
-            contacts.append({"name": "Admin", "phone": phone})
-            seen_phones.add(phone)
-
-    # Pattern 3: Look for phone numbers in format "Name (Phone)"
-    paren_matches = re.finditer(r'([A-Z][a-z]+(?:\s+[A-Z][a-z]+)?)\s*\((0|\+62|62)?(\d{8,12})\)', caption)
-    for match in paren_matches:
-        name = match.group(1).strip()
-        phone = match.group(3) if match.group(3) else match.group(2)
-        if not phone.startswith('0'):
-            phone = '0' + phone
-        if len(phone) >= 10 and phone not in seen_phones:
-            contacts.append({"name": name, "phone": phone})
-            seen_phones.add(phone)
-
-    # Pattern 4: Look for standalone phone numbers preceded by names
-    # This catches patterns like "Kristian : 082110608308"
-    standalone_matches = re.finditer(r'([A-Z][a-z]+(?:\s+[A-Z][a-z]+)?)\s*:\s*(0|\+62|62)?(\d{8,12})', caption)
-    for match in standalone_matches:
-        name = match.group(1).strip()
-        phone = match.group(3) if match.group(3) else match.group(2)
-        if not phone.startswith('0'):
-            phone = '0' + phone
-        if len(phone) >= 10 and phone not in seen_phones:
-            contacts.append({"name": name, "phone": phone})
-            seen_phones.add(phone)
-
-    # Pattern 5: Look for any remaining phone numbers
-    phone_pattern = r'(?:0|\+62|62)(\d{8,12})'
-    for match in re.finditer(phone_pattern, caption):
-        phone = match.group(0)
-        if not phone.startswith('0'):
-            phone = '0' + phone[2:] if phone.startswith('+62') else '0' + phone
-        if len(phone) >= 10 and phone not in seen_phones:
-            contacts.append({"name": "Admin", "phone": phone})
-            seen_phones.add(phone)
-
-    return json.dumps(contacts, ensure_ascii=False)
-
-# Read and process CSV
-with open(input_file, 'r', encoding='utf-8') as f:
-    reader = csv.DictReader(f)
-    rows = list(reader)
-
-parsed_rows = []
-for row in rows:
-    caption = row.get('original_caption', '')
-
-    # Parse the caption
-    title = extract_title(caption)
-    organizer = extract_organizer(caption)
-    date = extract_date(caption)
-    location = extract_location(caption)
-    fee = extract_fee(caption)
-    contacts = extract_contacts(caption)
-
-    # Update row
-    row['extracted_title'] = title
-    row['extracted_organizer'] = organizer
-    row['extracted_date'] = date
-    row['extracted_location'] = location
-    row['registration_fee'] = fee
-    row['contact_persons'] = contacts
-    row['parse_status'] = 'parsed'
-    row['parse_timestamp'] = datetime.now().isoformat() + 'Z'
-    row['last_edited'] = 'claude'
-
-    parsed_rows.append(row)
-
-# Write parsed CSV
-with open(output_file, 'w', encoding='utf-8', newline='') as f:
-    fieldnames = [
-        'session_id', 'json_file', 'post_index', 'post_url', 'original_caption',
-        'extracted_title', 'extracted_organizer', 'extracted_date', 'extracted_location',
-        'registration_fee', 'phone_numbers', 'contact_persons', 'parse_status',
-        'parse_timestamp', 'last_edited'
-    ]
-    writer = csv.DictWriter(f, fieldnames=fieldnames, extrasaction='ignore')
-    writer.writeheader()
-    writer.writerows(parsed_rows)
-
-print(f"Parsed {len(parsed_rows)} rows")
-
-# Print sample results
-with open(r'D:\Hilmi\Coding\WebScraper\parsed\sample_results.txt', 'w', encoding='utf-8') as f:
-    for i, row in enumerate(parsed_rows[:5]):
-        f.write(f"\n=== Row {i} ===\n")
-        f.write(f"Title: {row['extracted_title']}\n")
-        f.write(f"Organizer: {row['extracted_organizer']}\n")
-        f.write(f"Date: {row['extracted_date']}\n")
-        f.write(f"Location: {row['extracted_location']}\n")
-        f.write(f"Fee: {row['registration_fee']}\n")
-        f.write(f"Contacts: {row['contact_persons']}\n")
-
-print("Sample results saved to sample_results.txt")
+            print(f"  OK   {number} {label}")
+    print(f"{len(cases) - failures}/{len(cases)} fixture captions match")
+    return failures
+
+def main():
+    args = parse_args()
+    if args.check:
+        raise SystemExit(1 if check_fixtures(args.check) else 0)
+    run_start = time.perf_counter()
+
+    # Read and process CSV
+    posts = read_posts(args.input)
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    if args.resume:
+        start, journal = resume_journal(args.checkpoint, args.input, posts, args.row_budget, args.quarantine)
+    else:
+        start, journal = 0, open_journal(args.checkpoint, args.input, posts)
+    completed = start
+
+    guard = None
+    if args.guard:
+        from guard import RowGuard
+        # A resumed run keeps the rows the interrupted one quarantined
+        if args.fields:
+            guard = RowGuard(args.row_budget, args.quarantine, target=partial(parse_caption, fields=args.fields),
+                             append=args.resume)
+        else:
+            guard = RowGuard(args.row_budget, args.quarantine, append=args.resume)
+    pending = []
+    current = None
+    try:
+        for i in range(start, len(posts)):
+            post = posts[i]
+            current, row_start = i, time.perf_counter()
+            if guard is None:
+                parse_post(post, select=args.fields)
+            else:
+                fields = guard.parse(post)
+                if fields is None:
+                    post.parse_status = 'quarantined'
+                else:
+                    parse_post(post, fields)
+            current = None
+            pending.append({'index': i, 'post_index': post.post_index, 'row': post.to_row()})
+            completed = i + 1
+            if args.checkpoint_every and len(pending) >= args.checkpoint_every:
+                append_journal(journal, pending)
+                pending = []
+    except BaseException as e:
+        # Bad caption, Ctrl-C, ...: keep what is done so --resume can pick it up,
+        # and note the row it stopped on so --resume does not run it again
+        if current is not None:
+            reason = 'interrupted' if isinstance(e, KeyboardInterrupt) else f"{type(e).__name__}: {e}"
+            pending.append({'index': current, 'post_index': posts[current].post_index, 'failed': reason,
+                            'elapsed': round(time.perf_counter() - row_start, 3)})
+        append_journal(journal, pending)
+        print(f"\nStopped after {completed}/{len(posts)} rows; checkpoint: {args.checkpoint} "
+              f"(rerun with --resume)")
+        raise
+    finally:
+        journal.close()
+        if guard is not None:
+            guard.close()
+    if guard is not None and guard.quarantined:
+        print(f"Quarantined {guard.quarantined} rows to {args.quarantine}")
+
+    # Write parsed CSV
+    write_posts(args.output, posts)
+
+    print(f"Parsed {len(posts)} rows")
+    if os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+
+    if args.json:
+        write_posts_json(args.json, posts)
+        print(f"JSON output saved to {args.json}")
+
+    if args.metrics:
+        from metrics import cache_counts, field_missing, write_textfile
+        write_textfile(args.metrics, len(posts), time.perf_counter() - run_start, field_missing(posts),
+                       quarantined=guard.quarantined if guard is not None else 0,
+                       labels={'script': 'final_parse'}, caches=cache_counts())
+        print(f"Metrics saved to {args.metrics}")
+
+    if args.aggregates is not None:
+        from aggregates import AGGREGATES_FILE, update_store
+        path = args.aggregates or AGGREGATES_FILE
+        added, changed = update_store(posts, path)
+        print(f"Aggregates: {added} posts added, {changed} updated in {path}")
+
+    # Print sample results next to the output CSV
+    sample_path = os.path.join(os.path.dirname(os.path.abspath(args.output)), 'sample_results.txt')
+    with open(sample_path, 'w', encoding='utf-8') as f:
+        for i, post in enumerate(posts[:5]):
+            f.write(f"\n=== Row {i} ===\n")
+            f.write(f"Title: {post.extracted_title}\n")
+            f.write(f"Organizer: {post.extracted_organizer}\n")
+            f.write(f"Date: {post.extracted_date}\n")
+            f.write(f"Location: {post.extracted_location}\n")
+            f.write(f"City: {post.location_city}, {post.location_province}\n")
+            f.write(f"Fee: {post.registration_fee}\n")
+            f.write(f"Contacts: {post.contact_persons}\n")
+
+    print(f"Sample results saved to {sample_path}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+import json
+import os
+import re
+import unicodedata
+from collections import Counter, namedtuple
+
+from rules import RULES_DIR, HotReload
+
+# Indonesian place names (cities, regencies, provinces and universities) from
+# rules/gazetteer.json, matched in one left-to-right scan over the caption's
+# word tokens. Names are stored in a trie keyed by casefolded tokens, so
+# "Jakarta Selatan" and "Universitas Negeri Malang" are found by walking
+# the trie from each token and keeping the longest match; there is no
+# per-name regex. Every match resolves to a (city, province) pair:
+# universities to the city of their main campus, regencies to themselves,
+# provinces to ('', province).
+#
+# Only capitalized tokens match ("Malang", not "malang"), acronyms (UGM,
+# Unpad) match with their own casing or in capitals, and names that are
+# also ordinary words (Batu, Medan, Padang, ...) need a preceding "kota",
+# "kab.", "di", "in", ... outside the caption's location section. Like
+# rules.py, current() reloads the file when it changes.
+
+GAZETTEER_FILE = os.path.join(RULES_DIR, 'gazetteer.json')
+
+CITY, REGENCY, UNIVERSITY, PROVINCE = 'city', 'regency', 'university', 'province'
+
+Place = namedtuple('Place', 'kind name city province strict exact')
+Location = namedtuple('Location', 'city province')
+NO_LOCATION = Location('', '')
+
+_TOKEN = re.compile(r'[^\W_]+')
+_COMBINING = re.compile('[\u0300-\u036f]')
+_END = ''
+
+
+def fold(text):
+    """Styled / accented letters -> plain ones (NFKD without combining marks), casing kept"""
+    return _COMBINING.sub('', unicodedata.normalize('NFKD', text))
+
+
+def _key(name):
+    return tuple(token.casefold() for token in _TOKEN.findall(fold(name)))
+
+
+class Gazetteer:
+    """Token trie of place names plus the words that make an ambiguous name a place"""
+
+    def __init__(self, data):
+        try:
+            self.version = data.get('version', 0)
+            self.prefixes = frozenset(word.casefold() for word in data['ambiguous_prefixes'])
+            ambiguous = {_key(name) for name in data['ambiguous']}
+            places = {}
+            for province, members in data['provinces'].items():
+                for kind, section in ((CITY, 'cities'), (REGENCY, 'regencies')):
+                    for name in members[section]:
+                        places.setdefault(name, Place(kind, name, name, province, False, False))
+
+            # Most specific first: a name listed twice keeps its first meaning
+            entries = []
+            for name, city in list(data['universities'].items()) + list(data['acronyms'].items()):
+                place = places[city]
+                entries.append(place._replace(kind=UNIVERSITY, name=name, exact=name in data['acronyms']))
+            entries += places.values()
+            for alias, city in data['city_aliases'].items():
+                entries.append(places[city]._replace(name=alias))
+            provinces = {name: Place(PROVINCE, name, '', name, False, False) for name in data['provinces']}
+            entries += provinces.values()
+            for alias, province in data['province_aliases'].items():
+                entries.append(provinces[province]._replace(name=alias, exact=alias.isupper()))
+        except KeyError as e:
+            raise ValueError(f"missing gazetteer section or unknown place {e}") from e
+        except (TypeError, AttributeError) as e:
+            raise ValueError(f"malformed gazetteer: {e}") from e
+
+        self.root = {}
+        self.size = 0
+        for place in entries:
+            key = _key(place.name)
+            if not key:
+                raise ValueError(f"place name without letters: {place.name!r}")
+            node = self.root
+            for token in key:
+                node = node.setdefault(token, {})
+            if _END not in node:
+                node[_END] = place._replace(strict=key in ambiguous)
+                self.size += 1
+
+    def __repr__(self):
+        return f"Gazetteer(version={self.version!r}, names={self.size})"
+
+    def _accepts(self, place, tokens, start, strict):
+        first = tokens[start]
+        if place.exact:
+            if first != place.name and first != place.name.upper():
+                return False
+        elif not first[0].isupper():
+            return False
+        if strict and place.strict:
+            return start > 0 and tokens[start - 1].casefold() in self.prefixes
+        return True
+
+    def mentions(self, text, strict=True):
+        """Places named in text, in order (longest match at each token, no overlaps)"""
+        tokens = _TOKEN.findall(fold(text))
+        keys = [token.casefold() for token in tokens]
+        found = []
+        i = 0
+        while i < len(keys):
+            node = self.root.get(keys[i])
+            match = None
+            j = i
+            while node is not None:
+                j += 1
+                place = node.get(_END)
+                if place is not None and self._accepts(place, tokens, i, strict):
+                    match = (place, j)
+                node = node.get(keys[j]) if j < len(keys) else None
+            if match is None:
+                i += 1
+            else:
+                found.append(match[0])
+                i = match[1]
+        return found
+
+    def locate(self, text, section=None):
+        """The caption's (city, province).
+
+        A place named in the location section wins (ambiguous names need no
+        prefix there, and a city beats a province); otherwise the city
+        mentioned most often in the whole text, ties going to the first. A
+        caption that only names a province gets ('', province).
+        """
+        if section:
+            places = self.mentions(section, strict=False)
+            for place in places:
+                if place.kind != PROVINCE:
+                    return Location(place.city, place.province)
+            if places:
+                return Location('', places[0].province)
+        places = self.mentions(text)
+        for kinds in ((CITY, REGENCY, UNIVERSITY), (PROVINCE,)):
+            counts = Counter(Location(place.city, place.province) for place in places if place.kind in kinds)
+            if counts:
+                # most_common keeps first-seen order among equal counts
+                return counts.most_common(1)[0][0]
+        return NO_LOCATION
+
+
+def load(path=GAZETTEER_FILE):
+    with open(path, 'r', encoding='utf-8') as f:
+        return Gazetteer(json.load(f))
+
+
+_gazetteer = HotReload(load)
+
+
+def current(path=None):
+    """The gazetteer in effect, reloaded when the file has changed (see rules.current)"""
+    return _gazetteer.get(path or GAZETTEER_FILE)
+
+
+def locate(text, section=None):
+    """(city, province) of a caption body, optionally with its location section"""
+    return current().locate(text, section)
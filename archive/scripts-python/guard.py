@@ -0,0 +1,128 @@
+import json
+import multiprocessing
+import os
+import time
+
+# Seconds a single caption may take before it is quarantined
+DEFAULT_ROW_BUDGET = 2.0
+
+
+def _worker(conn, target):
+    """Worker loop: receive captions, send back (status, value, cpu_seconds)"""
+    while True:
+        caption = conn.recv()
+        if caption is None:
+            break
+        start = time.process_time()
+        try:
+            result = target(caption)
+            conn.send(('ok', result, time.process_time() - start))
+        except Exception as e:
+            conn.send(('error', f"{type(e).__name__}: {e}", time.process_time() - start))
+
+
+def _default_target(caption):
+    from extractors import parse_caption
+    return parse_caption(caption)
+
+
+class RowGuard:
+    """Run extraction in a worker process with a per-row time budget.
+
+    The re module cannot be interrupted mid-match, so a caption that makes a
+    pattern backtrack for minutes can only be stopped by killing the process
+    running it. A row that exceeds the budget (or raises) is written to the
+    quarantine JSONL file, the worker is restarted and the run continues.
+    The file holds one run's rows: an existing file is removed when the
+    guard is created, unless append=True (a resumed run adds to it).
+
+    Usage:
+        with RowGuard(budget=2.0, quarantine_path='run.quarantine.jsonl') as guard:
+            fields = guard.parse(post)   # None when the row was quarantined
+    """
+
+    def __init__(self, budget=DEFAULT_ROW_BUDGET, quarantine_path=None, target=_default_target, append=False):
+        self.budget = budget
+        self.quarantine_path = quarantine_path
+        if quarantine_path and not append and os.path.exists(quarantine_path):
+            os.remove(quarantine_path)
+        self.target = target
+        self.quarantined = 0
+        self.max_cpu = 0.0
+        self._process = None
+        self._conn = None
+
+    def __enter__(self):
+        self._start()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _start(self):
+        parent, child = multiprocessing.Pipe()
+        self._process = multiprocessing.Process(target=_worker, args=(child, self.target), daemon=True)
+        self._process.start()
+        child.close()
+        self._conn = parent
+
+    def _kill(self):
+        self._process.terminate()
+        self._process.join()
+        self._conn.close()
+        self._process = None
+
+    def close(self):
+        if self._process is not None:
+            try:
+                self._conn.send(None)
+                self._process.join(timeout=1)
+            except (BrokenPipeError, OSError):
+                pass
+            if self._process.is_alive():
+                self._process.terminate()
+            self._conn.close()
+            self._process = None
+
+    def parse(self, post):
+        """Extract one post; returns the target's result or None if quarantined"""
+        return self.run(post.original_caption, post)
+
+    def run(self, caption, post=None):
+        if self._process is None:
+            self._start()
+        start = time.perf_counter()
+        self._conn.send(caption)
+        if self._conn.poll(self.budget):
+            status, value, cpu = self._conn.recv()
+            self.max_cpu = max(self.max_cpu, cpu)
+            if status == 'ok':
+                return value
+            reason = value
+        else:
+            self._kill()
+            reason = f"exceeded {self.budget}s budget"
+        self._quarantine(caption, post, reason, time.perf_counter() - start)
+        return None
+
+    def _quarantine(self, caption, post, reason, elapsed):
+        self.quarantined += 1
+        if post is not None:
+            print(f"  ! Quarantined post {post.post_index}: {reason}")
+        if self.quarantine_path:
+            write_quarantined(self.quarantine_path, caption, post, reason, elapsed)
+
+
+def write_quarantined(path, caption, post, reason, elapsed):
+    """Append one quarantined row to a quarantine JSONL file"""
+    record = {
+        'session_id': post.session_id if post else '',
+        'json_file': post.json_file if post else '',
+        'post_index': post.post_index if post else None,
+        'post_url': post.post_url if post else '',
+        'reason': reason,
+        'elapsed': round(elapsed, 3),
+        'original_caption': caption,
+    }
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record, ensure_ascii=False) + '\n')
@@ -1,11 +1,10 @@
-import csv
 import json
+import os
 import re
+import sys
 from datetime import datetime
 
-# Read the CSV file
-input_file = r'D:\Hilmi\Coding\WebScraper\parsed\parsed-304b7acd-1768128145689.csv'
-output_file = r'D:\Hilmi\Coding\WebScraper\parsed\parsed-304b7acd-1768128145689-parsed.csv'
+from parsed_post import SCRAPER_FIELDNAMES, parsed_output_path, read_posts, write_posts
 
 def clean_caption(caption):
     """Clean the Instagram caption format"""
@@ -266,60 +265,47 @@ def extract_contacts(caption):
 
     return json.dumps(contacts, ensure_ascii=False)
 
-# Read and process CSV
-with open(input_file, 'r', encoding='utf-8') as f:
-    reader = csv.DictReader(f)
-    rows = list(reader)
-
-parsed_rows = []
-for row in rows:
-    caption = row.get('original_caption', '')
-
-    # Parse the caption
-    title = extract_title(caption)
-    organizer = extract_organizer(caption)
-    date = extract_date(caption)
-    location = extract_location(caption)
-    fee = extract_fee(caption)
-    contacts = extract_contacts(caption)
-
-    # Update row
-    row['extracted_title'] = title
-    row['extracted_organizer'] = organizer
-    row['extracted_date'] = date
-    row['extracted_location'] = location
-    row['registration_fee'] = fee
-    row['contact_persons'] = contacts
-    row['parse_status'] = 'parsed'
-    row['parse_timestamp'] = datetime.now().isoformat() + 'Z'
-    row['last_edited'] = 'claude'
-
-    parsed_rows.append(row)
-
-# Write parsed CSV
-with open(output_file, 'w', encoding='utf-8', newline='') as f:
-    fieldnames = [
-        'session_id', 'json_file', 'post_index', 'post_url', 'original_caption',
-        'extracted_title', 'extracted_organizer', 'extracted_date', 'extracted_location',
-        'registration_fee', 'phone_numbers', 'contact_persons', 'parse_status',
-        'parse_timestamp', 'last_edited'
-    ]
-    writer = csv.DictWriter(f, fieldnames=fieldnames, extrasaction='ignore')
-    writer.writeheader()
-    writer.writerows(parsed_rows)
-
-print(f"Parsed {len(parsed_rows)} rows")
-print(f"Output saved to: {output_file}")
-
-# Save sample results to file for inspection
-with open(r'D:\Hilmi\Coding\WebScraper\parsed\sample_results.txt', 'w', encoding='utf-8') as f:
-    for i, row in enumerate(parsed_rows[:5]):
-        f.write(f"\n=== Row {i} ===\n")
-        f.write(f"Title: {row['extracted_title']}\n")
-        f.write(f"Organizer: {row['extracted_organizer']}\n")
-        f.write(f"Date: {row['extracted_date']}\n")
-        f.write(f"Location: {row['extracted_location']}\n")
-        f.write(f"Fee: {row['registration_fee']}\n")
-        f.write(f"Contacts: {row['contact_persons']}\n")
-
-print("Sample results saved to sample_results.txt")
+def main(input_path, output_path=None):
+    output_path = output_path or parsed_output_path(input_path)
+
+    # Read and process CSV
+    posts = read_posts(input_path)
+
+    for post in posts:
+        caption = post.original_caption
+
+        # Parse the caption
+        post.extracted_title = extract_title(caption)
+        post.extracted_organizer = extract_organizer(caption)
+        post.extracted_date = extract_date(caption)
+        post.extracted_location = extract_location(caption)
+        post.registration_fee = extract_fee(caption)
+        post.contact_persons = extract_contacts(caption)
+        post.parse_status = 'parsed'
+        post.parse_timestamp = datetime.now().isoformat() + 'Z'
+        post.last_edited = 'claude'
+
+    # Write parsed CSV (the scraper's columns)
+    write_posts(output_path, posts, SCRAPER_FIELDNAMES)
+
+    print(f"Parsed {len(posts)} rows")
+    print(f"Output saved to: {output_path}")
+
+    # Save sample results next to the output file for inspection
+    sample_path = os.path.join(os.path.dirname(os.path.abspath(output_path)), 'sample_results.txt')
+    with open(sample_path, 'w', encoding='utf-8') as f:
+        for i, post in enumerate(posts[:5]):
+            f.write(f"\n=== Row {i} ===\n")
+            f.write(f"Title: {post.extracted_title}\n")
+            f.write(f"Organizer: {post.extracted_organizer}\n")
+            f.write(f"Date: {post.extracted_date}\n")
+            f.write(f"Location: {post.extracted_location}\n")
+            f.write(f"Fee: {post.registration_fee}\n")
+            f.write(f"Contacts: {post.contact_persons}\n")
+
+    print(f"Sample results saved to {sample_path}")
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        sys.exit("Usage: python manual_parse.py <parsed#N CSV> [output CSV]")
+    main(*sys.argv[1:3])
@@ -0,0 +1,131 @@
+"""Prometheus textfile for parse runs.
+
+final_parse.py --metrics and batch.py --metrics write one of these at the
+end of a run in the Prometheus text exposition format, which is what
+node-exporter's textfile collector reads:
+
+  infolomba_parse_rows                       rows processed
+  infolomba_parse_rows_per_second            throughput of the run
+  infolomba_parse_field_missing_ratio        share of rows where title, date, fee
+                                             or contacts ended up "Not specified"
+  infolomba_parse_errors                     rows that failed to parse
+  infolomba_parse_quarantined                rows quarantined by --guard
+  infolomba_parse_cache_hits_total           cache lookups that hit, per cache:
+  infolomba_parse_cache_misses_total         "patterns" (compiled regexes) and
+                                             "rules" (expanded rules.json on disk)
+  infolomba_parse_cache_hit_ratio            hits / lookups, per cache
+
+The cache counters count from the start of the run (so they reset on every
+run, which rate() handles); everything else describes the last run and is a
+gauge. With final_parse.py --guard the rows are parsed in a child process
+whose caches are not counted. The file is replaced atomically so the
+collector never reads half of it.
+"""
+import os
+import time
+
+from parsed_post import replace_file
+
+PREFIX = 'infolomba_parse'
+
+# Field label -> column; a value in MISSING_VALUES counts as not extracted
+FILL_FIELDS = {
+    'title': 'extracted_title',
+    'date': 'extracted_date',
+    'fee': 'registration_fee',
+    'contacts': 'contact_persons',
+}
+MISSING_VALUES = ('', 'Not specified', 'N/A', '[]')
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + '}'
+
+
+def _number(value):
+    if isinstance(value, float):
+        return repr(round(value, 6))
+    return str(value)
+
+
+def field_missing(posts):
+    """{field label: rows where it was not extracted} for ParsedPost rows"""
+    return {field: sum(getattr(post, column) in MISSING_VALUES for post in posts)
+            for field, column in FILL_FIELDS.items()}
+
+
+def cache_counts():
+    """{cache: [hits, misses]} so far in this process"""
+    from extractors import pattern_cache_counts
+    from rules import cache_counts as rules_cache_counts
+    return {'patterns': list(pattern_cache_counts()), 'rules': list(rules_cache_counts())}
+
+
+def cache_since(before):
+    """cache_counts() accumulated since an earlier cache_counts() result"""
+    return {cache: [now - then for now, then in zip(counts, before[cache])]
+            for cache, counts in cache_counts().items()}
+
+
+def add_cache_counts(total, counts):
+    """Add one cache_counts()-shaped dict into another (e.g. a batch's per-chunk counts)"""
+    for cache, (hits, misses) in counts.items():
+        sums = total.setdefault(cache, [0, 0])
+        sums[0] += hits
+        sums[1] += misses
+    return total
+
+
+def render(rows, elapsed, missing, errors=0, quarantined=0, labels=None, caches=None):
+    """Prometheus text for a finished run
+
+    missing: field_missing(), summed over files for a batch.
+    caches: cache_counts() for the run.
+    """
+    labels = dict(labels or {})
+    caches = caches or {}
+    families = [
+        ('rows', 'Rows processed by the last run', [({}, rows)]),
+        ('duration_seconds', 'Wall time of the last run', [({}, elapsed)]),
+        ('rows_per_second', 'Rows per second of the last run', [({}, rows / elapsed if elapsed else 0.0)]),
+        ('field_missing_ratio', 'Share of rows where the field ended up "Not specified"', [
+            ({'field': field}, count / rows if rows else 0.0) for field, count in missing.items()
+        ]),
+        ('errors', 'Rows that failed to parse in the last run', [({}, errors)]),
+        ('quarantined', 'Rows quarantined by the row guard in the last run', [({}, quarantined)]),
+        ('cache_hits_total', 'Cache lookups that hit during the run', [
+            ({'cache': cache}, hits) for cache, (hits, _misses) in caches.items()
+        ]),
+        ('cache_misses_total', 'Cache lookups that missed during the run', [
+            ({'cache': cache}, misses) for cache, (_hits, misses) in caches.items()
+        ]),
+        ('cache_hit_ratio', 'Share of cache lookups that hit during the run', [
+            ({'cache': cache}, hits / (hits + misses) if hits + misses else 0.0)
+            for cache, (hits, misses) in caches.items()
+        ]),
+        ('last_run_timestamp_seconds', 'Unix time the last run finished', [({}, time.time())]),
+    ]
+
+    lines = []
+    for name, help_text, samples in families:
+        if not samples:
+            continue
+        metric = f"{PREFIX}_{name}"
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} {'counter' if name.endswith('_total') else 'gauge'}")
+        for sample_labels, value in samples:
+            lines.append(f"{metric}{_labels({**labels, **sample_labels})} {_number(value)}")
+    return '\n'.join(lines) + '\n'
+
+
+def write_textfile(path, rows, elapsed, missing, errors=0, quarantined=0, labels=None, caches=None):
+    """Atomically write the run's metrics to path"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    text = render(rows, elapsed, missing, errors, quarantined, labels, caches)
+    replace_file(path, lambda f: f.write(text), newline='\n')
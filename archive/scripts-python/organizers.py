@@ -0,0 +1,314 @@
+"""Organizer entity resolution across sessions.
+
+"HIMAPAJAK FIA UB", "Himpunan Mahasiswa Perpajakan (HIMAPAJAK)" and
+"Fakultas Ilmu Administrasi, Universitas Brawijaya" are one organizer. Every
+distinct extracted_organizer value gets blocking keys (normalized tokens
+plus acronyms, both written and derived from capitalized word runs); only
+names sharing a key are compared, and matches are merged with union-find.
+Keys that only name a university ("Universitas Brawijaya", "UB") never
+merge two names on their own, so a bare university name does not pull its
+faculties and student groups into one cluster.
+Each cluster gets a stable organizer_id, kept in a registry of ids,
+canonical names and variants (parsed/organizers.json; variant_ids() turns
+it into a name -> id lookup). The parsed CSVs are only read: each one gets
+a sidecar parsed/organizers/<name>.csv with post_index, post_url and
+organizer_id per row.
+
+Names are taken after organizer_name(), which drops the Instagram header
+fragment ("93 comments - infolomba on December 1") older parses left in
+extracted_organizer.
+
+Usage:
+  python organizers.py [parsed CSVs ...] [--registry PATH] [--dry-run]
+  python organizers.py --check [PATH]   (default: fixtures/organizers.json)
+"""
+import argparse
+import csv
+import glob
+import hashlib
+import json
+import math
+import os
+import re
+import unicodedata
+from collections import Counter, defaultdict
+
+from extractors import COUNT_PATTERN
+from parsed_post import read_posts, replace_file, write_json_atomic
+
+REPO_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+PARSED_DIR = os.path.join(REPO_DIR, 'parsed')
+REGISTRY_FILE = os.path.join(PARSED_DIR, 'organizers.json')
+SIDECAR_DIR = os.path.join(PARSED_DIR, 'organizers')
+# Name lists with the clusters they should give (see --check)
+FIXTURES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'organizers.json')
+
+# Values that are not an organizer
+EMPTY_ORGANIZERS = ('', 'Not specified', 'N/A', 'NON-EVENT')
+# The Instagram header ("1,074 likes, 93 comments - infolomba on December 1[, 2025: "]")
+_HEADER_FRAGMENT = re.compile(
+    rf'^\s*(?:{COUNT_PATTERN}\s+(?:likes?|suka),\s*)?{COUNT_PATTERN}\s+(?:comments?|komentar)\s+-\s+'
+    r'[\w.]+\s+(?:on|pada)\s+[^:"\n]*(?::\s*"?)?', re.IGNORECASE)
+
+STOPWORDS = {
+    'dan', 'di', 'the', 'of', 'and', 'for', 'se', 'ke', 'dari', 'oleh', 'by', 'x', 'at',
+}
+# Words that make a name segment the name of an institution ("Universitas Brawijaya")
+INSTITUTION_WORDS = {
+    'universitas', 'university', 'univ', 'institut', 'institute', 'politeknik', 'polytechnic',
+    'sekolah', 'college', 'akademi', 'academy',
+}
+# Keys shared by more names than this are too common to block on (e.g. "universitas")
+MAX_BLOCK_SIZE = 50
+# Written acronyms at least this long ("HIMAPAJAK") identify an organizer on their own
+STRONG_ACRONYM_CHARS = 4
+# Weighted overlap of keys needed to merge two names otherwise
+MATCH_THRESHOLD = 0.6
+
+
+def organizer_name(value):
+    """extracted_organizer without an Instagram header fragment ('' if no name is left)"""
+    name = _HEADER_FRAGMENT.sub('', value or '').strip()
+    return '' if name in EMPTY_ORGANIZERS else name
+
+
+def _fold(text):
+    text = unicodedata.normalize('NFKD', text)
+    return ''.join(char for char in text if not unicodedata.combining(char))
+
+
+def name_keys(name):
+    """(keys, strong keys) for one organizer name.
+
+    keys: lowercased tokens (minus stopwords), written acronyms and the
+    acronyms of each run of capitalized words; strong keys: written
+    acronyms long enough to match on their own.
+    """
+    name = _fold(name)
+    words = re.findall(r'[A-Za-z0-9]+', name)
+    keys = {word.lower() for word in words if word.lower() not in STOPWORDS and len(word) > 1}
+    strong = set()
+    for word in words:
+        if len(word) >= 2 and word.isupper() and not word.isdigit():
+            keys.add(word.lower())
+            if len(word) >= STRONG_ACRONYM_CHARS:
+                strong.add(word.lower())
+    # "Fakultas Ilmu Administrasi, Universitas Brawijaya" -> fia, ub, fiaub
+    # (words already written as acronyms are left out of the initials)
+    acronyms = []
+    for segment in re.split(r'[,()\-/|&]', name):
+        initials = ''.join(word[0] for word in re.findall(r'[A-Za-z]+', segment)
+                           if word[0].isupper() and not word.isupper() and word.lower() not in STOPWORDS)
+        if len(initials) >= 2:
+            acronyms.append(initials.lower())
+    keys.update(acronyms)
+    if len(acronyms) > 1:
+        keys.add(''.join(acronyms))
+    return keys, strong
+
+
+def institution_keys(name):
+    """The keys of name_keys() that come from the institution part of a name.
+
+    "Fakultas Ilmu Administrasi, Universitas Brawijaya (UB)" -> universitas,
+    brawijaya, ub: a segment's words from its institution word on, plus
+    acronym-only segments next to it.
+    """
+    segments = [re.findall(r'[A-Za-z0-9]+', segment) for segment in re.split(r'[,()\-/|&]', _fold(name))]
+    if not any(word.lower() in INSTITUTION_WORDS for words in segments for word in words):
+        return set()
+    keys = set()
+    for words in segments:
+        start = next((i for i, word in enumerate(words) if word.lower() in INSTITUTION_WORDS), None)
+        if start is not None:
+            words = words[start:]
+            keys.update(word.lower() for word in words if word.lower() not in STOPWORDS and len(word) > 1)
+            initials = ''.join(word[0] for word in words
+                               if word[0].isupper() and not word.isupper() and word.lower() not in STOPWORDS)
+            if len(initials) >= 2:
+                keys.add(initials.lower())
+        elif len(words) == 1 and words[0].isupper() and len(words[0]) >= 2:
+            keys.add(words[0].lower())
+    return keys
+
+
+class UnionFind:
+    def __init__(self, size):
+        self.parent = list(range(size))
+
+    def find(self, item):
+        while self.parent[item] != item:
+            self.parent[item] = self.parent[self.parent[item]]
+            item = self.parent[item]
+        return item
+
+    def union(self, a, b):
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a != root_b:
+            self.parent[max(root_a, root_b)] = min(root_a, root_b)
+
+
+def organizer_id(canonical):
+    """Stable id derived from the canonical name"""
+    digest = hashlib.sha1(' '.join(sorted(name_keys(canonical)[0])).encode('utf-8')).hexdigest()
+    return f"org-{digest[:10]}"
+
+
+def resolve(counts, known_ids=None):
+    """Cluster organizer names.
+
+    counts: Counter of raw organizer value -> occurrences; known_ids: variant
+    -> organizer_id from an earlier run, kept so ids stay stable when a
+    cluster's canonical name changes. Returns (clusters, stats): clusters
+    maps organizer_id -> {'canonical', 'variants'}.
+    """
+    names = sorted(counts)
+    keyed = [name_keys(name) for name in names]
+    institution = set().union(*(institution_keys(name) for name in names))
+
+    # Blocking index: key -> names that have it
+    blocks = defaultdict(list)
+    for i, (keys, _strong) in enumerate(keyed):
+        for key in keys:
+            blocks[key].append(i)
+    # Rare keys say more than common ones
+    weight = {key: math.log(1 + len(names) / len(members)) for key, members in blocks.items()}
+
+    union = UnionFind(len(names))
+    compared = set()
+    for key, members in blocks.items():
+        if len(members) < 2 or len(members) > MAX_BLOCK_SIZE:
+            continue
+        for x in range(len(members)):
+            for y in range(x + 1, len(members)):
+                pair = (members[x], members[y])
+                if pair in compared:
+                    continue
+                compared.add(pair)
+                if _match(keyed[pair[0]], keyed[pair[1]], weight, institution):
+                    union.union(*pair)
+
+    groups = defaultdict(list)
+    for i, name in enumerate(names):
+        groups[union.find(i)].append(name)
+    known_ids = known_ids or {}
+    clusters = {}
+    for variants in groups.values():
+        # The most used spelling (then the longest) names the cluster
+        canonical = max(variants, key=lambda name: (counts[name], len(name), name))
+        previous = sorted(known_ids[name] for name in variants if name in known_ids)
+        oid = next((oid for oid in previous if oid not in clusters), None) or organizer_id(canonical)
+        clusters[oid] = {
+            'canonical': canonical,
+            'variants': sorted(variants, key=lambda name: -counts[name]),
+        }
+    stats = {
+        'names': len(names),
+        'comparisons': len(compared),
+        'all_pairs': len(names) * (len(names) - 1) // 2,
+        'clusters': len(clusters),
+    }
+    return clusters, stats
+
+
+def _match(a, b, weight, institution=frozenset()):
+    """Whether two (keys, strong keys) name the same organizer; keys in `institution` cannot decide alone"""
+    keys_a, strong_a = a
+    keys_b, strong_b = b
+    if ((strong_a & keys_b) | (strong_b & keys_a)) - institution:
+        return True
+    shared = keys_a & keys_b
+    if len(shared) < 2 or not shared - institution:
+        return False
+    overlap = sum(weight[key] for key in shared)
+    smaller = min(sum(weight[key] for key in keys_a), sum(weight[key] for key in keys_b))
+    return overlap / smaller >= MATCH_THRESHOLD
+
+
+def load_registry(path=REGISTRY_FILE):
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def variant_ids(registry):
+    """organizer name -> organizer_id for every variant in a registry"""
+    return {variant: oid for oid, cluster in registry.items() for variant in cluster['variants']}
+
+
+def sidecar_path(path):
+    return os.path.join(SIDECAR_DIR, os.path.basename(path))
+
+
+def write_sidecar(path, posts, ids):
+    """organizer_id of each row of one parsed CSV, next to it under SIDECAR_DIR (the CSV is not touched)"""
+    def write(f):
+        writer = csv.writer(f)
+        writer.writerow(['post_index', 'post_url', 'organizer_id'])
+        for post in posts:
+            writer.writerow([post.post_index, post.post_url, ids.get(organizer_name(post.extracted_organizer), '')])
+    os.makedirs(SIDECAR_DIR, exist_ok=True)
+    replace_file(sidecar_path(path), write, newline='')
+
+
+def check_fixtures(path):
+    """Resolve each fixture's names and compare the clusters; returns the number of mismatches"""
+    with open(path, 'r', encoding='utf-8') as f:
+        cases = json.load(f)
+    failures = 0
+    for case in cases:
+        clusters, _stats = resolve(Counter({name: 1 for name in case['names']}))
+        got = sorted(sorted(cluster['variants']) for cluster in clusters.values())
+        want = sorted(sorted(variants) for variants in case['clusters'])
+        if got != want:
+            failures += 1
+            print(f"  FAIL {case['note']}:")
+            print(f"    got {got}")
+            print(f"    expected {want}")
+        else:
+            print(f"  OK   {case['note']}")
+    print(f"{len(cases) - failures}/{len(cases)} fixture cases match")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Canonicalize extracted_organizer across parsed CSVs')
+    parser.add_argument('inputs', nargs='*', help='Parsed CSVs (default: every parsed#N CSV in parsed/)')
+    parser.add_argument('--registry', default=REGISTRY_FILE, help=f'Registry JSON (default: {REGISTRY_FILE})')
+    parser.add_argument('--dry-run', action='store_true', help='Print clusters without writing anything')
+    parser.add_argument('--check', nargs='?', const=FIXTURES_FILE, default=None, metavar='PATH',
+                        help='Check clustering against fixture name lists (default: fixtures/organizers.json)')
+    args = parser.parse_args()
+    if args.check:
+        raise SystemExit(1 if check_fixtures(args.check) else 0)
+
+    paths = args.inputs or sorted(glob.glob(os.path.join(PARSED_DIR, '*parsed#*.csv')))
+    sessions = {path: read_posts(path) for path in paths}
+    counts = Counter(name for posts in sessions.values() for post in posts
+                     for name in [organizer_name(post.extracted_organizer)] if name)
+    # Names seen in earlier runs keep clustering with their old ids
+    known_ids = {}
+    for oid, cluster in load_registry(args.registry).items():
+        for variant in cluster['variants']:
+            counts.setdefault(variant, 0)
+            known_ids[variant] = oid
+
+    clusters, stats = resolve(counts, known_ids)
+    print(f"{stats['names']} organizer names -> {stats['clusters']} organizers "
+          f"({stats['comparisons']} comparisons instead of {stats['all_pairs']} all-pairs)")
+    for oid, cluster in clusters.items():
+        if len(cluster['variants']) > 1:
+            print(f"  {oid} {cluster['canonical']!r}: {len(cluster['variants'])} variants")
+    if args.dry_run:
+        return
+
+    ids = variant_ids(clusters)
+    for path, posts in sessions.items():
+        write_sidecar(path, posts, ids)
+    write_json_atomic(args.registry, clusters)
+    print(f"organizer_id of {len(sessions)} files written to {SIDECAR_DIR}, registry saved to {args.registry}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,343 @@
+"""Offline caption extraction from saved Instagram post page sources.
+
+scraper.js calls driver.getPageSource() per post and then digs the caption
+out with string searches and Selenium element queries, retries and sleeps.
+This does the extraction from saved HTML instead, so the browser only has
+to fetch and save pages:
+
+  1. the embedded JSON of the post itself (the node whose "code" /
+     "shortcode" is the post's shortcode: caption.text or
+     edge_media_to_caption), parsed with json where the script is JSON and
+     with scraper.js's shortcode-anchored window search where it is not
+  2. the longest embedded "text" value that starts like og:description
+  3. og:description / twitter:description ("N likes, N comments - user on
+     <date>: "caption..."", truncated by Instagram)
+
+The post date is the first <time datetime>, else the JSON's taken_at; the
+URL is og:url / the canonical link, else built from a shortcode file name
+(<shortcode>.html). Pages are read with a streaming HTMLParser in 64 KB
+pieces; only <meta>/<link>/<time> tags and scripts that mention a caption
+are kept. Files are parsed in a process pool.
+
+The output is a scraped JSON in the shape scraper.js writes
+(output/scraped-<session>-<ts>.json), which batch.py and the create-csv
+step already read.
+
+fixtures/pages/ holds small saved pages for each of the three sources, with
+the results they should give in expected.json; --check compares against it.
+
+Usage:
+  python page_source.py <dirs or .html files ...> [--out PATH] [--workers N] [--username NAME]
+  python page_source.py --check [DIR]   (default: fixtures/pages)
+"""
+import argparse
+import glob
+import json
+import os
+import re
+import secrets
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from html.parser import HTMLParser
+
+from url_index import shortcode as url_shortcode
+
+REPO_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+OUTPUT_DIR = os.path.join(REPO_DIR, 'output')
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'pages')
+
+READ_CHUNK = 64 * 1024
+# scraper.js searches this window around the shortcode in non-JSON scripts
+WINDOW_BEFORE = 2000
+WINDOW_AFTER = 15000
+# Characters of og:description compared against embedded texts
+HINT_CHARS = 30
+PAGE_EXTENSIONS = ('.html', '.htm')
+
+_TEXT_VALUE = re.compile(r'"text"\s*:\s*"((?:[^"\\]|\\.)*)"')
+_SHORTCODE_FILE = re.compile(r'^[A-Za-z0-9_-]{5,}$')
+
+
+class PageParser(HTMLParser):
+    """Collects the meta tags, <time> and caption-bearing scripts of one page"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.meta = {}
+        self.canonical = ''
+        self.time = ''
+        self.scripts = []
+        self._script = None
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == 'meta':
+            key = attrs.get('property') or attrs.get('name')
+            if key and key not in self.meta and attrs.get('content') is not None:
+                self.meta[key] = attrs['content']
+        elif tag == 'link' and attrs.get('rel') == 'canonical':
+            self.canonical = self.canonical or attrs.get('href') or ''
+        elif tag == 'time' and not self.time:
+            self.time = attrs.get('datetime') or ''
+        elif tag == 'script':
+            self._script = []
+
+    def handle_data(self, data):
+        if self._script is not None:
+            self._script.append(data)
+
+    def handle_endtag(self, tag):
+        if tag == 'script' and self._script is not None:
+            text = ''.join(self._script)
+            self._script = None
+            # Most scripts are code or unrelated data; keep only ones that can hold a caption
+            if '"text"' in text and ('caption' in text or 'shortcode' in text or '"code"' in text):
+                self.scripts.append(text)
+
+
+def read_page(path):
+    parser = PageParser()
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        while True:
+            chunk = f.read(READ_CHUNK)
+            if not chunk:
+                break
+            parser.feed(chunk)
+    parser.close()
+    return parser
+
+
+def _decode(raw):
+    try:
+        return json.loads(f'"{raw}"')
+    except ValueError:
+        return raw.replace('\\n', '\n').replace('\\"', '"').replace('\\\\', '\\')
+
+
+def _caption_of(node):
+    """caption.text or edge_media_to_caption.edges[0].node.text of a media node"""
+    caption = node.get('caption')
+    if isinstance(caption, dict) and caption.get('text'):
+        return caption['text']
+    if isinstance(caption, str) and caption:
+        return caption
+    edges = (node.get('edge_media_to_caption') or {}).get('edges') or []
+    if edges and isinstance(edges[0], dict):
+        return (edges[0].get('node') or {}).get('text') or ''
+    return ''
+
+
+def _find_node(data, code):
+    """The media node with this shortcode in parsed JSON (depth-first)"""
+    stack = [data]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, dict):
+            if code and (item.get('code') == code or item.get('shortcode') == code) and _caption_of(item):
+                return item
+            stack.extend(item.values())
+        elif isinstance(item, list):
+            stack.extend(item)
+    return None
+
+
+def _window_caption(script, code):
+    """scraper.js Approach 0: caption text near the shortcode in a non-JSON script"""
+    for pattern in (f'"shortcode":"{code}"', f'"code":"{code}"', f'"{code}"'):
+        at = script.find(pattern)
+        if at != -1:
+            break
+    else:
+        return ''
+    snippet = script[max(0, at - WINDOW_BEFORE):at + WINDOW_AFTER]
+    for key in ('"caption":', '"edge_media_to_caption"'):
+        key_at = snippet.find(key)
+        if key_at != -1:
+            match = _TEXT_VALUE.search(snippet, key_at, key_at + 5000)
+            if match and match.group(1):
+                return _decode(match.group(1))
+    match = _TEXT_VALUE.search(snippet)
+    return _decode(match.group(1)) if match and match.group(1) else ''
+
+
+def embedded_caption(scripts, code):
+    """(caption, taken_at) of the post from the page's embedded data"""
+    if not code:
+        return '', None
+    for script in scripts:
+        text = script.strip()
+        if text[:1] in '{[':
+            try:
+                node = _find_node(json.loads(text), code)
+            except ValueError:
+                node = None
+            if node is not None:
+                return _caption_of(node), node.get('taken_at') or node.get('taken_at_timestamp')
+    for script in scripts:
+        caption = _window_caption(script, code)
+        if caption:
+            return caption, None
+    return '', None
+
+
+def hinted_caption(scripts, og_description):
+    """scraper.js Approach 0b: longest embedded text containing og:description's opening characters"""
+    start = og_description.find(': "')
+    if start == -1:
+        return ''
+    hint = og_description[start + 3:].rstrip('.…"').strip()
+    ascii_hint = re.sub(r'[^\x20-\x7E]', '', hint).strip()[:HINT_CHARS]
+    if len(ascii_hint) < 8:
+        return ''
+    best = ''
+    for script in scripts:
+        for match in _TEXT_VALUE.finditer(script):
+            text = _decode(match.group(1))
+            if len(text) > len(best) and ascii_hint in re.sub(r'[^\x20-\x7E]', '', text):
+                best = text
+    return best if len(best) > len(hint) else ''
+
+
+def extract_page(path):
+    """One saved page -> {'postUrl', 'postDate', 'caption', 'imageUrl', 'source'}"""
+    page = read_page(path)
+    url = page.meta.get('og:url') or page.canonical
+    code = url_shortcode(url)
+    if code is None:
+        stem = os.path.splitext(os.path.basename(path))[0]
+        if _SHORTCODE_FILE.match(stem):
+            code = stem
+            url = f"https://www.instagram.com/p/{code}/"
+
+    caption, taken_at = embedded_caption(page.scripts, code)
+    source = 'embedded_json' if caption else ''
+    og_description = page.meta.get('og:description') or ''
+    if not caption and og_description:
+        caption = hinted_caption(page.scripts, og_description)
+        source = 'og_hint' if caption else ''
+    if not caption:
+        for key in ('og:description', 'twitter:description'):
+            if page.meta.get(key):
+                caption, source = page.meta[key].strip(), key
+                break
+
+    post_date = page.time or None
+    if post_date is None and taken_at:
+        post_date = datetime.fromtimestamp(int(taken_at), timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.000Z')
+    return {
+        'file': path,
+        'postUrl': url or '',
+        'postDate': post_date,
+        'caption': caption,
+        'imageUrl': page.meta.get('og:image'),
+        'source': source,
+    }
+
+
+def _extract_safely(path):
+    try:
+        return extract_page(path)
+    except Exception as e:
+        return {'file': path, 'error': f"{type(e).__name__}: {e}"}
+
+
+def page_files(inputs):
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for extension in PAGE_EXTENSIONS:
+                paths += glob.glob(os.path.join(item, '**', f'*{extension}'), recursive=True)
+        else:
+            paths.append(item)
+    return sorted(set(paths))
+
+
+def scraped_json(results, username):
+    """scraper.js's scraped JSON for the extracted pages"""
+    timestamp = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.000Z')
+    posts = [{
+        'postIndex': index,
+        'postUrl': result['postUrl'],
+        'postDate': result['postDate'],
+        'eventTitle': None,
+        'eventOrganizer': None,
+        'phoneNumber1': None,
+        'phoneNumber2': None,
+        'phoneNumber3': None,
+        'phoneNumber4': None,
+        'allPhones': [],
+        'imageUrl': result['imageUrl'],
+        'caption': result['caption'],
+    } for index, result in enumerate(results)]
+    return {
+        'profileUrl': f"https://www.instagram.com/{username}/",
+        'username': username,
+        'timestamp': timestamp,
+        'startTime': timestamp,
+        'posts': posts,
+        'summary': {'total': len(posts), 'withPhone': 0, 'range': {'start': 0, 'end': len(posts)}},
+    }
+
+
+def check_fixtures(directory):
+    """Extract each page in expected.json and compare; returns the number of mismatches"""
+    with open(os.path.join(directory, 'expected.json'), 'r', encoding='utf-8') as f:
+        expected = json.load(f)
+    failures = 0
+    for name, want in sorted(expected.items()):
+        result = _extract_safely(os.path.join(directory, name))
+        wrong = [key for key in want if result.get(key) != want[key]] if 'error' not in result else ['error']
+        if wrong:
+            failures += 1
+            print(f"  FAIL {name}:")
+            for key in wrong:
+                print(f"    {key}: got {result.get(key)!r}, expected {want.get(key)!r}")
+        else:
+            print(f"  OK   {name} ({result['source']})")
+    print(f"{len(expected) - failures}/{len(expected)} fixture pages match")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Extract captions from saved Instagram page sources')
+    parser.add_argument('inputs', nargs='*', help='Folders of saved pages (searched recursively) or .html files')
+    parser.add_argument('--out', default=None, help='Scraped JSON to write (default: output/scraped-<id>-<ts>.json)')
+    parser.add_argument('--workers', type=int, default=None, help='Parser processes (default: CPU count)')
+    parser.add_argument('--username', default='infolomba', help='Account the pages belong to (default: infolomba)')
+    parser.add_argument('--check', nargs='?', const=FIXTURES_DIR, default=None, metavar='DIR',
+                        help='Check the fixture pages against their expected.json (default: fixtures/pages)')
+    args = parser.parse_args()
+    if args.check:
+        raise SystemExit(1 if check_fixtures(args.check) else 0)
+    if not args.inputs:
+        parser.error('the following arguments are required: inputs')
+
+    paths = page_files(args.inputs)
+    if not paths:
+        print("No saved pages found")
+        return
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        results = list(pool.map(_extract_safely, paths, chunksize=max(1, len(paths) // 64)))
+    elapsed = time.perf_counter() - start
+
+    failed = [result for result in results if 'error' in result]
+    found = [result for result in results if 'error' not in result and result['caption']]
+    for result in failed:
+        print(f"  FAILED {result['file']}: {result['error']}")
+    sources = {}
+    for result in found:
+        sources[result['source']] = sources.get(result['source'], 0) + 1
+
+    out = args.out or os.path.join(OUTPUT_DIR, f"scraped-{secrets.token_hex(4)}-{int(time.time() * 1000)}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, 'w', encoding='utf-8') as f:
+        json.dump(scraped_json(found, args.username), f, ensure_ascii=False, indent=2)
+    print(f"{len(found)}/{len(paths)} pages with a caption, {len(failed)} failed, {elapsed:.1f}s "
+          f"({', '.join(f'{count} {name}' for name, count in sorted(sources.items()))})")
+    print(f"Saved to {out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,310 @@
+import csv
+import json
+import os
+import re
+import sys
+from datetime import datetime
+
+# Header of the parsed#N-*.csv files scrape-multiple-posts.js writes
+SCRAPER_FIELDNAMES = [
+    'session_id', 'json_file', 'post_index', 'post_url', 'original_caption',
+    'extracted_title', 'extracted_organizer', 'extracted_date', 'extracted_location',
+    'registration_fee', 'phone_numbers', 'contact_persons', 'parse_status',
+    'parse_timestamp', 'last_edited'
+]
+# Every ParsedPost column: the scraper's, then the ones final_parse.py fills
+FIELDNAMES = SCRAPER_FIELDNAMES + [
+    'registration_links', 'hashtags', 'mentions', 'post_likes', 'post_comments', 'post_date',
+    'location_city', 'location_province'
+]
+
+# Multi-value columns, stored ';'-joined in the CSV (same separator server.js uses)
+LIST_FIELDS = ('registration_links', 'hashtags', 'mentions')
+LIST_SEPARATOR = ';'
+
+# Titles that mark a post as not an event: the extractors' marker and the
+# one MASTER_RULE.md has manual / LLM parses write
+NON_EVENT_TITLES = ('NON-EVENT', 'Non-Event Post')
+
+# Columns that repeat the same few values on every row of a session
+INTERNED_FIELDS = ('session_id', 'json_file', 'parse_status', 'last_edited')
+# Free-text columns copied out of the caption, kept UTF-8 encoded in ParsedPost
+ENCODED_FIELDS = ('original_caption', 'extracted_title', 'extracted_organizer', 'extracted_location',
+                  'contact_persons')
+# Lone surrogates can come out of scraped JSON; keep them round-tripping (as arena.py does)
+_TEXT_ERRORS = 'surrogatepass'
+
+
+def is_non_event(title):
+    """True for the title of a post parsed as not an event"""
+    return any(marker in title for marker in NON_EVENT_TITLES)
+
+
+def to_int(value, default=-1):
+    """Parse an integer column, returning default for blank/malformed values"""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def join_list(values):
+    """List column value for the CSV"""
+    return LIST_SEPARATOR.join(values)
+
+
+def split_list(value):
+    """List column value back to a list (blank -> [])"""
+    return [item for item in value.split(LIST_SEPARATOR) if item] if value else []
+
+
+class ParsedPost:
+    """One parsed#N CSV row.
+
+    Uses __slots__ instead of a per-row dict, keeps post_index as an int and
+    interns the per-session strings so every row of a session shares one copy.
+    The caption and the text taken from it (ENCODED_FIELDS) are most of a
+    row's memory and are kept UTF-8 encoded: one emoji makes Python store a
+    whole str at 4 bytes per character, and nearly every Instagram caption
+    has one. Reading such a field decodes it. Input columns outside
+    FIELDNAMES are kept in `extra` (None when there are none).
+    """
+
+    __slots__ = tuple(f'_{name}' if name in ENCODED_FIELDS else name for name in FIELDNAMES) + ('extra',)
+
+    def __init__(self, session_id='', json_file='', post_index=0, post_url='',
+                 original_caption='', extracted_title='', extracted_organizer='',
+                 extracted_date='', extracted_location='', registration_fee='',
+                 phone_numbers='', contact_persons='', parse_status='pending',
+                 parse_timestamp='', last_edited='', registration_links='',
+                 hashtags='', mentions='', post_likes='', post_comments='',
+                 post_date='', location_city='', location_province=''):
+        self.session_id = sys.intern(session_id)
+        self.json_file = sys.intern(json_file)
+        self.post_index = post_index
+        self.post_url = post_url
+        self.original_caption = original_caption
+        self.extracted_title = extracted_title
+        self.extracted_organizer = extracted_organizer
+        self.extracted_date = extracted_date
+        self.extracted_location = extracted_location
+        self.registration_fee = registration_fee
+        self.phone_numbers = phone_numbers
+        self.contact_persons = contact_persons
+        self.parse_status = sys.intern(parse_status)
+        self.parse_timestamp = parse_timestamp
+        self.last_edited = sys.intern(last_edited)
+        self.registration_links = registration_links
+        self.hashtags = hashtags
+        self.mentions = mentions
+        self.post_likes = post_likes
+        self.post_comments = post_comments
+        self.post_date = post_date
+        self.location_city = location_city
+        self.location_province = location_province
+        self.extra = None
+
+    @classmethod
+    def from_row(cls, row, extra=()):
+        """Build from a csv.DictReader row (missing columns are tolerated; the `extra` column names are kept)"""
+        post = cls.__new__(cls)
+        for name in FIELDNAMES:
+            value = row.get(name) or ''
+            if name in INTERNED_FIELDS:
+                value = sys.intern(value)
+            setattr(post, name, value)
+        post.post_index = to_int(post.post_index)
+        post.extra = {name: row.get(name) or '' for name in extra} or None
+        return post
+
+    def to_row(self):
+        """Dict view for csv.DictWriter"""
+        row = {name: getattr(self, name) for name in FIELDNAMES}
+        if self.extra:
+            row.update(self.extra)
+        return row
+
+    def to_json(self):
+        """Post object in the MASTER_RULE.md output JSON shape (list columns become arrays)"""
+        try:
+            contacts = json.loads(self.contact_persons) if self.contact_persons else []
+        except ValueError:
+            contacts = []
+        if not isinstance(contacts, list):
+            contacts = []
+        phones = [c['phone'] for c in contacts if isinstance(c, dict) and c.get('phone')]
+        phones += [p.strip() for p in split_list(self.phone_numbers) if p.strip().lstrip('+').isdigit()]
+        phones = list(dict.fromkeys(phones))
+        names = [c.get('name') if isinstance(c, dict) else c for c in contacts]
+        names = [name for name in names if name]
+        post = {
+            'post_index': self.post_index,
+            'post_url': self.post_url,
+            'original_caption': self.original_caption,
+            'extracted_title': self.extracted_title,
+            'extracted_organizer': self.extracted_organizer,
+            'extracted_date': self.extracted_date,
+            'extracted_location': self.extracted_location,
+            'location_city': self.location_city,
+            'location_province': self.location_province,
+            'registration_fee': self.registration_fee,
+            'phone_numbers': phones,
+            'contact_persons': names,
+        }
+        for name in LIST_FIELDS:
+            post[name] = split_list(getattr(self, name))
+        # Engagement and post date from the caption header (null when the caption had none)
+        post['post_likes'] = to_int(self.post_likes, None)
+        post['post_comments'] = to_int(self.post_comments, None)
+        post['post_date'] = self.post_date or None
+        post['parse_status'] = self.parse_status
+        return post
+
+    def __repr__(self):
+        return f"ParsedPost(session_id={self.session_id!r}, post_index={self.post_index!r})"
+
+
+class _Encoded:
+    """ParsedPost attribute stored UTF-8 encoded in the slot of the same name with a leading '_'"""
+
+    def __init__(self, slot):
+        self.slot = slot
+
+    def __get__(self, post, owner=None):
+        if post is None:
+            return self
+        return self.slot.__get__(post, owner).decode('utf-8', _TEXT_ERRORS)
+
+    def __set__(self, post, value):
+        self.slot.__set__(post, value.encode('utf-8', _TEXT_ERRORS))
+
+
+for _name in ENCODED_FIELDS:
+    setattr(ParsedPost, _name, _Encoded(getattr(ParsedPost, f'_{_name}')))
+
+
+def iter_posts(path):
+    """Yield the ParsedPost rows of a parsed#N CSV one at a time"""
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        reader = csv.DictReader(f)
+        extra = [name for name in reader.fieldnames or () if name not in FIELDNAMES]
+        for row in reader:
+            yield ParsedPost.from_row(row, extra)
+
+
+def csv_columns(path, columns=SCRAPER_FIELDNAMES):
+    """A CSV's own header, followed by any of `columns` it does not have"""
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        header = next(csv.reader(f), None) or []
+    return header + [name for name in columns if name not in header]
+
+
+def parsed_output_path(input_path):
+    """Where a parse script writes by default: <input>-parsed.csv next to the input"""
+    return os.path.splitext(input_path)[0] + '-parsed.csv'
+
+
+def read_posts(path):
+    """Read a parsed#N CSV into a list of ParsedPost"""
+    return list(iter_posts(path))
+
+
+def session_id_from_filename(filename):
+    """Session id from scraped#N-<id>-<13 digit ts>.json (same rule as server.js extractSessionId)"""
+    match = re.match(r'^scraped[#-](?:\d+-)?(.+)-(\d{13})\.json$', filename)
+    return match.group(1) if match else filename
+
+
+def read_scraped_posts(path):
+    """Read an output/scraped JSON into (posts, metadata), mapped like /api/parse/create-csv"""
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    json_file = os.path.basename(path)
+    session_id = session_id_from_filename(json_file)
+    posts = []
+    for item in data.get('posts') or []:
+        posts.append(ParsedPost(
+            session_id=session_id,
+            json_file=json_file,
+            post_index=to_int(item.get('postIndex')),
+            post_url=item.get('postUrl') or '',
+            original_caption=item.get('caption') or '',
+            extracted_title=item.get('eventTitle') or '',
+            extracted_organizer=item.get('eventOrganizer') or '',
+            extracted_date=item.get('postDate') or '',
+            phone_numbers=join_list(item.get('allPhones') or []),
+        ))
+    metadata = {
+        'profile_url': data.get('profileUrl') or '',
+        'username': data.get('username') or '',
+        'scrape_timestamp': data.get('timestamp') or '',
+    }
+    return posts, metadata
+
+
+def iter_captions(path):
+    """Yield only the captions of a parsed#N CSV or a scraped JSON, without building posts"""
+    if path.endswith('.json'):
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        for item in data.get('posts') or []:
+            yield item.get('caption') or ''
+        return
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        if 'original_caption' not in header:
+            return
+        column = header.index('original_caption')
+        for row in reader:
+            yield row[column] if column < len(row) else ''
+
+
+def replace_file(path, write, newline=None):
+    """Write a file atomically: write(f) fills a temp file that then replaces path.
+
+    A crash or Ctrl-C mid-write leaves the previous file intact instead of a
+    truncated one.
+    """
+    tmp_path = f"{path}.tmp"
+    try:
+        with open(tmp_path, 'w', encoding='utf-8', newline=newline) as f:
+            write(f)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def write_json_atomic(path, data):
+    replace_file(path, lambda f: json.dump(data, f, ensure_ascii=False, indent=2))
+
+
+def write_posts(path, posts, fieldnames=FIELDNAMES):
+    """Write ParsedPost rows back out as CSV"""
+    def write(f):
+        writer = csv.DictWriter(f, fieldnames=fieldnames, extrasaction='ignore')
+        writer.writeheader()
+        for post in posts:
+            writer.writerow(post.to_row())
+    replace_file(path, write, newline='')
+
+
+def write_posts_json(path, posts, profile_url='', username='', scrape_timestamp=''):
+    """Write ParsedPost rows as an output/ JSON file (MASTER_RULE.md Step 5 shape)"""
+    items = [post.to_json() for post in posts]
+    data = {
+        'session_id': posts[0].session_id if posts else '',
+        'profile_url': profile_url,
+        'username': username,
+        'scrape_timestamp': scrape_timestamp,
+        'parse_timestamp': datetime.now().isoformat() + 'Z',
+        'posts': items,
+        'summary': {
+            'total_posts': len(items),
+            'successfully_parsed': sum(item['parse_status'] == 'parsed' for item in items),
+            'non_events': sum('non-event' in item['extracted_title'].lower() for item in items),
+            'posts_with_contacts': sum(bool(item['phone_numbers']) for item in items),
+        },
+    }
+    write_json_atomic(path, data)
@@ -231,9 +231,45 @@ function updateSessionStatus(sessionId, status) {
   console.log(`Updated session ${sessionId} status to ${status}`);
 }
 
-// Format posts for Claude to process
-function formatPostsForClaude(posts) {
+// Prepare batch sizing. Token counts are estimates (no tokenizer dependency):
+// ~4 ASCII chars per token, and every non-ASCII code point (emoji, styled
+// unicode, Arabic greetings) counted as a full token to stay on the safe side.
+const CAPTION_PREVIEW_CHARS = 300;
+const DEFAULT_TOKEN_BUDGET = parseInt(process.env.PREPARE_TOKEN_BUDGET) || 6000;
+const RESPONSE_TOKENS_PER_POST = 150; // room for the JSON object Claude returns per post
+
+// Strip the "X likes, Y comments - username on date: " prefix (same as clean_caption in final_parse.py)
+function cleanCaption(caption) {
+  if (!caption) return '';
+  return caption
+    .replace(/^[\d,.]+\s+(?:likes|comments)[\s\S]*?:\s*"/, '')
+    .replace(/^"/, '')
+    .replace(/"\.?\s*\u200e?\s*$/, '')
+    .trim();
+}
+
+function captionPreview(caption) {
+  const cleaned = cleanCaption(caption);
+  return cleaned.length > CAPTION_PREVIEW_CHARS
+    ? cleaned.substring(0, CAPTION_PREVIEW_CHARS) + '...'
+    : cleaned;
+}
+
+function estimateTokens(text) {
+  let ascii = 0;
+  let other = 0;
+  for (const char of text) {
+    if (char.charCodeAt(0) < 128) ascii++;
+    else other++;
+  }
+  return Math.ceil(ascii / 4) + other;
+}
+
+function formatPromptHeader(batchNumber, totalBatches) {
   let output = '# Instagram Captions to Parse\n\n';
+  if (totalBatches > 1) {
+    output += `Batch ${batchNumber} of ${totalBatches}\n\n`;
+  }
   output += 'Please extract the following information from each caption:\n';
   output += '- Event Title\n';
   output += '- Organizer\n';
@@ -245,21 +281,61 @@ function formatPostsForClaude(posts) {
   output += 'Return the results as a JSON array where each object has:\n';
   output += '{ postIndex, title, organizer, date, location, fee, phones, contacts }\n\n';
   output += '--- CAPTIONS TO PARSE ---\n\n';
+  return output;
+}
+
+function formatPostBlock(post) {
+  let output = `## Post ${post.postIndex}\n`;
+  output += `URL: ${post.postUrl}\n`;
+  output += `Caption:\n${captionPreview(post.originalCaption)}\n`;
+  output += '\n---\n\n';
+  return output;
+}
 
+// Format posts for Claude to process
+function formatPostsForClaude(posts, batchNumber = 1, totalBatches = 1) {
+  let output = formatPromptHeader(batchNumber, totalBatches);
   for (const post of posts) {
-    const captionPreview = post.originalCaption.length > 300
-      ? post.originalCaption.substring(0, 300) + '...'
-      : post.originalCaption;
-
-    output += `## Post ${post.postIndex}\n`;
-    output += `URL: ${post.postUrl}\n`;
-    output += `Caption:\n${captionPreview}\n`;
-    output += '\n---\n\n';
+    output += formatPostBlock(post);
   }
-
   return output;
 }
 
+// Bin-pack posts into batches that fit the token budget (first-fit decreasing).
+// A single post that is larger than the budget on its own gets its own batch.
+function planBatches(posts, budget = DEFAULT_TOKEN_BUDGET) {
+  // Header cost is taken with the "Batch N of M" line so every batch fits
+  const headerTokens = estimateTokens(formatPromptHeader(999, 999));
+  const capacity = budget - headerTokens;
+
+  const items = posts
+    .map(post => ({
+      post,
+      tokens: estimateTokens(formatPostBlock(post)) + RESPONSE_TOKENS_PER_POST
+    }))
+    .sort((a, b) => b.tokens - a.tokens);
+
+  const bins = [];
+  for (const item of items) {
+    const bin = bins.find(b => b.tokens + item.tokens <= capacity);
+    if (bin) {
+      bin.items.push(item);
+      bin.tokens += item.tokens;
+    } else {
+      bins.push({ items: [item], tokens: item.tokens, oversized: item.tokens > capacity });
+    }
+  }
+
+  // Keep post order inside a batch and order batches by their first post
+  return bins
+    .map(bin => ({
+      posts: bin.items.map(i => i.post).sort((a, b) => a.postIndex - b.postIndex),
+      tokens: headerTokens + bin.tokens,
+      oversized: bin.oversized
+    }))
+    .sort((a, b) => a.posts[0].postIndex - b.posts[0].postIndex);
+}
+
 // CLI interface
 const args = process.argv.slice(2);
 const command = args[0];
@@ -314,7 +390,7 @@ switch (command) {
   case 'prepare':
     const prepSessionId = args[1];
     if (!prepSessionId) {
-      console.log('Usage: node processParse.js prepare <sessionId>');
+      console.log('Usage: node processParse.js prepare <sessionId> [--budget TOKENS]');
       process.exit(1);
     }
 
@@ -336,19 +412,57 @@ switch (command) {
       break;
     }
 
-    const formatted = formatPostsForClaude(pendingPosts);
+    const budgetIdx = args.indexOf('--budget');
+    const budget = budgetIdx !== -1 ? parseInt(args[budgetIdx + 1]) : DEFAULT_TOKEN_BUDGET;
+    if (!budget || budget <= 0) {
+      console.log('Usage: node processParse.js prepare <sessionId> [--budget TOKENS]');
+      process.exit(1);
+    }
+
+    const batches = planBatches(pendingPosts, budget);
+    const prepTimestamp = Date.now();
+    const historyDir = path.join(__dirname, 'parse-history');
+    fs.mkdirSync(historyDir, { recursive: true });
+
+    const manifest = {
+      sessionId: prepSessionId,
+      createdAt: new Date(prepTimestamp).toISOString(),
+      tokenBudget: budget,
+      totalPosts: pendingPosts.length,
+      batches: []
+    };
+
+    batches.forEach((batch, i) => {
+      const batchFile = `prepare-${prepSessionId}-${prepTimestamp}-b${i + 1}.md`;
+      fs.writeFileSync(
+        path.join(historyDir, batchFile),
+        formatPostsForClaude(batch.posts, i + 1, batches.length),
+        'utf8'
+      );
+      manifest.batches.push({
+        batch: i + 1,
+        file: batchFile,
+        estimatedTokens: batch.tokens,
+        oversized: batch.oversized,
+        postIndexes: batch.posts.map(p => p.postIndex)
+      });
+    });
+
+    const manifestFile = path.join(historyDir, `prepare-${prepSessionId}-${prepTimestamp}-manifest.json`);
+    fs.writeFileSync(manifestFile, JSON.stringify(manifest, null, 2), 'utf8');
 
-    // Write to a file for easy copying
-    const outputFile = path.join(__dirname, 'parse-history', `prepare-${prepSessionId}-${Date.now()}.md`);
-    fs.mkdirSync(path.join(__dirname, 'parse-history'), { recursive: true });
-    fs.writeFileSync(outputFile, formatted, 'utf8');
+    console.log(`Prepared ${pendingPosts.length} captions in ${batches.length} batch(es) (budget ${budget} tokens).`);
+    for (const entry of manifest.batches) {
+      console.log(`  ${entry.file}: ${entry.postIndexes.length} posts, ~${entry.estimatedTokens} tokens${entry.oversized ? ' (over budget)' : ''}`);
+    }
+    console.log(`Manifest saved to: ${manifestFile}`);
 
-    console.log(`Prepared ${pendingPosts.length} captions.`);
-    console.log(`Output saved to: ${outputFile}`);
-    console.log('\nCopy the content below and paste it to Claude:\n');
-    console.log('='.repeat(60));
-    console.log(formatted);
-    console.log('='.repeat(60));
+    if (batches.length === 1) {
+      console.log('\nCopy the content below and paste it to Claude:\n');
+      console.log('='.repeat(60));
+      console.log(formatPostsForClaude(batches[0].posts));
+      console.log('='.repeat(60));
+    }
     break;
 
   case 'apply':
@@ -453,7 +567,7 @@ Claude Parse Manager CLI
 Usage:
   node processParse.js list                          - List all sessions
   node processParse.js show <sessionId>              - Show session details
-  node processParse.js prepare <sessionId>           - Prepare captions for Claude (prints to console)
+  node processParse.js prepare <sessionId> [--budget N] - Prepare captions for Claude in token-budgeted batches
   node processParse.js apply <sessionId> <json>      - Apply Claude's JSON results to CSV
   node processParse.js status <sessionId> <status>   - Update session status
 
@@ -461,6 +575,7 @@ Examples:
   node processParse.js list
   node processParse.js show abc123def456
   node processParse.js prepare abc123def456
+  node processParse.js prepare abc123def456 --budget 4000
   node processParse.js apply abc123def456 '[{"postIndex":10,"title":"Event Name","organizer":"Org","date":"2025-01-15","location":"Venue","fee":"Rp 50000","phones":["08123456789"],"contacts":[{"name":"Contact","phone":"08123456789"}]}]'
   node processParse.js status abc123def456 parsed
 `);
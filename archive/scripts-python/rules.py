@@ -0,0 +1,214 @@
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+
+# Extraction rules (month tables, title anchors, organizer phrases and
+# aliases, location keywords, fee words) live in
+# rules/extraction.json so they can be changed without touching the code.
+#
+# The file is expanded into the pattern sources the extractors use and every
+# pattern is compiled once to validate it. The expanded rules are cached on
+# disk under rules/.cache by content hash, so an unchanged file skips that
+# step on the next start (compiled re objects themselves cannot be stored;
+# extractors compile them lazily through _re()). current() re-checks the
+# file's mtime every RELOAD_SECONDS, so a long-running process picks up an
+# edited file without a restart.
+
+RULES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'rules')
+RULES_FILE = os.path.join(RULES_DIR, 'extraction.json')
+CACHE_DIR = os.path.join(RULES_DIR, '.cache')
+
+# Bump when expand() changes, so cache entries of the old expansion are not used
+EXPANSION_VERSION = 4
+RELOAD_SECONDS = 2.0
+
+
+class RuleSet:
+    """Expanded rules: pattern sources and lookup tables, ready for the extractors"""
+
+    def __init__(self, expanded, digest):
+        self.digest = digest
+        self.version = expanded['version']
+        self.months = expanded['months']
+        self.dmy_date = expanded['dmy_date']
+        self.mdy_date = expanded['mdy_date']
+        self.title_patterns = expanded['title_patterns']
+        # kind -> language -> alternation of that language's phrases
+        self.phrases = expanded['phrases']
+        self.organizer_aliases = expanded['organizer_aliases']
+        self.free_fee = expanded['free_fee']
+        self.fee_patterns = expanded['fee_patterns']
+
+    def __repr__(self):
+        return f"RuleSet(version={self.version!r}, digest={self.digest[:12]!r})"
+
+
+def _alternation(words):
+    """Literal words/phrases -> regex alternation (spaces match any whitespace)"""
+    return '|'.join(r'\s+'.join(re.escape(part) for part in word.split()) for word in words)
+
+
+def expand(data):
+    """Rule file contents -> JSON-serializable pattern sources (raises ValueError on a bad file)"""
+    try:
+        months = data['months']
+        month_names = '|'.join(months['id'] + months['en'])
+        # Every month name starts with one of these; checking that first lets the
+        # re module skip most positions instead of trying each name there
+        initials = sorted({name[:1] for name in months['id'] + months['en']} |
+                          {name[:1].swapcase() for name in months['id'] + months['en']})
+        month_initials = re.escape(''.join(initials))
+        month_numbers = {}
+        for names in (months['id'], months['en']):
+            if len(names) != 12:
+                raise ValueError("months.id and months.en need 12 names each")
+            for number, name in enumerate(names, 1):
+                month_numbers[name.lower()] = f"{number:02d}"
+        month_numbers.update(months.get('abbreviations', {}))
+
+        title = data['title']
+        stops = title['stops']
+        title_patterns = [
+            rf"{prefix['anchor']}(.*?)(?:{'|'.join(stops + prefix.get('extra_stops', []))})"
+            for prefix in title.get('prefixes', [])
+        ]
+        title_patterns += [rf"({anchor}.*?)(?:{'|'.join(stops)})" for anchor in title['anchors']]
+
+        phrases = {
+            'organizer': {lang: _alternation(words) for lang, words in data['organizer']['phrases'].items()},
+            'location': {lang: _alternation(words) for lang, words in data['location']['keywords'].items()},
+        }
+
+        fee = data['fee']
+        expanded = {
+            'version': data.get('version', 0),
+            'months': month_numbers,
+            # "17 Agustus 2025" and "August 17, 2025" (day, month, year groups in text order)
+            'dmy_date': rf'(\d{{1,2}})\s+({month_names})\s+(\d{{4}})',
+            'mdy_date': rf'(?=[{month_initials}])({month_names})\s+(\d{{1,2}}),?\s+(\d{{4}})',
+            'title_patterns': title_patterns,
+            'phrases': phrases,
+            'organizer_aliases': data['organizer']['aliases'],
+            'free_fee': rf"\b(?:{_alternation(fee['free_words'])})\b",
+            # Rp amounts (group 1) or an "Insert ..." amount (whole match), all case-insensitive
+            'fee_patterns': [
+                # Wave names are at most a few words; an open-ended [\w\s]+\s* here backtracks badly
+                rf"(?:{_alternation(fee['words'])})\s*(?:gelombang\s+\w+(?:[ \t]+\w+){{0,3}}\s*)?[:\-]?\s*Rp\.?\s*([\d\.]+)",
+                r'gelombang\s+\w+(?:[ \t]+\w+){0,3}\s*[:\-]?\s*Rp\.?\s*([\d\.]+)',
+                r'Rp\.?\s*([\d\.]+)\s*(?:,-|\.)\s*',
+                r'Insert\s*[:\.]?\s*(?:\d+[\.\s]*)+',
+            ],
+        }
+    except (KeyError, TypeError, AttributeError) as e:
+        raise ValueError(f"missing or malformed rule section: {e}") from e
+
+    sources = [expanded['dmy_date'], expanded['mdy_date'], expanded['free_fee']]
+    sources += title_patterns + expanded['organizer_aliases'] + expanded['fee_patterns']
+    sources += [alternation for sets in phrases.values() for alternation in sets.values()]
+    for source in sources:
+        try:
+            re.compile(source)
+        except re.error as e:
+            raise ValueError(f"bad pattern {source!r}: {e}") from e
+    return expanded
+
+
+def _cache_path(path, digest):
+    name = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(CACHE_DIR, f"{name}-{digest[:16]}.json")
+
+
+# [hits, misses] of load()'s on-disk cache in this process
+_cache_counts = [0, 0]
+
+
+def cache_counts():
+    """(hits, misses) of the expanded-rules disk cache since the process started"""
+    return tuple(_cache_counts)
+
+
+def load(path=RULES_FILE):
+    """Read, validate and expand a rule file, using the on-disk cache when the content is unchanged"""
+    with open(path, 'rb') as f:
+        content = f.read()
+    digest = hashlib.sha256(content + f"/{EXPANSION_VERSION}".encode()).hexdigest()
+    cache_path = _cache_path(path, digest)
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            rules = RuleSet(json.load(f), digest)
+        _cache_counts[0] += 1
+        return rules
+    except (OSError, ValueError):
+        pass
+
+    _cache_counts[1] += 1
+    expanded = expand(json.loads(content.decode('utf-8')))
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(expanded, f, ensure_ascii=False)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        # A read-only install still works, it just expands the rules on every start
+        pass
+    return RuleSet(expanded, digest)
+
+
+class HotReload:
+    """A value loaded from a file and reloaded when the file changes.
+
+    get() re-checks the file's mtime at most every RELOAD_SECONDS. A broken
+    edit keeps the previous value (with a warning) instead of stopping the
+    process. Used for the rules here and for gazetteer.current().
+    """
+
+    def __init__(self, load):
+        self.load = load
+        self.value = None
+        self.mtime = None
+        self.checked_at = 0.0
+        # Called with no arguments whenever get() swaps in a newly loaded value
+        self.hooks = []
+
+    def get(self, path):
+        now = time.monotonic()
+        if self.value is not None and now - self.checked_at < RELOAD_SECONDS:
+            return self.value
+        self.checked_at = now
+        try:
+            mtime = os.stat(path).st_mtime_ns
+            if mtime == self.mtime:
+                return self.value
+            value = self.load(path)
+        except (OSError, ValueError) as e:
+            if self.value is None:
+                raise
+            print(f"Keeping {self.value!r}: {path} could not be loaded ({e})", file=sys.stderr)
+            self.mtime = None if isinstance(e, OSError) else mtime
+            return self.value
+        self.value, self.mtime = value, mtime
+        for hook in self.hooks:
+            hook()
+        return self.value
+
+
+_rules = HotReload(load)
+
+
+def on_reload(hook):
+    """Call hook() each time current() loads a changed rule file (e.g. to drop caches built from the old rules)"""
+    _rules.hooks.append(hook)
+
+
+def current(path=None):
+    """The rules in effect, reloaded when the file has changed.
+
+    path defaults to RULES_FILE at call time, so a process can point the
+    extractors at another rule file by setting rules.RULES_FILE (see
+    HotReload for when the file is re-checked).
+    """
+    return _rules.get(path or RULES_FILE)
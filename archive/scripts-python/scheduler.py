@@ -0,0 +1,165 @@
+"""Deadline-aware ordering of parse and upload work.
+
+A lead is worth most before the competition's registration closes, but
+sessions are parsed and uploaded in file order. This estimates each post's
+urgency cheaply, from the caption header's post date and one scan for
+DMY/MDY dates (no full extraction), and orders work by it:
+
+  live      the earliest date in the caption that is not past yet (or, with
+            no date in the caption, post date + DEFAULT_WINDOW_DAYS) is
+            today or later; soonest first
+  unknown   no date in the caption and no header post date
+  expired   every date has passed; newest post first
+
+batch.py --schedule parses the files with the most urgent posts first, and
+vps_payload.py --schedule puts the most urgent posts in the first chunks,
+so uploading chunks in order sends them to the CRM first. Everything else
+is backfilled afterwards.
+
+Usage:
+  python scheduler.py [inputs ...] [--today YYYY-MM-DD] [--top N]
+"""
+import argparse
+import heapq
+import os
+import re
+from collections import Counter, namedtuple
+from datetime import date, timedelta
+
+from extractors import compiled_pattern, parse_header
+from parsed_post import iter_captions
+from rules import current as current_rules
+
+# Registration usually stays open about this long after the announcement
+DEFAULT_WINDOW_DAYS = 30
+LIVE, UNKNOWN, EXPIRED = 0, 1, 2
+TIER_NAMES = {LIVE: 'live', UNKNOWN: 'unknown', EXPIRED: 'expired'}
+
+Urgency = namedtuple('Urgency', 'tier deadline post_date')
+
+
+def _to_date(year, month_name, day):
+    month = current_rules().months.get(month_name.lower())
+    try:
+        return date(int(year), int(month), int(day)) if month else None
+    except ValueError:
+        return None
+
+
+def scan_dates(text):
+    """Every DMY / MDY date in text, as date objects"""
+    rules = current_rules()
+    found = []
+    for match in compiled_pattern(rules.dmy_date, re.IGNORECASE).finditer(text):
+        day, month_name, year = match.groups()
+        found.append(_to_date(year, month_name, day))
+    for match in compiled_pattern(rules.mdy_date, re.IGNORECASE).finditer(text):
+        month_name, day, year = match.groups()
+        found.append(_to_date(year, month_name, day))
+    return [value for value in found if value is not None]
+
+
+def urgency(caption, today=None):
+    """Cheap urgency estimate of one caption"""
+    today = today or date.today()
+    header = parse_header(caption)
+    post_date = date.fromisoformat(header.post_date) if header.post_date else None
+    dates = scan_dates(header.body)
+    upcoming = [value for value in dates if value >= today]
+    if upcoming:
+        return Urgency(LIVE, min(upcoming), post_date)
+    if dates:
+        return Urgency(EXPIRED, max(dates), post_date)
+    if post_date is None:
+        return Urgency(UNKNOWN, None, None)
+    deadline = post_date + timedelta(days=DEFAULT_WINDOW_DAYS)
+    return Urgency(LIVE if deadline >= today else EXPIRED, deadline, post_date)
+
+
+def priority(value):
+    """Sort key of an Urgency: live by deadline, then unknown, then expired newest first"""
+    newest = -(value.post_date or value.deadline or date.min).toordinal()
+    if value.tier == LIVE:
+        return (LIVE, value.deadline.toordinal(), newest)
+    return (value.tier, newest, 0)
+
+
+class Scheduler:
+    """Priority queue of work items ordered by urgency (ties keep insertion order)"""
+
+    def __init__(self, today=None):
+        self.today = today or date.today()
+        self._heap = []
+        self._count = 0
+
+    def push(self, item, caption):
+        value = urgency(caption, self.today)
+        heapq.heappush(self._heap, (priority(value), self._count, value, item))
+        self._count += 1
+        return value
+
+    def pop(self):
+        """(item, urgency) of the most urgent item"""
+        _key, _seq, value, item = heapq.heappop(self._heap)
+        return item, value
+
+    def __len__(self):
+        return len(self._heap)
+
+    def drain(self):
+        while self._heap:
+            yield self.pop()
+
+
+def order_posts(posts, today=None, caption=lambda post: post.original_caption):
+    """Posts (ParsedPost rows, or anything caption() reads), most urgent first"""
+    scheduler = Scheduler(today)
+    for post in posts:
+        scheduler.push(post, caption(post))
+    return [post for post, _value in scheduler.drain()]
+
+
+def order_files(paths, today=None, captions=iter_captions):
+    """Input files ordered by their most urgent post; captions(path) -> the file's captions.
+
+    Only the caption column is read (no ParsedPost rows are built), since
+    the run reads every file again to parse it.
+    """
+    today = today or date.today()
+    keys = {}
+    for path in paths:
+        best = None
+        for caption in captions(path):
+            key = priority(urgency(caption, today))
+            best = key if best is None or key < best else best
+        # A file without captions goes last
+        keys[path] = best or (EXPIRED + 1,)
+    return sorted(paths, key=lambda path: keys[path])
+
+
+def main():
+    from batch import discover, load
+
+    parser = argparse.ArgumentParser(description='Show the urgency order of queued posts')
+    parser.add_argument('inputs', nargs='*', help='Files (default: every session in parsed/ and output/)')
+    parser.add_argument('--today', type=date.fromisoformat, default=None,
+                        help='Reference date, YYYY-MM-DD (default: today)')
+    parser.add_argument('--top', type=int, default=10, help='Most urgent posts to list (default: 10)')
+    args = parser.parse_args()
+
+    scheduler = Scheduler(args.today)
+    tiers = Counter()
+    for path in args.inputs or discover():
+        for post in load(path)[0]:
+            value = scheduler.push((os.path.basename(path), post), post.original_caption)
+            tiers[value.tier] += 1
+    print(f"{len(scheduler)} posts as of {scheduler.today}: "
+          + ', '.join(f"{tiers[tier]} {name}" for tier, name in TIER_NAMES.items()))
+    for _ in range(min(args.top, len(scheduler))):
+        (name, post), value = scheduler.pop()
+        print(f"  {TIER_NAMES[value.tier]:<8} deadline {value.deadline or '-'}  posted {value.post_date or '-'}  "
+              f"{name} #{post.post_index}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+import re
+
+# Emoji that open a section in infolomba captions. final_parse.py builds its
+# location stop characters from these so the sets live in one place.
+MARKER_EMOJI = {
+    'date': '📆📅🗓',
+    'location': '📍🏫',
+    'fee': '💰💸',
+    'contacts': '📞📲📱☎',
+}
+
+# Keyword markers. Date/location keywords need a trailing colon within a few
+# characters so prose like "tempat terbaik" does not open a section.
+MARKER_KEYWORDS = {
+    'date': ('tanggal', 'date', 'waktu'),
+    'location': ('tempat', 'lokasi', 'venue', 'location'),
+    'fee': ('biaya', 'htm', 'registration fee'),
+    'contacts': ('cp', 'contact person', 'narahubung'),
+}
+COLON_LABELS = ('date', 'location')
+
+# A section runs to the next marker, but never further than this
+MAX_SECTION_CHARS = 500
+
+_emoji_re = None
+_EMOJI_LABEL = {char: label for label, chars in MARKER_EMOJI.items() for char in chars}
+
+
+def _find_markers(caption):
+    """Return sorted (position, label) marker hits.
+
+    Emoji come from one character-class scan; keywords use str.find on the
+    lowercased caption, which is much cheaper than a case-insensitive regex
+    alternation over every position of a 2-5k char caption.
+    """
+    global _emoji_re
+    if _emoji_re is None:
+        _emoji_re = re.compile(f"[{''.join(MARKER_EMOJI.values())}]")
+    hits = [(m.start(), _EMOJI_LABEL[m.group()]) for m in _emoji_re.finditer(caption)]
+
+    lowered = caption.lower()
+    if len(lowered) != len(caption):
+        # A few characters change length when lowercased; keep offsets exact
+        lowered = caption
+    size = len(lowered)
+    for label, words in MARKER_KEYWORDS.items():
+        for word in words:
+            pos = lowered.find(word)
+            while pos != -1:
+                end = pos + len(word)
+                if ((pos == 0 or not lowered[pos - 1].isalnum())
+                        and (end == size or not lowered[end].isalnum())):
+                    if label not in COLON_LABELS:
+                        hits.append((pos, label))
+                    else:
+                        window = lowered[end:end + 26].split('\n', 1)[0]
+                        if ':' in window:
+                            hits.append((pos, label))
+                pos = lowered.find(word, end)
+    hits.sort()
+    return hits
+
+
+def segment_caption(caption):
+    """Split a cleaned caption into labeled sections.
+
+    Returns a dict with 'head' (text before the first marker) and any of
+    'date', 'location', 'fee', 'contacts'. A label that appears more than
+    once gets its slices joined with newlines.
+    """
+    markers = []
+    for position, label in _find_markers(caption):
+        # "📞 Contact Person:" is one section, not two
+        if not markers or markers[-1][1] != label:
+            markers.append((position, label))
+    if not markers:
+        return {'head': caption}
+
+    sections = {'head': caption[:markers[0][0]]}
+    for i, (start, label) in enumerate(markers):
+        end = markers[i + 1][0] if i + 1 < len(markers) else len(caption)
+        text = caption[start:min(end, start + MAX_SECTION_CHARS)].strip()
+        if not text:
+            continue
+        if label in sections:
+            sections[label] += '\n' + text
+        else:
+            sections[label] = text
+    return sections
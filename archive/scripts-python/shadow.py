@@ -0,0 +1,270 @@
+"""Shadow run: parse the same sessions with two extractor versions and diff them.
+
+Each version parses every caption in its own process pool, and both pools
+run at the same time. The report lists every row where a compared field
+differs between the two versions, with per-field counts and the CPU time
+each version spent. Use it to check a faster pattern set against real
+sessions before it reaches the CRM.
+
+A version is one of:
+  .               the working tree (default baseline)
+  <dir>           a folder holding final_parse.py and its modules (e.g. a git worktree)
+  <file>.json     the working tree code with another rules file (see rules.py)
+  <git ref>       archive/scripts-python as of that commit, e.g. HEAD~1 or a branch
+
+Compared fields are title, date, fee and contacts (metrics.FILL_FIELDS);
+--fields all compares every field parse_caption returns.
+
+Usage:
+  python shadow.py --candidate VERSION [--baseline VERSION] [inputs ...] [--workers N] [--fields all] [--out PATH]
+"""
+import argparse
+import importlib
+import io
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+REPO_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+PARSED_DIR = os.path.join(REPO_DIR, 'parsed')
+SHADOW_DIR = os.path.join(PARSED_DIR, 'shadow')
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+DEFAULT_CHUNK_SIZE = 50
+# Files submitted to the pools ahead of the one being diffed
+READ_AHEAD = 1
+
+_parse_caption = None
+
+
+def export_ref(ref, dest):
+    """Unpack archive/scripts-python as of a git ref into dest; returns the scripts folder"""
+    prefix = os.path.relpath(SCRIPT_DIR, REPO_DIR).replace(os.sep, '/')
+    result = subprocess.run(['git', 'archive', '--format=tar', ref, '--', prefix],
+                            cwd=REPO_DIR, capture_output=True, check=False)
+    if result.returncode != 0:
+        raise ValueError(f"git archive {ref}: {result.stderr.decode(errors='replace').strip()}")
+    with tarfile.open(fileobj=io.BytesIO(result.stdout)) as tar:
+        tar.extractall(dest)
+    return os.path.join(dest, prefix)
+
+
+def resolve_version(spec, tmp_dir):
+    """Version spec -> (code folder, rules file or None)"""
+    if spec in ('', '.'):
+        return SCRIPT_DIR, None
+    if spec.endswith('.json') and os.path.isfile(spec):
+        return SCRIPT_DIR, os.path.abspath(spec)
+    if os.path.isdir(spec):
+        return os.path.abspath(spec), None
+    return export_ref(spec, os.path.join(tmp_dir, spec.replace('/', '_').replace('~', '-'))), None
+
+
+def _init_worker(code_dir, rules_path):
+    """Pool initializer: import parse_caption from code_dir instead of this folder"""
+    global _parse_caption
+    # A spawned worker re-imports this module; drop any script modules that came with it
+    this = sys.modules[__name__]
+    for name, module in list(sys.modules.items()):
+        path = getattr(module, '__file__', None)
+        if module is not this and path and os.path.dirname(os.path.abspath(path)) == SCRIPT_DIR:
+            del sys.modules[name]
+    sys.path.insert(0, code_dir)
+    if rules_path:
+        rules = importlib.import_module('rules')
+        rules.RULES_FILE = rules_path
+    _parse_caption = importlib.import_module('final_parse').parse_caption
+
+
+def _parse_chunk(captions):
+    """Worker: parse_caption over a chunk -> ([(fields, error)], cpu_seconds)"""
+    start = time.process_time()
+    results = []
+    for caption in captions:
+        try:
+            results.append((_parse_caption(caption), None))
+        except Exception as e:
+            results.append((None, f"{type(e).__name__}: {e}"))
+    return results, time.process_time() - start
+
+
+def _value(fields, error, column):
+    return f"<error: {error}>" if error else (fields or {}).get(column, '')
+
+
+def diff_rows(path, posts, baseline, candidate, columns):
+    """Changed fields of one file -> list of {file, post_index, post_url, field, baseline, candidate}"""
+    changes = []
+    for post, (base_fields, base_error), (cand_fields, cand_error) in zip(posts, baseline, candidate):
+        names = columns
+        if names is None:
+            names = sorted(set(base_fields or {}) | set(cand_fields or {}))
+        for column in names:
+            old = _value(base_fields, base_error, column)
+            new = _value(cand_fields, cand_error, column)
+            if old != new:
+                changes.append({
+                    'file': os.path.basename(path),
+                    'post_index': post.post_index,
+                    'post_url': post.post_url,
+                    'field': column,
+                    'baseline': old,
+                    'candidate': new,
+                })
+    return changes
+
+
+def run(paths, baseline, candidate, workers=None, chunk_size=DEFAULT_CHUNK_SIZE, columns=None):
+    """Parse paths with both versions in parallel; returns the report dict.
+
+    baseline / candidate are (code folder, rules file or None) from
+    resolve_version(); columns=None compares every field.
+    """
+    from batch import load
+
+    workers = workers or os.cpu_count() or 2
+    per_version = max(1, workers // 2)
+    # Spawned workers start clean, so each pool imports its own version's modules
+    context = multiprocessing.get_context('spawn')
+    pools = [
+        ProcessPoolExecutor(per_version, mp_context=context, initializer=_init_worker, initargs=version)
+        for version in (baseline, candidate)
+    ]
+    start = time.perf_counter()
+    cpu = [0.0, 0.0]
+    errors = [0, 0]
+    files = []
+    changes = []
+    def submit(path):
+        posts, _metadata = load(path)
+        chunks = [[post.original_caption for post in posts[i:i + chunk_size]]
+                  for i in range(0, len(posts), chunk_size)]
+        return path, posts, [[pool.submit(_parse_chunk, chunk) for chunk in chunks] for pool in pools]
+
+    def collect(path, posts, futures):
+        results = [[], []]
+        for side in (0, 1):
+            for future in futures[side]:
+                chunk_results, chunk_cpu = future.result()
+                results[side].extend(chunk_results)
+                cpu[side] += chunk_cpu
+            errors[side] += sum(error is not None for _fields, error in results[side])
+        file_changes = diff_rows(path, posts, results[0], results[1], columns)
+        changes.extend(file_changes)
+        files.append({
+            'input': path,
+            'rows': len(posts),
+            'changed_rows': len({change['post_index'] for change in file_changes}),
+        })
+        print(f"{os.path.basename(path)}: {len(posts)} rows, {files[-1]['changed_rows']} changed")
+
+    try:
+        # Only READ_AHEAD files wait in the pools beyond the one being diffed,
+        # so memory holds a few sessions, not the whole corpus
+        pending = deque()
+        for path in paths:
+            pending.append(submit(path))
+            if len(pending) > READ_AHEAD:
+                collect(*pending.popleft())
+        while pending:
+            collect(*pending.popleft())
+    finally:
+        for pool in pools:
+            pool.shutdown(cancel_futures=True)
+    elapsed = time.perf_counter() - start
+
+    rows = sum(entry['rows'] for entry in files)
+    by_field = {}
+    for change in changes:
+        by_field[change['field']] = by_field.get(change['field'], 0) + 1
+    return {
+        'started': datetime.now().isoformat(),
+        'baseline': {'code': baseline[0], 'rules': baseline[1]},
+        'candidate': {'code': candidate[0], 'rules': candidate[1]},
+        'fields': columns or 'all',
+        'elapsed_seconds': round(elapsed, 3),
+        'timing': {
+            name: {
+                'cpu_seconds': round(seconds, 3),
+                'rows_per_cpu_second': round(rows / seconds, 1) if seconds else 0,
+                'errors': errors[side],
+            }
+            for side, (name, seconds) in enumerate(zip(('baseline', 'candidate'), cpu))
+        },
+        'totals': {
+            'files': len(files),
+            'rows': rows,
+            'changed_rows': sum(entry['changed_rows'] for entry in files),
+            'changed_fields': by_field,
+        },
+        'files': files,
+        'changes': changes,
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Diff two extractor versions field by field over the same sessions')
+    parser.add_argument('inputs', nargs='*',
+                        help='Files to parse (default: every session in parsed/ and output/)')
+    parser.add_argument('--candidate', required=True, help='Version to check: folder, rules .json or git ref')
+    parser.add_argument('--baseline', default='.', help='Version to compare against (default: working tree)')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Parser processes, split between the two versions (default: CPU count)')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                        help=f'Captions per pool task (default: {DEFAULT_CHUNK_SIZE})')
+    parser.add_argument('--fields', default=None,
+                        help='Comma-separated columns to compare, or "all" (default: title, date, fee, contacts)')
+    parser.add_argument('--out', default=None, help='Report file (default: parsed/shadow/shadow-<ts>.json)')
+    return parser.parse_args()
+
+
+def main():
+    from batch import discover
+    from metrics import FILL_FIELDS
+
+    args = parse_args()
+    paths = args.inputs or discover()
+    if not paths:
+        print("No parsed#N CSV or scraped JSON to compare")
+        return
+    if args.fields == 'all':
+        columns = None
+    elif args.fields:
+        columns = [column.strip() for column in args.fields.split(',') if column.strip()]
+    else:
+        columns = list(FILL_FIELDS.values())
+
+    with tempfile.TemporaryDirectory(prefix='shadow-') as tmp_dir:
+        try:
+            baseline = resolve_version(args.baseline, tmp_dir)
+            candidate = resolve_version(args.candidate, tmp_dir)
+        except ValueError as e:
+            sys.exit(f"Error: {e}")
+        print(f"Shadow run: {len(paths)} files, baseline {args.baseline} vs candidate {args.candidate}")
+        report = run(paths, baseline, candidate, args.workers, args.chunk_size, columns)
+
+    out = args.out or os.path.join(SHADOW_DIR, f"shadow-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    totals = report['totals']
+    print(f"\n{totals['changed_rows']}/{totals['rows']} rows changed")
+    for field, count in sorted(totals['changed_fields'].items()):
+        print(f"  {field}: {count}")
+    for name, timing in report['timing'].items():
+        print(f"  {name}: {timing['cpu_seconds']:.2f} CPU s ({timing['rows_per_cpu_second']} rows/s), "
+              f"{timing['errors']} errors")
+    print(f"Report: {out}")
+
+
+if __name__ == '__main__':
+    main()
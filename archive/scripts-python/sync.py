@@ -0,0 +1,202 @@
+"""Incremental (delta) export of parsed posts to the VPS.
+
+/api/parse/send-to-vps uploads every post of a session each time. This
+keeps a per-post content hash of the VPS payload and the hash that was last
+synced, so only new or changed posts go into the next upload.
+
+`push` builds the delta and uploads it (vps_payload.py's API calls, in
+chunks of --max-posts). The first push of a session creates a VPS session;
+later pushes upload their corrections into the same one, the
+vps_session_id kept in the state. Each chunk is marked synced as soon as
+the VPS accepts it. `delta` only writes the payload to a file, for an
+upload done some other way, and `mark-synced` records it afterwards.
+
+The state lives in parsed/sync-state.json:
+  {"sessions": {"<session_id>": {"vps_session_id": "...",
+                                 "posts": {"<post key>": {"hash": "...", "synced_at": "..."}}}}}
+
+Usage:
+  python sync.py push <output JSON or parsed CSV> [--all] [--vps-session ID] [--max-posts N]
+  python sync.py delta <output JSON or parsed CSV> [--out delta.json] [--all]
+  python sync.py mark-synced <delta.json> [--vps-session ID]
+  python sync.py status [session_id]
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+from datetime import datetime
+
+from parsed_post import read_posts, write_json_atomic
+from vps_payload import (
+    DEFAULT_MAX_BYTES, DEFAULT_MAX_POSTS, DEFAULT_PROFILE_URL, create_vps_session, group_payloads, upload_posts,
+    vps_post,
+)
+
+REPO_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+PARSED_DIR = os.path.join(REPO_DIR, 'parsed')
+SYNC_STATE_FILE = os.path.join(PARSED_DIR, 'sync-state.json')
+
+
+def content_hash(payload):
+    """Stable hash of what would be uploaded for a post"""
+    canonical = json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()[:16]
+
+
+def post_key(payload):
+    """Posts are identified by URL; index only when a post has no URL"""
+    return payload['postUrl'] or f"#{payload['postIndex']}"
+
+
+def load_session(path):
+    """(session_id, profile_url, MASTER_RULE posts) from an output/ JSON or a parsed#N CSV"""
+    if path.endswith('.json'):
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return data.get('session_id') or '', data.get('profile_url') or '', data.get('posts') or []
+    posts = read_posts(path)
+    return (posts[0].session_id if posts else ''), '', [post.to_json() for post in posts]
+
+
+def load_state(path=SYNC_STATE_FILE):
+    if not os.path.exists(path):
+        return {'sessions': {}}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_state(state, path=SYNC_STATE_FILE):
+    write_json_atomic(path, state)
+
+
+def build_delta(session_id, posts, state, include_all=False):
+    """Delta payload: posts whose content hash differs from the last synced one"""
+    synced = state['sessions'].get(session_id, {})
+    synced_posts = synced.get('posts', {})
+    delta = []
+    hashes = {}
+    total = 0
+    for post in posts:
+        payload = vps_post(post)
+        if payload is None:
+            continue
+        total += 1
+        key = post_key(payload)
+        digest = content_hash(payload)
+        if include_all or synced_posts.get(key, {}).get('hash') != digest:
+            delta.append(payload)
+            hashes[key] = digest
+    return {
+        'sessionId': session_id,
+        # Upload corrections into the VPS session created by the first sync
+        'vpsSessionId': synced.get('vps_session_id'),
+        'createdAt': datetime.now().isoformat() + 'Z',
+        'totalPosts': total,
+        'posts': delta,
+        'hashes': hashes,
+    }
+
+
+def mark_synced(delta, state, vps_session_id=None):
+    """Record a delta's hashes as synced (call only after the upload succeeded)"""
+    session = state['sessions'].setdefault(delta['sessionId'], {'vps_session_id': None, 'posts': {}})
+    if vps_session_id or delta.get('vpsSessionId'):
+        session['vps_session_id'] = vps_session_id or delta['vpsSessionId']
+    synced_at = datetime.now().isoformat() + 'Z'
+    for key, digest in delta['hashes'].items():
+        session['posts'][key] = {'hash': digest, 'synced_at': synced_at}
+    return len(delta['hashes'])
+
+
+def cmd_push(args):
+    session_id, profile_url, posts = load_session(args.input)
+    if not session_id:
+        sys.exit(f"No session_id in {args.input}")
+    state = load_state(args.state)
+    delta = build_delta(session_id, posts, state, args.all)
+    if not delta['posts']:
+        print(f"Session {session_id}: nothing new or changed in {delta['totalPosts']} posts")
+        return
+    vps_session_id = args.vps_session or delta['vpsSessionId']
+    if not vps_session_id:
+        vps_session_id = create_vps_session(profile_url or DEFAULT_PROFILE_URL, len(posts))
+        print(f"Created VPS session {vps_session_id}")
+    sent = 0
+    for chunk, _size in group_payloads(delta['posts'], args.max_posts, DEFAULT_MAX_BYTES):
+        upload_posts(vps_session_id, chunk)
+        # Saved per chunk: a failed upload leaves the rest to the next push
+        hashes = {post_key(payload): delta['hashes'][post_key(payload)] for payload in chunk}
+        mark_synced({'sessionId': session_id, 'hashes': hashes}, state, vps_session_id)
+        save_state(state, args.state)
+        sent += len(chunk)
+    print(f"Session {session_id}: uploaded {sent}/{delta['totalPosts']} posts to VPS session {vps_session_id}")
+
+
+def cmd_delta(args):
+    session_id, _profile_url, posts = load_session(args.input)
+    if not session_id:
+        sys.exit(f"No session_id in {args.input}")
+    delta = build_delta(session_id, posts, load_state(args.state), args.all)
+    out = args.out or os.path.join(PARSED_DIR, f"delta-{session_id}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    with open(out, 'w', encoding='utf-8') as f:
+        json.dump(delta, f, ensure_ascii=False, indent=2)
+    print(f"Session {session_id}: {len(delta['posts'])}/{delta['totalPosts']} posts new or changed")
+    print(f"Delta payload saved to {out}")
+
+
+def cmd_mark_synced(args):
+    with open(args.delta, 'r', encoding='utf-8') as f:
+        delta = json.load(f)
+    state = load_state(args.state)
+    count = mark_synced(delta, state, args.vps_session)
+    save_state(state, args.state)
+    print(f"Session {delta['sessionId']}: marked {count} posts as synced")
+
+
+def cmd_status(args):
+    state = load_state(args.state)
+    for session_id, session in state['sessions'].items():
+        if args.session and session_id != args.session:
+            continue
+        last = max((p['synced_at'] for p in session['posts'].values()), default='never')
+        print(f"{session_id}: {len(session['posts'])} posts synced, "
+              f"VPS session {session.get('vps_session_id') or '-'}, last sync {last}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Delta export of parsed posts to the VPS')
+    parser.add_argument('--state', default=SYNC_STATE_FILE, help=f'Sync state file (default: {SYNC_STATE_FILE})')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    push = commands.add_parser('push', help='Upload new/changed posts to the VPS and mark them synced')
+    push.add_argument('input', help='output/ MASTER_RULE JSON or parsed#N CSV')
+    push.add_argument('--all', action='store_true', help='Upload every post (full resync)')
+    push.add_argument('--vps-session', default=None,
+                      help="VPS session id to upload into (default: the session's last one, else a new one)")
+    push.add_argument('--max-posts', type=int, default=DEFAULT_MAX_POSTS,
+                      help=f'Posts per upload request (default: {DEFAULT_MAX_POSTS})')
+    push.set_defaults(func=cmd_push)
+
+    delta = commands.add_parser('delta', help='Write the payload of new/changed posts')
+    delta.add_argument('input', help='output/ MASTER_RULE JSON or parsed#N CSV')
+    delta.add_argument('--out', default=None, help='Delta file (default: parsed/delta-<session>-<ts>.json)')
+    delta.add_argument('--all', action='store_true', help='Include every post (full resync)')
+    delta.set_defaults(func=cmd_delta)
+
+    mark = commands.add_parser('mark-synced', help='Record a delta as uploaded')
+    mark.add_argument('delta', help='Delta file written by the delta command')
+    mark.add_argument('--vps-session', default=None, help='VPS session id the posts were uploaded to')
+    mark.set_defaults(func=cmd_mark_synced)
+
+    status = commands.add_parser('status', help='Show synced post counts per session')
+    status.add_argument('session', nargs='?', default=None)
+    status.set_defaults(func=cmd_status)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,293 @@
+"""Synthetic infolomba-style captions for scale and stress benchmarks.
+
+The real corpus in /parsed is a few dozen captions. This writes 10k-1M
+generated ones in the same shapes the pipeline reads:
+
+  parsed#N-<session>-<ts>.csv     the parsed#N CSV (FIELDNAMES, extracted columns blank)
+  scraped-<session>-<ts>.json     the output/ scraped JSON scraper.js writes
+
+Captions mix Indonesian and English, emoji and keyword section markers,
+styled Unicode titles (𝐁𝐎𝐋𝐃, 𝑰𝑻𝑨𝑳𝑰𝑪), one to four CP contacts, Rp fee waves or
+free entry, and DMY/MDY dates, with filler text so lengths range from a few
+hundred characters to the 5000+ of long posts. --adversarial sets the share
+of captions built to stress the extractors (long backtracking runs, marker
+floods, huge captions, combining-mark noise).
+
+The same --seed gives the same corpus. Files go to parsed/synth/ so
+batch.py and url_index.py do not pick them up unless pointed at them.
+
+Usage:
+  python synth.py [--rows N] [--adversarial SHARE] [--seed N] [--format csv|json|both] [--out-dir DIR]
+"""
+import argparse
+import csv
+import json
+import os
+import random
+import time
+
+from parsed_post import FIELDNAMES, replace_file
+
+REPO_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+PARSED_DIR = os.path.join(REPO_DIR, 'parsed')
+SYNTH_DIR = os.path.join(PARSED_DIR, 'synth')
+
+DEFAULT_ROWS = 10000
+DEFAULT_ADVERSARIAL = 0.02
+# Share of English captions, close to the repo corpus (7 of 44)
+ENGLISH_SHARE = 0.15
+
+MONTHS = {
+    'id': ['Januari', 'Februari', 'Maret', 'April', 'Mei', 'Juni', 'Juli',
+           'Agustus', 'September', 'Oktober', 'November', 'Desember'],
+    'en': ['January', 'February', 'March', 'April', 'May', 'June', 'July',
+           'August', 'September', 'October', 'November', 'December'],
+}
+EVENTS = ['Essay', 'Poster', 'Karya Tulis Ilmiah', 'Business Plan', 'Debat Bahasa Inggris', 'Fotografi',
+          'Desain Grafis', 'Short Movie', 'Olimpiade Matematika', 'Story Telling', 'Infografis', 'Web Design',
+          'Speech', 'Cerpen', 'Puisi', 'Video Kreatif', 'UI/UX', 'Robotik', 'Data Science', 'Debate']
+KINDS = ['LOMBA', 'COMPETITION', 'KOMPETISI', 'FESTIVAL', 'CHALLENGE', 'OLIMPIADE']
+ACRONYMS = ['ALSEACE', 'ARESTA', 'HARVEST', 'SIAGA', 'NEXUS', 'ECOFEST', 'BIOSFER', 'INVENTION',
+            'SPECTRA', 'GEMASTIK', 'PIONEER', 'ORBIT']
+ORGS = ['HMITP Universitas Bakrie', 'BEM Fakultas Teknik Universitas Indonesia', 'Himpunan Mahasiswa Biologi ITB',
+        'UKM Penelitian UNY', 'Departemen Ilmu Komputer IPB', 'OSIS SMAN 8 Jakarta',
+        'Pondok Pesantren Husnul Khotimah', 'English Club Universitas Airlangga', 'Himatika UGM',
+        'Komunitas Literasi Nusantara', 'Kementerian Pemuda dan Olahraga', 'SPMKB UII']
+VENUES = ['Gedung Serbaguna', 'Auditorium Utama', 'Aula Rektorat', 'Convention Hall', 'Online via Zoom',
+          'Gedung Student Center', 'Balai Kota']
+CITIES = ['Jakarta', 'Bandung', 'Yogyakarta', 'Surabaya', 'Malang', 'Semarang', 'Bogor', 'Medan',
+          'Makassar', 'Denpasar', 'Kuningan, Jawa Barat', 'Depok']
+NAMES = ['Andi', 'Rina', 'Budi Santoso', 'Sari', 'Dimas', 'Nadia Putri', 'Fajar', 'Ayu', 'Rizky Pratama',
+         'Salsa', 'Hana', 'Yoga']
+TAGS = ['lomba', 'infolomba', 'lombamahasiswa', 'lombasma', 'kompetisi', 'essay', 'lombanasional',
+        'mahasiswa', 'competition', 'event']
+FILLER = {
+    'id': ['Ayo tunjukkan kreativitas dan inovasi terbaikmu di ajang bergengsi ini!',
+           'Lomba ini terbuka untuk pelajar dan mahasiswa seluruh Indonesia.',
+           'Jangan lewatkan kesempatan untuk memenangkan total hadiah jutaan rupiah dan sertifikat.',
+           'Kegiatan ini bertujuan untuk mengembangkan potensi generasi muda dalam bidang sains dan teknologi.',
+           'Peserta dapat mendaftar secara individu maupun tim yang terdiri dari maksimal tiga orang.',
+           'Segera daftarkan dirimu sebelum kuota pendaftaran terpenuhi.',
+           'Karya yang dikirimkan harus orisinal dan belum pernah dipublikasikan sebelumnya.'],
+    'en': ['Show your best ideas and compete with students from all over the country!',
+           'This competition is open to high school and university students.',
+           'Win exciting prizes, certificates and the chance to be featured on our page.',
+           'Participants may register individually or as a team of up to three people.',
+           'Submissions must be original work that has not been published before.',
+           'Register now before the quota is full.'],
+}
+LABELS = {
+    'id': {'date': 'Tanggal Pelaksanaan', 'location': 'Tempat', 'fee': 'Biaya Pendaftaran',
+           'contacts': 'Narahubung', 'free': 'GRATIS', 'organizer': 'diselenggarakan oleh',
+           'present': 'dengan bangga mempersembahkan', 'deadline': 'Pendaftaran ditutup'},
+    'en': {'date': 'Date', 'location': 'Venue', 'fee': 'Registration Fee', 'contacts': 'Contact Person',
+           'free': 'FREE', 'organizer': 'organized by', 'present': 'proudly present',
+           'deadline': 'Registration closes'},
+}
+MARKERS = {'date': '📅🗓📆', 'location': '📍🏫', 'fee': '💰💸', 'contacts': '📞📲📱'}
+DECOR = '✨📢🏆🔥🎯📌‼️🚀'
+
+
+def _styled(text, rng):
+    """Mathematical bold / italic letters, like the styled titles on Instagram"""
+    upper, lower = rng.choice(((0x1D400, 0x1D41A), (0x1D468, 0x1D482)))
+
+    def convert(char):
+        if 'A' <= char <= 'Z':
+            return chr(upper + ord(char) - ord('A'))
+        if 'a' <= char <= 'z':
+            return chr(lower + ord(char) - ord('a'))
+        return char
+    return ''.join(map(convert, text))
+
+
+def _date(rng, lang, year):
+    month = rng.randrange(12)
+    day = rng.randint(1, 28)
+    if lang == 'en' and rng.random() < 0.6:
+        return f"{MONTHS['en'][month]} {day}, {year}"
+    names = MONTHS['id'] if lang == 'id' or rng.random() < 0.3 else MONTHS['en']
+    return f"{day} {names[month]} {year}"
+
+
+def _phone(rng):
+    prefix = rng.choice(('08', '628', '+628'))
+    return prefix + str(rng.randint(1, 9)) + ''.join(str(rng.randrange(10)) for _ in range(rng.randint(7, 9)))
+
+
+def _rupiah(rng):
+    return f"{rng.randrange(25, 300, 5) * 1000:,}".replace(',', '.')
+
+
+def _marker(rng, label, lang):
+    if rng.random() < 0.7:
+        return f"{rng.choice(MARKERS[label])} {LABELS[lang][label]}:"
+    return f"{LABELS[lang][label]}:"
+
+
+def event_caption(rng, lang):
+    """A regular competition announcement"""
+    year = rng.choice((2025, 2026))
+    acronym = rng.choice(ACRONYMS)
+    name = f"{rng.choice(KINDS)} {rng.choice(EVENTS).upper()} {acronym} {year}"
+    if rng.random() < 0.25:
+        name = _styled(name, rng)
+    title = rng.choice((f"[OPEN REGISTRATION] {name}", f"{rng.choice(DECOR)} {name} {rng.choice(DECOR)}", name))
+    org = rng.choice(ORGS)
+    labels = LABELS[lang]
+    parts = [title]
+    if rng.random() < 0.5:
+        parts.append(f"{org} {labels['present']} {acronym} {year}!")
+    else:
+        parts.append(f"{acronym} {year} {labels['organizer']} {org}.")
+    parts += rng.sample(FILLER[lang], rng.randint(1, 3))
+
+    date = _date(rng, lang, year)
+    if rng.random() < 0.4:
+        date = f"{date} - {_date(rng, lang, year)}"
+    parts.append(f"{_marker(rng, 'date', lang)} {date}")
+    if rng.random() < 0.5:
+        parts.append(f"{labels['deadline']}: {_date(rng, lang, year)}")
+    parts.append(f"{_marker(rng, 'location', lang)} {rng.choice(VENUES)}, {rng.choice(CITIES)}")
+
+    if rng.random() < 0.2:
+        parts.append(f"{_marker(rng, 'fee', lang)} {labels['free']}")
+    else:
+        waves = rng.randint(1, 3)
+        if waves == 1:
+            parts.append(f"{_marker(rng, 'fee', lang)} Rp{rng.choice(('', ' ', '. '))}{_rupiah(rng)},-")
+        else:
+            parts.append(_marker(rng, 'fee', lang))
+            parts += [f"Gelombang {i}: Rp {_rupiah(rng)}" for i in range(1, waves + 1)]
+
+    parts.append(f"🔗 Link pendaftaran: https://bit.ly/{acronym.lower()}{year}-{rng.randrange(10000)}")
+    parts.append(_marker(rng, 'contacts', lang))
+    for contact in rng.sample(NAMES, rng.randint(1, 4)):
+        phone = _phone(rng)
+        parts.append(rng.choice((f"{contact}: {phone}", f"{contact} ({phone})", f"wa.me/{phone.lstrip('+')}")))
+    # Long posts repeat the rules / timeline paragraphs
+    for _ in range(rng.choice((0, 0, 1, 3, 8, 20))):
+        parts += rng.sample(FILLER[lang], 2)
+    parts.append(' '.join(f"#{tag}" for tag in rng.sample(TAGS, rng.randint(0, 6))))
+    parts.append(f"@{acronym.lower()}_{year}")
+    return rng.choice((' ', '\n')).join(part for part in parts if part)
+
+
+def adversarial_caption(rng, size):
+    """A caption built to stress the extractors (cf. benchmark.py adversarial)"""
+    kind = rng.randrange(7)
+    if kind == 0:
+        return 'A' + ' a' * size
+    if kind == 1:
+        return 'biaya gelombang ' + ' ' * size + '!'
+    if kind == 2:
+        return ''.join(rng.choice(''.join(MARKERS.values())) + ' ' for _ in range(size))
+    if kind == 3:
+        return 'Rp ' * size
+    if kind == 4:
+        return ''.join(chr(rng.randint(0x41, 0x5A)) + '\u0301\u0302' for _ in range(size))
+    if kind == 5:
+        return ('CP: ' + ' '.join(_phone(rng) for _ in range(size // 12)) + ' ') * 2
+    # An ordinary caption blown up to many times its size
+    return (event_caption(rng, 'id') + ' ') * max(1, size // 1000)
+
+
+def caption_header(rng, caption):
+    """Prepend the Instagram "N likes, N comments - user on <date>" header to a caption"""
+    likes = rng.randint(0, 5000)
+    likes = f"{likes:,}" if likes >= 1000 else str(likes)
+    month = rng.choice(MONTHS['en'])
+    return (f'{likes} likes, {rng.randint(0, 200)} comments - infolomba on '
+            f'{month} {rng.randint(1, 28)}, {rng.choice((2025, 2026))}: "{caption}".')
+
+
+def generate(rows, adversarial=DEFAULT_ADVERSARIAL, seed=0):
+    """Yield (post_index, post_url, caption) for `rows` synthetic posts"""
+    rng = random.Random(seed)
+    alphabet = 'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789_-'
+    for index in range(rows):
+        if rng.random() < adversarial:
+            caption = adversarial_caption(rng, rng.choice((1000, 5000, 20000)))
+        else:
+            caption = event_caption(rng, 'en' if rng.random() < ENGLISH_SHARE else 'id')
+        if rng.random() < 0.9:
+            caption = caption_header(rng, caption)
+        code = ''.join(rng.choice(alphabet) for _ in range(11))
+        yield index, f"https://www.instagram.com/infolomba/p/{code}/", caption
+
+
+def write_csv(path, posts, session_id, json_file):
+    def write(f):
+        writer = csv.DictWriter(f, fieldnames=FIELDNAMES, extrasaction='ignore')
+        writer.writeheader()
+        for index, url, caption in posts:
+            writer.writerow({
+                'session_id': session_id,
+                'json_file': json_file,
+                'post_index': index,
+                'post_url': url,
+                'original_caption': caption,
+                'parse_status': 'pending',
+            })
+    replace_file(path, write, newline='')
+
+
+def write_scraped_json(path, posts, username='infolomba'):
+    """Stream the posts into scraper.js's JSON shape without holding them all"""
+    timestamp = time.strftime('%Y-%m-%dT%H:%M:%S.000Z', time.gmtime())
+
+    def write(f):
+        f.write(json.dumps({'profileUrl': f"https://www.instagram.com/{username}/", 'username': username,
+                            'timestamp': timestamp, 'startTime': timestamp}, ensure_ascii=False)[:-1])
+        f.write(', "posts": [\n')
+        count = 0
+        for index, url, caption in posts:
+            if count:
+                f.write(',\n')
+            f.write(json.dumps({
+                'postIndex': index, 'postUrl': url, 'postDate': None, 'eventTitle': None,
+                'eventOrganizer': None, 'phoneNumber1': None, 'phoneNumber2': None, 'phoneNumber3': None,
+                'phoneNumber4': None, 'allPhones': [], 'imageUrl': None, 'caption': caption,
+            }, ensure_ascii=False))
+            count += 1
+        summary = {'total': count, 'withPhone': 0, 'range': {'start': 0, 'end': count}}
+        f.write(f'\n], "summary": {json.dumps(summary)}}}\n')
+    replace_file(path, write)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic infolomba caption corpus')
+    parser.add_argument('--rows', type=int, default=DEFAULT_ROWS, help=f'Captions to generate (default: {DEFAULT_ROWS})')
+    parser.add_argument('--adversarial', type=float, default=DEFAULT_ADVERSARIAL,
+                        help=f'Share of adversarial captions, 0-1 (default: {DEFAULT_ADVERSARIAL})')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed (default: 0)')
+    parser.add_argument('--format', choices=('csv', 'json', 'both'), default='csv',
+                        help='parsed#N CSV, scraped JSON or both (default: csv)')
+    parser.add_argument('--out-dir', default=SYNTH_DIR, help=f'Output folder (default: {SYNTH_DIR})')
+    args = parser.parse_args()
+    if not 0 <= args.adversarial <= 1:
+        parser.error('--adversarial must be between 0 and 1')
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    session_id = f"synth{args.seed:04d}"
+    stamp = int(time.time() * 1000)
+    json_file = f"scraped-{session_id}-{stamp}.json"
+    start = time.perf_counter()
+    written = []
+    if args.format in ('csv', 'both'):
+        path = os.path.join(args.out_dir, f"parsed#1-{session_id}-{stamp}.csv")
+        write_csv(path, generate(args.rows, args.adversarial, args.seed), session_id, json_file)
+        written.append(path)
+    if args.format in ('json', 'both'):
+        path = os.path.join(args.out_dir, json_file)
+        # The same seed gives the same captions as the CSV
+        write_scraped_json(path, generate(args.rows, args.adversarial, args.seed))
+        written.append(path)
+    elapsed = time.perf_counter() - start
+    for path in written:
+        print(f"{path} ({os.path.getsize(path) / 1e6:.1f} MB)")
+    print(f"{args.rows} captions ({args.adversarial:.0%} adversarial) in {elapsed:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+Token = namedtuple('Token', 'kind value start')
+
+# Characters a URL can have before its first '/' (scheme, host, port)
+_URL_HEAD_CHARS = frozenset('abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789.-_:')
+
+_token_re = None
+
+
+def _token_pattern():
+    global _token_re
+    if _token_re is None:
+        _token_re = re.compile(
+            # Only '#', '@', '+', digits and '/' can start a token, so the
+            # scan skips ordinary text without trying any alternative. URLs
+            # are matched from their first '/' and widened back in tokenize().
+            r"(?=[#@+\d/])(?:"
+            r"(?P<url>(?<=[A-Za-z.:])/[^\s\"'<>]*)"
+            r"|(?P<hashtag>(?<![\w&])#\d*[^\W\d]\w*)"
+            r"|(?P<mention>(?<![\w.])@[\w.]*\w)"
+            r"|(?P<phone>(?:\+62|62|0)\d{8,12}(?!\d))"
+            r"|(?P<number>\d[\d.,]*\d|\d)"
+            r")"
+        )
+    return _token_re
+
+
+def _url_host(url):
+    host = url.split('://', 1)[1] if '://' in url else url
+    return host.split('/', 1)[0].lower()
+
+
+@lru_cache(maxsize=8)
+def tokenize(text):
+    """Scan text once into url/hashtag/mention/phone/number tokens.
+
+    Cached on the text so the contact extractor and the link/hashtag/mention
+    fields share one scan per caption.
+    """
+    tokens = []
+    last_end = 0
+    for m in _token_pattern().finditer(text):
+        kind = m.lastgroup
+        start = m.start()
+        value = m.group()
+        if kind == 'url':
+            while start > last_end and text[start - 1] in _URL_HEAD_CHARS:
+                start -= 1
+            value = text[start:m.end()].rstrip('.,;:!?)]}…')
+            host = _url_host(value)
+            # "SD/MI", "and/or", "195.000/tim" are not links
+            if '.' not in host or not host.rsplit('.', 1)[1].isalpha():
+                continue
+        tokens.append(Token(kind, value, start))
+        last_end = m.end()
+    return tuple(tokens)
+
+
+def token_fields(tokens):
+    """registration_links, hashtags and mentions from a token stream (deduplicated, in order)"""
+    links, hashtags, mentions = {}, {}, {}
+    for token in tokens:
+        if token.kind == 'url':
+            # wa.me links are phone numbers, handled by the contact extractor
+            if _url_host(token.value) != 'wa.me':
+                links[token.value] = None
+        elif token.kind == 'hashtag':
+            hashtags[token.value.lower()] = None
+        elif token.kind == 'mention':
+            mentions[token.value.lower()] = None
+    return {
+        'registration_links': list(links),
+        'hashtags': list(hashtags),
+        'mentions': list(mentions),
+    }
@@ -0,0 +1,182 @@
+"""Shortcode index of every post URL the pipeline knows about.
+
+Post URLs are spread over the collected link lists, the scraped JSON files,
+the parsed CSVs and the VPS sync state. This indexes all of them by
+Instagram shortcode (/p/<shortcode>/, /reel/<shortcode>/) and tells which
+collected posts still need scraping, parsing or uploading, so a run only
+opens the pages it does not have yet.
+
+Sources:
+  collected   collected_link/post-urls-*.json, post-urls.json
+  scraped     output/scraped*.json, and parsed CSV rows with a caption
+  parsed      parsed CSV rows with parse_status "parsed" (parsed/ and parsed/batch)
+  uploaded    posts recorded in parsed/sync-state.json (sync.py mark-synced)
+
+The work list is written in the collected_link shape that
+scrape-multiple-posts.js reads: {"metadata": {...}, "posts": [{"index", "url"}]}.
+
+Usage:
+  python url_index.py [--need scrape|parse|upload] [--out worklist.json] [--index PATH]
+"""
+import argparse
+import glob
+import json
+import os
+import re
+from datetime import datetime
+
+from parsed_post import read_posts, write_json_atomic
+from sync import SYNC_STATE_FILE, load_state
+
+REPO_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+PARSED_DIR = os.path.join(REPO_DIR, 'parsed')
+OUTPUT_DIR = os.path.join(REPO_DIR, 'output')
+COLLECTED_DIR = os.path.join(REPO_DIR, 'collected_link')
+INDEX_FILE = os.path.join(PARSED_DIR, 'url-index.json')
+
+SOURCES = ('collected', 'scraped', 'parsed', 'uploaded')
+# --need -> (stage the post must have reached, stage it is still missing)
+NEEDS = {
+    'scrape': ('collected', 'scraped'),
+    'parse': ('scraped', 'parsed'),
+    'upload': ('parsed', 'uploaded'),
+}
+
+_SHORTCODE_RE = re.compile(r'instagram\.com/(?:[\w.]+/)?(?:p|reel|reels|tv)/([A-Za-z0-9_-]+)')
+
+
+def shortcode(url):
+    """Shortcode of an Instagram post URL (None for anything else)"""
+    match = _SHORTCODE_RE.search(url or '')
+    return match.group(1) if match else None
+
+
+class UrlIndex:
+    """shortcode -> {'url', 'index', 'username', <source>: [files]}"""
+
+    def __init__(self):
+        self.entries = {}
+
+    def add(self, url, source, origin, index=None, username=None):
+        code = shortcode(url)
+        if code is None:
+            return
+        entry = self.entries.setdefault(code, {'url': url, 'index': None, 'username': None})
+        origins = entry.setdefault(source, [])
+        if origin not in origins:
+            origins.append(origin)
+        if source == 'collected':
+            # Keep the URL and position the link collector recorded
+            entry['url'] = url
+            if entry['index'] is None:
+                entry['index'] = index
+            entry['username'] = entry['username'] or username
+
+    def missing(self, need):
+        """Shortcodes that reached the stage before `need` but not `need` itself"""
+        have, lacking = NEEDS[need]
+        return [code for code, entry in self.entries.items() if have in entry and lacking not in entry]
+
+    def counts(self):
+        return {source: sum(source in entry for entry in self.entries.values()) for source in SOURCES}
+
+
+def _load_json(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def collected_files(repo_dir=REPO_DIR):
+    paths = sorted(glob.glob(os.path.join(repo_dir, 'collected_link', 'post-urls-*.json')))
+    if os.path.exists(os.path.join(repo_dir, 'post-urls.json')):
+        paths.append(os.path.join(repo_dir, 'post-urls.json'))
+    return paths
+
+
+def parsed_files(repo_dir=REPO_DIR):
+    """Session CSVs in parsed/ and parsed/batch; synth/ and shadow/ hold test rows, organizers/ sidecars"""
+    parsed_dir = os.path.join(repo_dir, 'parsed')
+    paths = glob.glob(os.path.join(parsed_dir, '*parsed#*.csv'))
+    paths += glob.glob(os.path.join(parsed_dir, 'batch', '*parsed#*.csv'))
+    return sorted(paths)
+
+
+def build_index(repo_dir=REPO_DIR, state_path=SYNC_STATE_FILE):
+    index = UrlIndex()
+    for path in collected_files(repo_dir):
+        data = _load_json(path)
+        username = (data.get('metadata') or {}).get('targetUsername')
+        for post in data.get('posts') or []:
+            index.add(post.get('url'), 'collected', os.path.basename(path), post.get('index'), username)
+
+    for path in sorted(glob.glob(os.path.join(repo_dir, 'output', 'scraped*.json'))):
+        for post in _load_json(path).get('posts') or []:
+            if post.get('caption'):
+                index.add(post.get('postUrl'), 'scraped', os.path.basename(path))
+
+    for path in parsed_files(repo_dir):
+        name = os.path.relpath(path, os.path.join(repo_dir, 'parsed'))
+        for post in read_posts(path):
+            if post.original_caption:
+                index.add(post.post_url, 'scraped', name)
+            if post.parse_status == 'parsed':
+                index.add(post.post_url, 'parsed', name)
+
+    for session_id, session in load_state(state_path)['sessions'].items():
+        for key in session.get('posts', {}):
+            index.add(key, 'uploaded', session_id)
+    return index
+
+
+def worklist(index, codes, note):
+    """collected_link-shaped JSON for scrape-multiple-posts.js"""
+    entries = [index.entries[code] for code in codes]
+    entries.sort(key=lambda entry: (entry['index'] is None, entry['index'] or 0))
+    usernames = {entry['username'] for entry in entries if entry['username']}
+    return {
+        'metadata': {
+            'targetUsername': usernames.pop() if len(usernames) == 1 else 'mixed',
+            'totalPostsLoaded': len(entries),
+            'collectedCount': len(entries),
+            'collectedAt': datetime.now().isoformat() + 'Z',
+            'note': note,
+        },
+        'posts': [
+            {'index': entry['index'] if entry['index'] is not None else i, 'url': entry['url']}
+            for i, entry in enumerate(entries)
+        ],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Index post URLs across collected, scraped, parsed and uploaded data')
+    parser.add_argument('--need', choices=sorted(NEEDS), default='scrape',
+                        help='Which missing stage to write a work list for (default: scrape)')
+    parser.add_argument('--out', default=None,
+                        help='Work list file (default: collected_link/worklist-<need>-<ts>.json)')
+    parser.add_argument('--index', default=INDEX_FILE, help=f'Index file (default: {INDEX_FILE})')
+    parser.add_argument('--state', default=SYNC_STATE_FILE, help=f'Sync state file (default: {SYNC_STATE_FILE})')
+    args = parser.parse_args()
+
+    index = build_index(state_path=args.state)
+    write_json_atomic(args.index, index.entries)
+    counts = index.counts()
+    print(f"{len(index.entries)} posts indexed: " + ', '.join(f"{counts[s]} {s}" for s in SOURCES))
+    for need in NEEDS:
+        print(f"  not {NEEDS[need][1]}: {len(index.missing(need))}")
+
+    codes = index.missing(args.need)
+    if not codes:
+        print(f"Nothing left to {args.need}")
+        return
+    out = args.out or os.path.join(COLLECTED_DIR, f"worklist-{args.need}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    note = f"Posts still to {args.need}, from url_index.py"
+    with open(out, 'w', encoding='utf-8') as f:
+        json.dump(worklist(index, codes, note), f, ensure_ascii=False, indent=2)
+    print(f"Work list of {len(codes)} posts saved to {out}")
+    if args.need == 'scrape':
+        print(f"  node scrape-multiple-posts.js {os.path.relpath(out, REPO_DIR)}")
+
+
+if __name__ == '__main__':
+    main()
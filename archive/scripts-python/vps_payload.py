@@ -0,0 +1,350 @@
+"""VPS upload payloads, built in Python and split into upload-sized files.
+
+/api/parse/send-to-vps loads a whole output JSON and converts every post
+(normalizeUnicode, normalizePhone, the YYYY-MM-DD slice of extracted_date,
+cleanValue, phoneNumber1/2, the 5000 character caption cut and the
+non-event filter) before it uploads. vps_post() is the same conversion, so
+the chunk files written here hold the exact camelCase posts POST
+/scraper/posts takes. Both filter out the extractors' "NON-EVENT" titles
+as well as MASTER_RULE's "Non-Event Post".
+
+A parsed#N CSV is streamed row by row; an output JSON is read whole.
+With --schedule the session's posts are ordered by urgency first
+(scheduler.py), so the first chunks hold the posts whose registration closes
+soonest and uploading the chunks in order gets them to the CRM first. The
+ordering needs every post at once, so with --schedule even a CSV is read
+into a list instead of being streamed.
+
+--upload sends the chunks the way server.js does: it creates a VPS session
+(POST /scraper/local-session) unless --vps-session names one, then POSTs
+each chunk's posts to /scraper/posts in order. The VPS session and every
+uploaded chunk are recorded in the manifest, so running --upload on the
+chunk folder again continues after the last chunk that went through.
+VPS_API_URL and VPS_API_TOKEN come from the environment or the repo's .env,
+as for apiClient.js.
+
+Output (parsed/vps/<session_id>/ by default):
+  payload-0001.json ...   {"sessionId", "chunk", "posts": [...]}
+  manifest.json           source, totals, the chunk file list and upload progress
+
+Usage:
+  python vps_payload.py <parsed CSV or output JSON> [--out-dir DIR] [--max-posts N] [--max-bytes N]
+                        [--schedule] [--today YYYY-MM-DD] [--upload [--vps-session ID]]
+  python vps_payload.py <chunk folder> --upload [--vps-session ID]
+"""
+import argparse
+import json
+import os
+import re
+import unicodedata
+import urllib.request
+from datetime import date, datetime
+
+from parsed_post import is_non_event, iter_posts, replace_file, write_json_atomic
+
+REPO_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+PARSED_DIR = os.path.join(REPO_DIR, 'parsed')
+VPS_DIR = os.path.join(PARSED_DIR, 'vps')
+ENV_FILE = os.path.join(REPO_DIR, '.env')
+MANIFEST = 'manifest.json'
+
+# Same defaults as apiClient.js and server.js
+DEFAULT_VPS_API_URL = 'https://sales.webbuild.arachnova.id/api'
+DEFAULT_PROFILE_URL = 'https://www.instagram.com/infolomba/'
+API_TIMEOUT = 30
+
+# server.js truncates captions to this many characters (UTF-16 code units) before upload
+MAX_CAPTION_CHARS = 5000
+EMPTY_VALUES = ('N/A', 'Not specified', 'Not applicable')
+
+# Upload size limits per chunk file
+DEFAULT_MAX_POSTS = 100
+DEFAULT_MAX_BYTES = 1024 * 1024
+
+
+def normalize_unicode(text):
+    """NFKD + strip combining marks (maps 𝐂𝐎𝐌𝐏 style letters to ASCII), like server.js"""
+    if not text:
+        return ''
+    text = unicodedata.normalize('NFKD', text)
+    return re.sub('[\u0300-\u036f]', '', text)
+
+
+def normalize_phone(phone):
+    digits = re.sub(r'\D', '', str(phone or '').strip())
+    if digits.startswith('62') and len(digits) > 10:
+        digits = '0' + digits[2:]
+    return digits if len(digits) >= 10 else None
+
+
+def js_slice(text, length):
+    """text.substring(0, length) as JavaScript counts it: in UTF-16 code units, so an emoji takes two"""
+    units = text.encode('utf-16-le', 'surrogatepass')
+    if len(units) <= 2 * length:
+        return text
+    # Like substring, this can split an emoji and keep its lone high surrogate
+    return units[:2 * length].decode('utf-16-le', 'surrogatepass')
+
+
+def valid_date(value):
+    if not value or value in EMPTY_VALUES:
+        return None
+    match = re.match(r'^(\d{4}-\d{2}-\d{2})', value)
+    return match.group(1) if match else None
+
+
+def clean_value(value):
+    return '' if not value or value in EMPTY_VALUES else value
+
+
+def vps_post(post):
+    """One MASTER_RULE JSON post -> the camelCase post send-to-vps uploads (None if it is filtered out)"""
+    phones = post.get('phone_numbers') if isinstance(post.get('phone_numbers'), list) else []
+    phones = [p for p in map(normalize_phone, phones) if p is not None]
+    contacts = post.get('contact_persons') if isinstance(post.get('contact_persons'), list) else []
+    contacts = [c for c in map(normalize_unicode, contacts) if c]
+    title = normalize_unicode(post.get('extracted_title') or '')
+    if not title or is_non_event(title):
+        return None
+    return {
+        'postIndex': post.get('post_index') or 0,
+        'postUrl': post.get('post_url') or '',
+        'postDate': valid_date(post.get('extracted_date') or ''),
+        'eventTitle': title,
+        'eventOrganizer': normalize_unicode(post.get('extracted_organizer') or ''),
+        'eventLocation': clean_value(normalize_unicode(post.get('extracted_location') or '')),
+        'registrationFee': clean_value(normalize_unicode(post.get('registration_fee') or '')),
+        'phoneNumber1': phones[0] if phones else None,
+        'phoneNumber2': phones[1] if len(phones) > 1 else None,
+        'allPhones': phones,
+        'contactPersons': contacts,
+        'caption': js_slice(normalize_unicode(post.get('original_caption') or ''), MAX_CAPTION_CHARS),
+    }
+
+
+_LONE_SURROGATE = re.compile('[\ud800-\udfff]')
+
+
+def _dumps(data):
+    # A caption cut inside an emoji keeps a lone surrogate, which UTF-8 cannot
+    # hold; escape it the way JSON.stringify does
+    text = json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+    return _LONE_SURROGATE.sub(lambda match: f"\\u{ord(match.group()):04x}", text)
+
+
+def source_posts(path):
+    """(session_id, profile_url, iterator of MASTER_RULE posts) for a parsed CSV or an output JSON"""
+    if path.endswith('.json'):
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return data.get('session_id') or '', data.get('profile_url') or '', iter(data.get('posts') or [])
+    posts = iter_posts(path)
+    first = next(posts, None)
+    if first is None:
+        return '', '', iter(())
+
+    def rows():
+        yield first.to_json()
+        for post in posts:
+            yield post.to_json()
+    return first.session_id, '', rows()
+
+
+def group_payloads(payloads, max_posts=DEFAULT_MAX_POSTS, max_bytes=DEFAULT_MAX_BYTES):
+    """Group VPS posts into lists within the count and size limits; yields (vps_posts, bytes)"""
+    chunk, size = [], 0
+    for payload in payloads:
+        post_bytes = len(_dumps(payload).encode('utf-8')) + 1
+        if chunk and (len(chunk) >= max_posts or size + post_bytes > max_bytes):
+            yield chunk, size
+            chunk, size = [], 0
+        chunk.append(payload)
+        size += post_bytes
+    if chunk:
+        yield chunk, size
+
+
+def chunk_payloads(posts, max_posts=DEFAULT_MAX_POSTS, max_bytes=DEFAULT_MAX_BYTES):
+    """Group MASTER_RULE posts into lists of VPS posts within the count and size limits.
+
+    Yields (vps_posts, bytes); returns the number of posts filtered out
+    (non-events / no title) via StopIteration.value.
+    """
+    skipped = 0
+
+    def payloads():
+        nonlocal skipped
+        for post in posts:
+            payload = vps_post(post)
+            if payload is None:
+                skipped += 1
+            else:
+                yield payload
+    yield from group_payloads(payloads(), max_posts, max_bytes)
+    return skipped
+
+
+def write_chunks(path, out_dir=None, max_posts=DEFAULT_MAX_POSTS, max_bytes=DEFAULT_MAX_BYTES,
+                 schedule=False, today=None):
+    """Write the chunk files and manifest for one session; returns the manifest"""
+    session_id, profile_url, posts = source_posts(path)
+    if schedule:
+        from scheduler import order_posts
+        posts = order_posts(posts, today, lambda post: post.get('original_caption') or '')
+    out_dir = out_dir or os.path.join(VPS_DIR, session_id or os.path.splitext(os.path.basename(path))[0])
+    os.makedirs(out_dir, exist_ok=True)
+    for name in os.listdir(out_dir):
+        # A rerun replaces the previous chunks instead of mixing with them
+        if re.match(r'^payload-\d{4}\.json$', name):
+            os.remove(os.path.join(out_dir, name))
+
+    chunks = chunk_payloads(posts, max_posts, max_bytes)
+    files = []
+    while True:
+        try:
+            chunk, size = next(chunks)
+        except StopIteration as stop:
+            skipped = stop.value or 0
+            break
+        # Each chunk is written as soon as it is full, so only one is held in memory
+        name = f"payload-{len(files) + 1:04d}.json"
+        body = {'sessionId': session_id, 'chunk': len(files) + 1, 'posts': chunk}
+        replace_file(os.path.join(out_dir, name), lambda f: f.write(_dumps(body)))
+        files.append({'file': name, 'posts': len(chunk), 'bytes': size, 'uploadedAt': None})
+
+    manifest = {
+        'source': os.path.abspath(path),
+        'sessionId': session_id,
+        'profileUrl': profile_url or DEFAULT_PROFILE_URL,
+        'createdAt': datetime.now().isoformat() + 'Z',
+        'totalPosts': sum(entry['posts'] for entry in files),
+        'skippedPosts': skipped,
+        'maxPosts': max_posts,
+        'maxBytes': max_bytes,
+        'scheduled': schedule,
+        'vpsSessionId': None,
+        'chunks': files,
+    }
+    write_json_atomic(os.path.join(out_dir, MANIFEST), manifest)
+    manifest['out_dir'] = out_dir
+    return manifest
+
+
+def vps_config(env_file=ENV_FILE):
+    """(VPS_API_URL, VPS_API_TOKEN): the environment first, then the .env file (as dotenv does)"""
+    values = {}
+    if os.path.exists(env_file):
+        with open(env_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                key, sep, value = line.strip().partition('=')
+                if sep and not key.startswith('#'):
+                    values[key.strip()] = value.strip().strip('"\'')
+    url = os.environ.get('VPS_API_URL', values.get('VPS_API_URL')) or DEFAULT_VPS_API_URL
+    return url, os.environ.get('VPS_API_TOKEN', values.get('VPS_API_TOKEN')) or None
+
+
+def api_post(endpoint, body):
+    """POST JSON to the VPS API (apiClient.js' axios client); returns the decoded response"""
+    url, token = vps_config()
+    headers = {'Content-Type': 'application/json'}
+    if token:
+        headers['Authorization'] = f"Bearer {token}"
+    request = urllib.request.Request(url.rstrip('/') + endpoint, data=_dumps(body).encode('utf-8'),
+                                     headers=headers, method='POST')
+    with urllib.request.urlopen(request, timeout=API_TIMEOUT) as response:
+        return json.load(response)
+
+
+def create_vps_session(profile_url, total_posts):
+    """A new VPS session for an upload, created the way send-to-vps does; returns its id"""
+    response = api_post('/scraper/local-session', {
+        'profileUrl': profile_url,
+        'startPostIndex': 0,
+        'endPostIndex': total_posts - 1,
+        'useAuth': False,
+        'instagramUsername': None,
+        'instagramPassword': None,
+    })
+    vps_session_id = response.get('sessionId') or (response.get('session') or {}).get('id')
+    if not vps_session_id:
+        raise RuntimeError(f"VPS did not return a session id: {response}")
+    return vps_session_id
+
+
+def upload_posts(vps_session_id, posts):
+    """POST /scraper/posts (apiClient.uploadScrapedPosts); returns how many posts the VPS took"""
+    response = api_post('/scraper/posts', {'sessionId': vps_session_id, 'posts': posts})
+    return response.get('uploaded') or len(posts)
+
+
+def upload_chunks(out_dir, vps_session_id=None):
+    """Upload a chunk folder's chunks that are not uploaded yet, in order; returns the manifest.
+
+    The VPS session (vps_session_id, the manifest's, or a new one) and each
+    chunk's upload time are saved to the manifest as they happen.
+    """
+    manifest_path = os.path.join(out_dir, MANIFEST)
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    # Like send-to-vps, no VPS session is created when there is nothing to send
+    if manifest['chunks']:
+        uploaded = any(entry.get('uploadedAt') for entry in manifest['chunks'])
+        if uploaded and vps_session_id and vps_session_id != manifest['vpsSessionId']:
+            # Chunks already in one VPS session must not go to another
+            raise SystemExit(f"{manifest_path} was partly uploaded to VPS session {manifest['vpsSessionId']}")
+        if vps_session_id or not manifest.get('vpsSessionId'):
+            manifest['vpsSessionId'] = vps_session_id or create_vps_session(
+                manifest['profileUrl'], manifest['totalPosts'] + manifest['skippedPosts'])
+            write_json_atomic(manifest_path, manifest)
+    for entry in manifest['chunks']:
+        if entry.get('uploadedAt'):
+            continue
+        with open(os.path.join(out_dir, entry['file']), 'r', encoding='utf-8') as f:
+            posts = json.load(f)['posts']
+        entry['uploaded'] = upload_posts(manifest['vpsSessionId'], posts)
+        entry['uploadedAt'] = datetime.now().isoformat() + 'Z'
+        write_json_atomic(manifest_path, manifest)
+        print(f"  {entry['file']}: {entry['uploaded']} posts uploaded")
+    manifest['out_dir'] = out_dir
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Write VPS upload payloads in upload-sized chunk files')
+    parser.add_argument('input', help='parsed#N CSV or output/ MASTER_RULE JSON (or a chunk folder, with --upload)')
+    parser.add_argument('--out-dir', default=None, help=f'Folder for the chunks (default: {VPS_DIR}/<session_id>)')
+    parser.add_argument('--max-posts', type=int, default=DEFAULT_MAX_POSTS,
+                        help=f'Posts per chunk (default: {DEFAULT_MAX_POSTS})')
+    parser.add_argument('--max-bytes', type=int, default=DEFAULT_MAX_BYTES,
+                        help=f'Bytes of posts per chunk (default: {DEFAULT_MAX_BYTES})')
+    parser.add_argument('--schedule', action='store_true',
+                        help='Put the soonest-deadline / newest posts in the first chunks (see scheduler.py)')
+    parser.add_argument('--today', type=date.fromisoformat, default=None,
+                        help='Reference date for --schedule, YYYY-MM-DD (default: today)')
+    parser.add_argument('--upload', action='store_true',
+                        help='Upload the chunks to the VPS (continues a partly uploaded chunk folder)')
+    parser.add_argument('--vps-session', default=None,
+                        help='VPS session id to upload into (default: a new session, like send-to-vps)')
+    args = parser.parse_args()
+
+    if os.path.isdir(args.input):
+        if not args.upload:
+            parser.error("a chunk folder is only accepted with --upload")
+        out_dir = args.input
+    else:
+        manifest = write_chunks(args.input, args.out_dir, args.max_posts, args.max_bytes, args.schedule, args.today)
+        print(f"Session {manifest['sessionId'] or '-'}: {manifest['totalPosts']} posts in "
+              f"{len(manifest['chunks'])} chunks ({manifest['skippedPosts']} non-event/untitled posts left out)")
+        print(f"Payloads saved to {manifest['out_dir']}")
+        out_dir = manifest['out_dir']
+
+    if args.upload:
+        manifest = upload_chunks(out_dir, args.vps_session)
+        if manifest['chunks']:
+            print(f"Uploaded to VPS session {manifest['vpsSessionId']}; manifest: {os.path.join(out_dir, MANIFEST)}")
+        else:
+            print("No posts to upload")
+
+
+if __name__ == '__main__':
+    main()
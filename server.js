@@ -812,8 +812,10 @@ app.post('/api/parse/send-to-vps', async (req, res) => {
         caption: caption.substring(0, 5000) // Limit caption length to prevent overflow
       };
     }).filter(post => {
-      // Only send posts that have at least a title parsed and is not "Non-Event Post"
-      return post.eventTitle && post.eventTitle.length > 0 && !post.eventTitle.includes('Non-Event Post');
+      // Only send posts that have at least a title parsed and is not a non-event
+      // ("Non-Event Post" from MASTER_RULE parses, "NON-EVENT" from the Python extractors)
+      return post.eventTitle && post.eventTitle.length > 0 &&
+        !['Non-Event Post', 'NON-EVENT'].some(marker => post.eventTitle.includes(marker));
     });
 
     if (posts.length === 0) {